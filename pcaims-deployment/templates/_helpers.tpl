@@ -60,3 +60,28 @@ Create the name of the service account to use
 {{- default "default" .Values.serviceAccount.name }}
 {{- end }}
 {{- end }}
+
+{{/*
+Environment shared by the backend pods and the ledger archive job
+*/}}
+{{- define "pcaims-deployment.backendEnv" -}}
+{{- range $key, $value := .Values.backend.env }}
+- name: {{ $key }}
+  value: {{ $value | quote }}
+{{- end }}
+- name: DB_HOST
+  value: "{{ include "pcaims-deployment.fullname" . }}-mysql"
+- name: DB_MAX_REPLICAS
+  value: "{{ if .Values.autoscaling.enabled }}{{ .Values.autoscaling.maxReplicas }}{{ else }}{{ .Values.backend.replicaCount }}{{ end }}"
+{{- if .Values.backend.ledgerArchive.enabled }}
+- name: LEDGER_ARCHIVE_DIR
+  value: {{ .Values.backend.ledgerArchive.mountPath | quote }}
+{{- end }}
+{{- end }}
+
+{{/*
+Claim holding the ledger archive
+*/}}
+{{- define "pcaims-deployment.ledgerArchiveClaim" -}}
+{{- default (printf "%s-ledger-archive-pvc" (include "pcaims-deployment.fullname" .)) .Values.backend.ledgerArchive.existingClaim }}
+{{- end }}
@@ -8,11 +8,8 @@ from sqlalchemy.orm import Session
 import data_access as data_access
 from database_connection import get_db
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-# Security configuration
+# Security configuration (.env is loaded once by database_connection, imported above)
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
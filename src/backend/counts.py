@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+TOTAL_COUNT_TTL_SECONDS = float(os.getenv("TOTAL_COUNT_TTL_SECONDS", "30"))
+TOTAL_COUNT_MAX_ENTRIES = int(os.getenv("TOTAL_COUNT_MAX_ENTRIES", "1000"))
+
+class CountCache:
+    """Recent COUNT(*) results per table and filter set, kept for a TTL.
+
+    A commit that inserts, updates or deletes rows in a table drops that table's
+    entries in this process, so a client sees its own writes in the next total,
+    including filtered totals whose rows moved in or out of the filter. Writes
+    made by other replicas show up once the entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float = TOTAL_COUNT_TTL_SECONDS, max_entries: int = TOTAL_COUNT_MAX_ENTRIES,
+                 clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str, filters: tuple, count, exact: bool = False) -> int:
+        """The cached total for (table, filters), calling ``count()`` when it is missing, stale or ``exact``."""
+        key = (table, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not exact and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                return entry[0]
+            generation = self._generations.get(table, 0)
+
+        total = count()
+        with self._lock:
+            # A commit that landed while we were counting may not be in the result
+            if self._generations.get(table, 0) == generation:
+                self._entries[key] = (total, self._clock() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [key for key in self._entries if key[0] in tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+cache = CountCache()
+
+# Track which tables a transaction wrote to, through both the unit of work and
+# bulk insert()/update()/delete() statements, and invalidate their totals once it
+# commits. Updates count too: they can move a row into or out of a filtered total
+@event.listens_for(Session, "after_flush")
+def _track_flushed_rows(session, flush_context):
+    tables = session.info.setdefault("count_tables", set())
+    for obj in chain(session.new, session.deleted):
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.add(obj.__table__.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault("count_tables", set()).add(table.name)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    tables = session.info.pop("count_tables", None)
+    if tables:
+        cache.invalidate(tables)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("count_tables", None)
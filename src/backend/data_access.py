@@ -1,9 +1,60 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from typing import List, Optional
-import models, schemas
-from datetime import datetime
-import uuid
+from sqlalchemy.orm import Session, joinedload, contains_eager, load_only, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, or_, func, select, update, insert, delete, case, union
+from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+import models, schemas, rollups, numbering, outbox, ledger_archive, stock_shards
+
+class VersionConflictError(Exception):
+    """Raised when a versioned row changed since the caller last read it."""
+
+    def __init__(self, current):
+        super().__init__("Resource was modified by another request")
+        self.current = current
+
+class InvalidRequestError(Exception):
+    """Raised when a request refers to lines or quantities the resource does not have."""
+
+class InvalidStateError(Exception):
+    """Raised when an operation is not allowed in the resource's current status."""
+
+def _check_version(db_obj, expected_version: Optional[int]):
+    if expected_version is not None and db_obj.version != expected_version:
+        raise VersionConflictError(db_obj)
+
+def _commit_versioned(db: Session, reload):
+    try:
+        db.commit()
+    except StaleDataError:
+        # A concurrent writer bumped the version between our read and our UPDATE
+        db.rollback()
+        raise VersionConflictError(reload())
+
+def _select_documents(table, selector, owner_column, owner_id: Optional[int]):
+    """WHERE clause for an order or purchase order selector; criteria are combined with AND."""
+    conditions = []
+    if selector.ids:
+        conditions.append(table.c.id.in_(selector.ids))
+    if selector.status is not None:
+        conditions.append(table.c.status == selector.status)
+    if owner_id is not None:
+        conditions.append(owner_column == owner_id)
+    if selector.created_before is not None:
+        conditions.append(table.c.created_at < datetime.combine(selector.created_before, datetime.min.time()))
+    if not conditions:
+        raise InvalidRequestError(f"Select rows by ids, status, {owner_column.name} or created_before")
+    return and_(*conditions)
+
+def _matching_ids(db: Session, table, condition) -> List[int]:
+    return list(db.execute(select(table.c.id).where(condition).order_by(table.c.id)).scalars())
+
+def _lock_ids(db: Session, table, ids: List[int]) -> List[int]:
+    # In id order, so concurrent bulk deletes lock rows in the same order
+    return list(db.execute(
+        select(table.c.id).where(table.c.id.in_(list(ids))).order_by(table.c.id).with_for_update()
+    ).scalars())
 
 # User CRUD operations
 def get_user(db: Session, user_id: int):
@@ -18,6 +69,9 @@ def get_user_by_username(db: Session, username: str):
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.User).offset(skip).limit(limit).all()
 
+def count_users(db: Session) -> int:
+    return db.query(func.count(models.User.id)).scalar()
+
 def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     db_user = models.User(
         username=user.username,
@@ -55,6 +109,9 @@ def get_category(db: Session, category_id: int):
 def get_categories(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Category).offset(skip).limit(limit).all()
 
+def count_categories(db: Session) -> int:
+    return db.query(func.count(models.Category.id)).scalar()
+
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.dict())
     db.add(db_category)
@@ -80,27 +137,62 @@ def delete_category(db: Session, category_id: int):
     return db_category
 
 # Product CRUD operations
-def get_product(db: Session, product_id: int):
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
+def _product_load_options(fields: Optional[Tuple[str, ...]]):
+    # Only fetch the requested columns, and join in the category and inventory
+    # rows in the same query when they are part of the response
+    if fields is None:
+        return [joinedload(models.Product.category)]
+    columns = [getattr(models.Product, name) for name in fields if name in models.Product.__table__.columns]
+    options = [load_only(models.Product.id, *columns)]
+    if "category" in fields:
+        options.append(joinedload(models.Product.category))
+    if "inventory" in fields:
+        options.append(joinedload(models.Product.inventory))
+    return options
+
+def get_product(db: Session, product_id: int, fields: Optional[Tuple[str, ...]] = None):
+    return db.query(models.Product).options(*_product_load_options(fields)).filter(models.Product.id == product_id).first()
 
 def get_product_by_sku(db: Session, sku: str):
     return db.query(models.Product).filter(models.Product.sku == sku).first()
 
-def get_products(db: Session, skip: int = 0, limit: int = 100, category_id: Optional[int] = None):
-    query = db.query(models.Product)
+def get_products(db: Session, skip: int = 0, limit: int = 100, category_id: Optional[int] = None,
+                 fields: Optional[Tuple[str, ...]] = None):
+    query = db.query(models.Product).options(*_product_load_options(fields))
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
     return query.offset(skip).limit(limit).all()
 
-def search_products(db: Session, search_term: str, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).filter(
-        or_(
-            models.Product.name.contains(search_term),
-            models.Product.sku.contains(search_term),
-            models.Product.description.contains(search_term)
-        )
+def lookup_products(db: Session, ids: List[int], skus: List[str]):
+    """Fetch products by id or SKU in a single query."""
+    if not ids and not skus:
+        return []
+    return db.query(models.Product).options(joinedload(models.Product.category)).filter(
+        or_(models.Product.id.in_(ids), models.Product.sku.in_(skus))
+    ).all()
+
+def _product_search(search_term: str):
+    return or_(
+        models.Product.name.contains(search_term),
+        models.Product.sku.contains(search_term),
+        models.Product.description.contains(search_term)
+    )
+
+def search_products(db: Session, search_term: str, skip: int = 0, limit: int = 100,
+                    fields: Optional[Tuple[str, ...]] = None):
+    return db.query(models.Product).options(*_product_load_options(fields)).filter(
+        _product_search(search_term)
     ).offset(skip).limit(limit).all()
 
+def count_products(db: Session, category_id: Optional[int] = None, search_term: Optional[str] = None) -> int:
+    """Total behind get_products, or behind search_products when a search term is given."""
+    query = db.query(func.count(models.Product.id))
+    if search_term:
+        query = query.filter(_product_search(search_term))
+    elif category_id:
+        query = query.filter(models.Product.category_id == category_id)
+    return query.scalar()
+
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(**product.dict())
     db.add(db_product)
@@ -136,6 +228,112 @@ def delete_product(db: Session, product_id: int):
         db.commit()
     return db_product
 
+def match_products(db: Session, selector: schemas.ProductSelector) -> List[int]:
+    return _matching_ids(db, models.Product.__table__, _select_products(selector))
+
+def delete_products(db: Session, product_ids: List[int]) -> dict:
+    """Delete products with their stock rows, forecasts and sales rollups in one transaction.
+
+    Products that order lines, purchase order lines or the ledger still refer to are
+    kept and returned in "skipped"; discontinue those instead.
+    """
+    products = models.Product.__table__
+    product_ids = _lock_ids(db, products, product_ids)
+    if not product_ids:
+        db.rollback()
+        return {"deleted": 0, "skipped": []}
+    in_use = set(db.execute(union(*(
+        select(table.c.product_id).where(table.c.product_id.in_(product_ids))
+        for table in (models.OrderItem.__table__, models.PurchaseOrderItem.__table__, models.InventoryTransaction.__table__)
+    ))).scalars())
+    removable = [product_id for product_id in product_ids if product_id not in in_use]
+    deleted = 0
+    if removable:
+        for model in (models.InventoryShard, models.Inventory, models.ProductForecast, models.DailyProductSales):
+            db.execute(delete(model.__table__).where(model.__table__.c.product_id.in_(removable)))
+        deleted = db.execute(delete(products).where(products.c.id.in_(removable))).rowcount
+    db.commit()
+    return {"deleted": deleted, "skipped": sorted(in_use)}
+
+def _category_subtree(category_id: int):
+    """Ids of a category and all its subcategories, walked by a recursive CTE.
+
+    The CTE is nested inside the subquery so an UPDATE using it still starts with
+    UPDATE; SQLite reports no row count for WITH ... UPDATE.
+    """
+    categories = models.Category.__table__
+    tree = select(categories.c.id).where(categories.c.id == category_id).cte("category_tree", recursive=True, nesting=True)
+    tree = tree.union_all(select(categories.c.id).where(categories.c.parent_id == tree.c.id))
+    return select(tree.c.id)
+
+def _select_products(selector: schemas.ProductSelector):
+    products = models.Product.__table__
+    conditions = []
+    if selector.ids:
+        conditions.append(products.c.id.in_(selector.ids))
+    if selector.category_id is not None:
+        conditions.append(products.c.category_id.in_(_category_subtree(selector.category_id)))
+    if selector.brand is not None:
+        conditions.append(products.c.brand == selector.brand)
+    if selector.status is not None:
+        conditions.append(products.c.status == selector.status)
+    if not conditions:
+        raise InvalidRequestError("Select products by ids, category_id, brand or status")
+    return and_(*conditions)
+
+def _bulk_product_values(operation: schemas.ProductBulkOperation) -> dict:
+    products = models.Product.__table__
+    if operation.price is not None and operation.price_change_percent is not None:
+        raise InvalidRequestError("Set either price or price_change_percent, not both")
+    if (operation.min_stock_level is not None and operation.max_stock_level is not None
+            and operation.min_stock_level > operation.max_stock_level):
+        raise InvalidRequestError("min_stock_level must not be above max_stock_level")
+    values = operation.dict(exclude_none=True, exclude={"price_change_percent"})
+    if operation.price_change_percent is not None:
+        values["price"] = func.round(products.c.price * (1 + operation.price_change_percent / 100), 2)
+    if not values:
+        raise InvalidRequestError("The operation does not change anything")
+    return values
+
+def bulk_update_products(db: Session, request: schemas.ProductBulkUpdate):
+    """Apply one operation to every selected product with a single UPDATE.
+
+    The count and the before/after sample are read in the same transaction, just
+    before the UPDATE; a dry run stops there. New prices are computed by the
+    database, so the sample shows exactly what the UPDATE writes.
+    """
+    products = models.Product.__table__
+    condition = _select_products(request.selector)
+    values = _bulk_product_values(request.operation)
+
+    matched = db.execute(select(func.count()).select_from(products).where(condition)).scalar()
+    computed = {"price": values["price"]} if request.operation.price_change_percent is not None else {}
+    rows = db.execute(
+        select(products.c.id, products.c.sku, *(products.c[field] for field in values),
+               *(value.label(f"new_{field}") for field, value in computed.items()))
+        .where(condition)
+        .order_by(products.c.id)
+        .limit(schemas.BULK_UPDATE_SAMPLE_SIZE)
+    ).mappings().all()
+
+    def plain(value):
+        return value.value if isinstance(value, models.ProductStatus) else value
+
+    sample = [{
+        "id": row["id"],
+        "sku": row["sku"],
+        "before": {field: plain(row[field]) for field in values},
+        "after": {field: plain(row[f"new_{field}"] if field in computed else value) for field, value in values.items()}
+    } for row in rows]
+
+    updated = 0
+    if request.dry_run:
+        db.rollback()
+    else:
+        updated = db.execute(update(products).where(condition).values(**values)).rowcount
+        db.commit()
+    return {"matched": matched, "updated": updated, "dry_run": request.dry_run, "sample": sample}
+
 # Inventory CRUD operations
 def get_inventory(db: Session, product_id: int):
     return db.query(models.Inventory).filter(models.Inventory.product_id == product_id).first()
@@ -143,19 +341,40 @@ def get_inventory(db: Session, product_id: int):
 def get_all_inventory(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Inventory).offset(skip).limit(limit).all()
 
+def count_inventory(db: Session) -> int:
+    return db.query(func.count(models.Inventory.id)).scalar()
+
+def lookup_inventory(db: Session, product_ids: List[int], skus: List[str]):
+    """Fetch inventory by product id or SKU in a single query."""
+    if not product_ids and not skus:
+        return []
+    return db.query(models.Inventory).join(models.Inventory.product).options(
+        contains_eager(models.Inventory.product).joinedload(models.Product.category)
+    ).filter(
+        or_(models.Inventory.product_id.in_(product_ids), models.Product.sku.in_(skus))
+    ).all()
+
 def get_low_stock_products(db: Session):
     return db.query(models.Inventory).join(models.Product).filter(
         models.Inventory.current_stock <= models.Product.min_stock_level
     ).all()
 
-def update_inventory(db: Session, product_id: int, inventory_update: schemas.InventoryUpdate):
+def update_inventory(db: Session, product_id: int, inventory_update: schemas.InventoryUpdate, expected_version: Optional[int] = None):
     db_inventory = get_inventory(db, product_id)
     if db_inventory:
+        _check_version(db_inventory, expected_version)
+        if db_inventory.shard_count:
+            # The new levels are absolute, so pending shard reservations are folded in first
+            stock_shards.fold(db, [product_id])
         update_data = inventory_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_inventory, field, value)
         db_inventory.available_stock = db_inventory.current_stock - db_inventory.reserved_stock
-        db.commit()
+        outbox.record_inventory_event(db, "inventory.updated", db_inventory)
+        _commit_versioned(db, lambda: get_inventory(db, product_id))
+        if db_inventory.shard_count:
+            stock_shards.rebalance(db, [product_id])
+            db.commit()
         db.refresh(db_inventory)
     return db_inventory
 
@@ -166,6 +385,9 @@ def get_supplier(db: Session, supplier_id: int):
 def get_suppliers(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Supplier).offset(skip).limit(limit).all()
 
+def count_suppliers(db: Session) -> int:
+    return db.query(func.count(models.Supplier.id)).scalar()
+
 def create_supplier(db: Session, supplier: schemas.SupplierCreate):
     db_supplier = models.Supplier(**supplier.dict())
     db.add(db_supplier)
@@ -191,12 +413,25 @@ def delete_supplier(db: Session, supplier_id: int):
     return db_supplier
 
 # Customer CRUD operations
-def get_customer(db: Session, customer_id: int):
-    return db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+def get_customer(db: Session, customer_id: int, with_summary: bool = False):
+    query = db.query(models.Customer)
+    if with_summary:
+        query = query.options(joinedload(models.Customer.summary))
+    return query.filter(models.Customer.id == customer_id).first()
 
 def get_customers(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Customer).offset(skip).limit(limit).all()
 
+def get_top_customers(db: Session, sort_by: str = "lifetime_spend", skip: int = 0, limit: int = 10):
+    """Customers ranked by a summary column, read from the indexed summaries without touching orders."""
+    summary = models.CustomerSummary
+    return db.query(summary).options(joinedload(summary.customer)).filter(summary.order_count > 0).order_by(
+        getattr(summary, sort_by).desc(), summary.customer_id
+    ).offset(skip).limit(limit).all()
+
+def count_customers(db: Session) -> int:
+    return db.query(func.count(models.Customer.id)).scalar()
+
 def create_customer(db: Session, customer: schemas.CustomerCreate):
     db_customer = models.Customer(**customer.dict())
     db.add(db_customer)
@@ -231,9 +466,72 @@ def get_orders(db: Session, skip: int = 0, limit: int = 100, customer_id: Option
         query = query.filter(models.Order.customer_id == customer_id)
     return query.offset(skip).limit(limit).all()
 
+def count_orders(db: Session, customer_id: Optional[int] = None) -> int:
+    query = db.query(func.count(models.Order.id))
+    if customer_id:
+        query = query.filter(models.Order.customer_id == customer_id)
+    return query.scalar()
+
+def generate_order_number(db: Session):
+    return numbering.next_number(db, "order", "ORD")
+
+def _move_reservations(db: Session, items, order_id: int, sign: int = 1) -> set:
+    """Reserve (sign=1) or release (sign=-1) the stock for an order's lines in the caller's transaction.
+
+    Inventory rows change with one SQL-side increment per call, so concurrent orders
+    for a product add up instead of failing the row's version check. Sharded
+    products go through their shards; the ones whose shards ran dry are returned
+    for rebalancing.
+    """
+    inventory = models.Inventory.__table__
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return set()
+
+    event_type = "inventory.reserved" if sign > 0 else "inventory.released"
+    rows = db.execute(
+        select(inventory.c.product_id, inventory.c.shard_count, inventory.c.current_stock,
+               inventory.c.reserved_stock, inventory.c.available_stock)
+        .where(inventory.c.product_id.in_(list(quantities)))
+    ).all()
+    dry_shards = set()
+    unsharded = {}
+    for row in rows:
+        quantity = quantities[row.product_id]
+        if not row.shard_count:
+            unsharded[row.product_id] = quantity
+            continue
+        # Hot products reserve on one of several shard rows instead of the single inventory row
+        if sign > 0:
+            if stock_shards.reserve(db, row.product_id, quantity, row.shard_count):
+                dry_shards.add(row.product_id)
+        else:
+            stock_shards.release(db, row.product_id, quantity, row.shard_count)
+        outbox.record_inventory_event(db, event_type, stock_shards.snapshot(db, row),
+                                      quantity=quantity, order_id=order_id)
+
+    if unsharded:
+        delta = case(unsharded, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(unsharded)))
+            .values(
+                reserved_stock=inventory.c.reserved_stock + sign * delta,
+                available_stock=inventory.c.available_stock - sign * delta,
+                version=inventory.c.version + 1,
+                last_updated=func.now()
+            )
+        )
+        outbox.record_inventory_events(db, event_type, {
+            product_id: {"quantity": quantity, "order_id": order_id} for product_id, quantity in unsharded.items()
+        })
+    return dry_shards
+
 def create_order(db: Session, order: schemas.OrderCreate, user_id: int):
     # Generate order number
-    order_number = f"ORD-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+    order_number = generate_order_number(db)
     
     db_order = models.Order(
         order_number=order_number,
@@ -243,50 +541,239 @@ def create_order(db: Session, order: schemas.OrderCreate, user_id: int):
         notes=order.notes
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    # Flush for the order id only; the header commits together with its items and reservations
+    db.flush()
     
     # Create order items
     for item in order.items:
-        db_order_item = models.OrderItem(
+        db.add(models.OrderItem(
             order_id=db_order.id,
             **item.dict()
-        )
-        db.add(db_order_item)
-        
-        # Update inventory
-        inventory = get_inventory(db, item.product_id)
-        if inventory:
-            inventory.reserved_stock += item.quantity
-            inventory.available_stock = inventory.current_stock - inventory.reserved_stock
+        ))
+    dry_shards = _move_reservations(db, order.items, db_order.id)
     
+    rollups.apply_order_items(db, db_order, order.items)
+    rollups.apply_customer_orders(db, [db_order])
     db.commit()
+    db.refresh(db_order)
+    if dry_shards:
+        # Rebalance in a transaction of its own, holding no shard locks from the order
+        stock_shards.rebalance(db, dry_shards)
+        db.commit()
     return db_order
 
-def update_order(db: Session, order_id: int, order_update: schemas.OrderUpdate):
+def update_order(db: Session, order_id: int, order_update: schemas.OrderUpdate, expected_version: Optional[int] = None):
     db_order = get_order(db, order_id)
     if db_order:
+        _check_version(db_order, expected_version)
+        was_cancelled = db_order.status == models.OrderStatus.cancelled
+        before = SimpleNamespace(id=db_order.id, customer_id=db_order.customer_id,
+                                 total_amount=db_order.total_amount, created_at=db_order.created_at)
         update_data = order_update.dict(exclude_unset=True)
+        # Shipping turns reservations into sales, which only ship_orders does
+        fulfilled = (models.OrderStatus.shipped, models.OrderStatus.delivered)
+        if "status" in update_data and (update_data["status"] in fulfilled) != (db_order.status in fulfilled):
+            raise InvalidRequestError(
+                "Ship orders with POST /orders/{order_id}/ship; shipped and delivered orders cannot be reopened"
+            )
         for field, value in update_data.items():
             setattr(db_order, field, value)
-        db.commit()
+        
+        # Cancelled orders do not count towards sales rollups or customer summaries
+        is_cancelled = db_order.status == models.OrderStatus.cancelled
+        if is_cancelled != was_cancelled:
+            rollups.apply_order_items(db, db_order, db_order.order_items, sign=-1 if is_cancelled else 1)
+        if (is_cancelled, db_order.total_amount) != (was_cancelled, before.total_amount):
+            if not was_cancelled:
+                rollups.apply_customer_orders(db, [before], sign=-1)
+            if not is_cancelled:
+                rollups.apply_customer_orders(db, [db_order])
+        _commit_versioned(db, lambda: get_order(db, order_id))
         db.refresh(db_order)
     return db_order
 
 def delete_order(db: Session, order_id: int):
     db_order = get_order(db, order_id)
     if db_order:
-        # Release reserved inventory
-        for item in db_order.order_items:
-            inventory = get_inventory(db, item.product_id)
-            if inventory:
-                inventory.reserved_stock -= item.quantity
-                inventory.available_stock = inventory.current_stock - inventory.reserved_stock
+        # Release reserved inventory; shipped and delivered orders released theirs when they shipped
+        if db_order.status not in (models.OrderStatus.shipped, models.OrderStatus.delivered):
+            _move_reservations(db, db_order.order_items, db_order.id, sign=-1)
+        
+        if db_order.status != models.OrderStatus.cancelled:
+            rollups.apply_order_items(db, db_order, db_order.order_items, sign=-1)
+            rollups.apply_customer_orders(db, [db_order], sign=-1)
         
+        # Delete order items first
+        for item in db_order.order_items:
+            db.delete(item)
         db.delete(db_order)
         db.commit()
     return db_order
 
+def ship_orders(db: Session, order_ids: List[int], user_id: int, notes: Optional[str] = None):
+    """Ship a batch of orders, turning their reservations into sales in one transaction.
+
+    Orders are checked in id order against the locked stock rows. An order that
+    cannot ship in full is reported in "failed" and leaves stock untouched; the
+    rest are written with one UPDATE per table and one bulk ledger insert.
+    """
+    requested = list(dict.fromkeys(order_ids))
+    orders = db.query(models.Order).options(selectinload(models.Order.order_items)).filter(
+        models.Order.id.in_(requested)
+    ).order_by(models.Order.id).with_for_update().all()
+    found = {order.id for order in orders}
+    failed = [{"order_id": order_id, "detail": "Order not found"} for order_id in requested if order_id not in found]
+
+    product_ids = {item.product_id for order in orders for item in order.order_items}
+    # Reservations still held in stock shards must be on the inventory rows before they are released
+    stock_shards.fold(db, product_ids)
+    inventory = models.Inventory.__table__
+    stock = {
+        row.product_id: [row.current_stock, row.reserved_stock]
+        for row in db.execute(
+            select(inventory.c.product_id, inventory.c.current_stock, inventory.c.reserved_stock)
+            .where(inventory.c.product_id.in_(list(product_ids)))
+            .with_for_update()
+        )
+    }
+
+    shipped = []
+    ledger = []
+    sold = {}
+    released = {}
+    shippable = (models.OrderStatus.pending, models.OrderStatus.confirmed)
+    for order in orders:
+        if order.status not in shippable:
+            failed.append({"order_id": order.id, "detail": f"Order is {order.status.value}"})
+            continue
+        needed = {}
+        for item in order.order_items:
+            needed[item.product_id] = needed.get(item.product_id, 0) + item.quantity
+        short = sorted(
+            product_id for product_id, quantity in needed.items()
+            if product_id not in stock or stock[product_id][0] < quantity
+        )
+        if short:
+            failed.append({"order_id": order.id, "detail": f"Insufficient stock for products: {short}"})
+            continue
+
+        for item in order.order_items:
+            levels = stock[item.product_id]
+            previous_stock = levels[0]
+            # Orders placed before an inventory row existed hold no reservation to release
+            release = min(item.quantity, levels[1])
+            levels[0] -= item.quantity
+            levels[1] -= release
+            sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
+            released[item.product_id] = released.get(item.product_id, 0) + release
+            ledger.append({
+                "product_id": item.product_id,
+                "user_id": user_id,
+                "transaction_type": models.TransactionType.sale,
+                "quantity": item.quantity,
+                "previous_stock": previous_stock,
+                "new_stock": levels[0],
+                "reference_id": order.id,
+                "reference_type": "order",
+                "notes": notes
+            })
+        shipped.append(order.id)
+
+    if shipped:
+        sold_case = case(sold, value=inventory.c.product_id)
+        released_case = case(released, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(sold)))
+            .values(
+                current_stock=inventory.c.current_stock - sold_case,
+                reserved_stock=inventory.c.reserved_stock - released_case,
+                available_stock=inventory.c.available_stock - sold_case + released_case,
+                version=inventory.c.version + 1,
+                last_updated=func.now()
+            )
+        )
+        orders_table = models.Order.__table__
+        db.execute(
+            update(orders_table)
+            .where(orders_table.c.id.in_(shipped))
+            .values(status=models.OrderStatus.shipped, version=orders_table.c.version + 1, updated_at=func.now())
+        )
+        db.execute(insert(models.InventoryTransaction), ledger)
+        outbox.record_inventory_events(db, "inventory.adjusted", {
+            product_id: {"transaction_type": models.TransactionType.sale.value, "quantity": quantity, "reference_type": "order"}
+            for product_id, quantity in sold.items()
+        })
+    db.commit()
+    return {
+        "shipped": shipped,
+        "failed": sorted(failed, key=lambda failure: failure["order_id"]),
+        "units_shipped": sum(sold.values())
+    }
+
+def match_orders(db: Session, selector: schemas.OrderSelector) -> List[int]:
+    orders = models.Order.__table__
+    return _matching_ids(db, orders, _select_documents(orders, selector, orders.c.customer_id, selector.customer_id))
+
+def delete_orders(db: Session, order_ids: List[int]) -> dict:
+    """Delete orders and their lines with set-based statements in one transaction.
+
+    Reservations are released with one UPDATE of the inventory rows, summed per
+    product. Shipped and delivered orders are left out of the release, as their
+    reservations were released when they shipped. Sharded products are folded
+    first and rebalanced once the deletes have committed.
+    """
+    orders = models.Order.__table__
+    items = models.OrderItem.__table__
+    inventory = models.Inventory.__table__
+    order_ids = _lock_ids(db, orders, order_ids)
+    if not order_ids:
+        db.rollback()
+        return {"deleted": 0, "skipped": []}
+
+    released = {
+        product_id: int(quantity) for product_id, quantity in db.execute(
+            select(items.c.product_id, func.sum(items.c.quantity))
+            .join(orders, orders.c.id == items.c.order_id)
+            .where(orders.c.id.in_(order_ids),
+                   orders.c.status.notin_([models.OrderStatus.shipped, models.OrderStatus.delivered]))
+            .group_by(items.c.product_id)
+        )
+    }
+    sharded = []
+    if released:
+        sharded = list(db.execute(
+            select(inventory.c.product_id).where(inventory.c.product_id.in_(list(released)), inventory.c.shard_count > 0)
+        ).scalars())
+        stock_shards.fold(db, sharded)
+        delta = case(released, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(released)))
+            .values(
+                reserved_stock=inventory.c.reserved_stock - delta,
+                available_stock=inventory.c.available_stock + delta,
+                version=inventory.c.version + 1,
+                last_updated=func.now()
+            )
+        )
+        outbox.record_inventory_events(db, "inventory.released", {
+            product_id: {"quantity": quantity, "reference_type": "order"} for product_id, quantity in released.items()
+        })
+
+    rollups.remove_orders(db, order_ids)
+    rollups.apply_customer_orders(db, db.execute(
+        select(orders.c.id, orders.c.customer_id, orders.c.total_amount, orders.c.created_at)
+        .where(orders.c.id.in_(order_ids), orders.c.status != models.OrderStatus.cancelled)
+    ).all(), sign=-1)
+    db.execute(delete(items).where(items.c.order_id.in_(order_ids)))
+    deleted = db.execute(delete(orders).where(orders.c.id.in_(order_ids))).rowcount
+    db.commit()
+    if sharded:
+        stock_shards.rebalance(db, sharded)
+        db.commit()
+    return {"deleted": deleted, "skipped": []}
+
 # Purchase Order CRUD operations
 def get_purchase_order(db: Session, po_id: int):
     return db.query(models.PurchaseOrder).filter(models.PurchaseOrder.id == po_id).first()
@@ -297,9 +784,18 @@ def get_purchase_orders(db: Session, skip: int = 0, limit: int = 100, supplier_i
         query = query.filter(models.PurchaseOrder.supplier_id == supplier_id)
     return query.offset(skip).limit(limit).all()
 
+def count_purchase_orders(db: Session, supplier_id: Optional[int] = None) -> int:
+    query = db.query(func.count(models.PurchaseOrder.id))
+    if supplier_id:
+        query = query.filter(models.PurchaseOrder.supplier_id == supplier_id)
+    return query.scalar()
+
+def generate_po_number(db: Session):
+    return numbering.next_number(db, "purchase_order", "PO")
+
 def create_purchase_order(db: Session, po: schemas.PurchaseOrderCreate, user_id: int):
     # Generate PO number
-    po_number = f"PO-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+    po_number = generate_po_number(db)
     
     db_po = models.PurchaseOrder(
         po_number=po_number,
@@ -324,13 +820,14 @@ def create_purchase_order(db: Session, po: schemas.PurchaseOrderCreate, user_id:
     db.commit()
     return db_po
 
-def update_purchase_order(db: Session, po_id: int, po_update: schemas.PurchaseOrderUpdate):
+def update_purchase_order(db: Session, po_id: int, po_update: schemas.PurchaseOrderUpdate, expected_version: Optional[int] = None):
     db_po = get_purchase_order(db, po_id)
     if db_po:
+        _check_version(db_po, expected_version)
         update_data = po_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_po, field, value)
-        db.commit()
+        _commit_versioned(db, lambda: get_purchase_order(db, po_id))
         db.refresh(db_po)
     return db_po
 
@@ -344,13 +841,186 @@ def delete_purchase_order(db: Session, po_id: int):
         db.commit()
     return db_po
 
-# Inventory Transaction CRUD operations
-def create_inventory_transaction(db: Session, transaction: schemas.InventoryTransactionCreate, user_id: int):
-    # Get current inventory
-    inventory = get_inventory(db, transaction.product_id)
-    if not inventory:
+def match_purchase_orders(db: Session, selector: schemas.PurchaseOrderSelector) -> List[int]:
+    purchase_orders = models.PurchaseOrder.__table__
+    return _matching_ids(db, purchase_orders, _select_documents(
+        purchase_orders, selector, purchase_orders.c.supplier_id, selector.supplier_id
+    ))
+
+def delete_purchase_orders(db: Session, po_ids: List[int]) -> dict:
+    """Delete purchase orders and their lines with two DELETE statements in one transaction."""
+    purchase_orders = models.PurchaseOrder.__table__
+    items = models.PurchaseOrderItem.__table__
+    po_ids = _lock_ids(db, purchase_orders, po_ids)
+    if not po_ids:
+        db.rollback()
+        return {"deleted": 0, "skipped": []}
+    db.execute(delete(items).where(items.c.purchase_order_id.in_(po_ids)))
+    deleted = db.execute(delete(purchase_orders).where(purchase_orders.c.id.in_(po_ids))).rowcount
+    db.commit()
+    return {"deleted": deleted, "skipped": []}
+
+def receive_purchase_order(db: Session, po_id: int, receipt: schemas.PurchaseOrderReceipt, user_id: int,
+                           expected_version: Optional[int] = None):
+    """Book received stock for some or all PO lines in one transaction.
+
+    Stock increments, received quantities and ledger rows are each written with a
+    single statement. The PO's version check guards against two concurrent receipts.
+    """
+    db_po = get_purchase_order(db, po_id)
+    if db_po is None:
         return None
-    
+    _check_version(db_po, expected_version)
+    if db_po.status in (models.OrderStatus.cancelled, models.OrderStatus.delivered):
+        raise InvalidStateError(f"Purchase order is {db_po.status.value}")
+
+    items = {item.id: item for item in db_po.purchase_order_items}
+    if receipt.lines is None:
+        quantities = {
+            item.id: item.quantity - item.received_quantity
+            for item in items.values() if item.quantity > item.received_quantity
+        }
+    else:
+        quantities = {}
+        for line in receipt.lines:
+            quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+        unknown = sorted(item_id for item_id in quantities if item_id not in items)
+        if unknown:
+            raise InvalidRequestError(f"Items not on this purchase order: {unknown}")
+        over = sorted(
+            item_id for item_id, quantity in quantities.items()
+            if items[item_id].received_quantity + quantity > items[item_id].quantity
+        )
+        if over:
+            raise InvalidRequestError(f"Received quantity exceeds ordered quantity for items: {over}")
+    if not quantities:
+        raise InvalidRequestError("Nothing left to receive")
+
+    per_product = {}
+    for item_id, quantity in quantities.items():
+        product_id = items[item_id].product_id
+        per_product[product_id] = per_product.get(product_id, 0) + quantity
+
+    inventory = models.Inventory.__table__
+    # Lock the stock rows first so the ledger's previous_stock matches what we update
+    current = dict(db.execute(
+        select(inventory.c.product_id, inventory.c.current_stock)
+        .where(inventory.c.product_id.in_(list(per_product)))
+        .with_for_update()
+    ).all())
+    existing = {product_id: quantity for product_id, quantity in per_product.items() if product_id in current}
+    if existing:
+        increment = case(existing, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(existing)))
+            .values(
+                current_stock=inventory.c.current_stock + increment,
+                available_stock=inventory.c.available_stock + increment,
+                version=inventory.c.version + 1,
+                last_updated=func.now()
+            )
+        )
+    missing = [product_id for product_id in per_product if product_id not in current]
+    if missing:
+        db.execute(insert(inventory), [
+            {
+                "product_id": product_id,
+                "current_stock": per_product[product_id],
+                "reserved_stock": 0,
+                "available_stock": per_product[product_id],
+                "version": 1
+            }
+            for product_id in missing
+        ])
+
+    po_items = models.PurchaseOrderItem.__table__
+    db.execute(
+        update(po_items)
+        .where(po_items.c.id.in_(list(quantities)))
+        .values(received_quantity=po_items.c.received_quantity + case(quantities, value=po_items.c.id))
+    )
+
+    running = {product_id: current.get(product_id, 0) for product_id in per_product}
+    ledger = []
+    for item_id, quantity in quantities.items():
+        product_id = items[item_id].product_id
+        previous_stock = running[product_id]
+        running[product_id] += quantity
+        ledger.append({
+            "product_id": product_id,
+            "user_id": user_id,
+            "transaction_type": models.TransactionType.purchase,
+            "quantity": quantity,
+            "previous_stock": previous_stock,
+            "new_stock": running[product_id],
+            "reference_id": po_id,
+            "reference_type": "purchase_order",
+            "notes": receipt.notes
+        })
+    db.execute(insert(models.InventoryTransaction), ledger)
+    outbox.record_inventory_events(db, "inventory.adjusted", {
+        product_id: {
+            "transaction_type": models.TransactionType.purchase.value,
+            "quantity": quantity,
+            "reference_id": po_id,
+            "reference_type": "purchase_order"
+        }
+        for product_id, quantity in per_product.items()
+    })
+
+    lines = [
+        {
+            "item_id": item_id,
+            "product_id": items[item_id].product_id,
+            "quantity": quantity,
+            "received_quantity": items[item_id].received_quantity + quantity,
+            "ordered_quantity": items[item_id].quantity
+        }
+        for item_id, quantity in quantities.items()
+    ]
+    fully_received = all(
+        item.received_quantity + quantities.get(item.id, 0) >= item.quantity for item in items.values()
+    )
+    if fully_received:
+        db_po.status = models.OrderStatus.delivered
+    # Always touch the PO so its version moves and a concurrent receipt conflicts
+    db_po.updated_at = func.now()
+    _commit_versioned(db, lambda: get_purchase_order(db, po_id))
+    db.refresh(db_po)
+    return {
+        "purchase_order": db_po,
+        "lines": lines,
+        "units_received": sum(quantities.values()),
+        "fully_received": fully_received
+    }
+
+# Inventory Transaction CRUD operations
+def _lock_stock(db: Session, product_ids) -> dict:
+    """Lock the inventory rows of product_ids and return their stock levels by product id.
+
+    The rows are locked with an UPDATE that bumps their version, which holds on
+    every backend (SQLite ignores FOR UPDATE), so the levels read back cannot
+    change before the caller writes them.
+    """
+    inventory = models.Inventory.__table__
+    product_ids = sorted(set(product_ids))
+    db.execute(
+        update(inventory)
+        .where(inventory.c.product_id.in_(product_ids))
+        .values(version=inventory.c.version + 1, last_updated=func.now())
+    )
+    return {
+        row.product_id: SimpleNamespace(**row._mapping) for row in db.execute(
+            select(inventory.c.product_id, inventory.c.shard_count, inventory.c.current_stock,
+                   inventory.c.reserved_stock, inventory.c.available_stock)
+            .where(inventory.c.product_id.in_(product_ids))
+        )
+    }
+
+def _apply_movement(db: Session, inventory: SimpleNamespace, transaction: schemas.InventoryTransactionCreate,
+                    user_id: int) -> models.InventoryTransaction:
+    """Apply one stock movement to locked stock levels and return its unsaved ledger row."""
     previous_stock = inventory.current_stock
     
     # Update inventory based on transaction type
@@ -365,9 +1035,16 @@ def create_inventory_transaction(db: Session, transaction: schemas.InventoryTran
         inventory.current_stock = transaction.quantity
     
     inventory.available_stock = inventory.current_stock - inventory.reserved_stock
+    outbox.record_inventory_event(
+        db, "inventory.adjusted", stock_shards.snapshot(db, inventory) if inventory.shard_count else inventory,
+        transaction_type=transaction.transaction_type.value,
+        quantity=transaction.quantity,
+        previous_stock=previous_stock,
+        reference_id=transaction.reference_id,
+        reference_type=transaction.reference_type
+    )
     
-    # Create transaction record
-    db_transaction = models.InventoryTransaction(
+    return models.InventoryTransaction(
         product_id=transaction.product_id,
         user_id=user_id,
         transaction_type=transaction.transaction_type,
@@ -378,14 +1055,99 @@ def create_inventory_transaction(db: Session, transaction: schemas.InventoryTran
         reference_type=transaction.reference_type,
         notes=transaction.notes
     )
-    db.add(db_transaction)
+
+def create_inventory_transaction(db: Session, transaction: schemas.InventoryTransactionCreate, user_id: int):
+    return create_inventory_transactions(db, [(transaction, user_id)])[0]
+
+def create_inventory_transactions(db: Session, movements: List[Tuple[schemas.InventoryTransactionCreate, int]]):
+    """Apply (transaction, user_id) movements in order and commit them in one transaction.
+
+    Returns the ledger row for each movement, with product and user loaded, or None
+    where the product has no inventory.
+    """
+    inventory = models.Inventory.__table__
+    stock = _lock_stock(db, [transaction.product_id for transaction, _ in movements])
+    rows = []
+    for transaction, user_id in movements:
+        levels = stock.get(transaction.product_id)
+        rows.append(None if levels is None else _apply_movement(db, levels, transaction, user_id))
+    for levels in stock.values():
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id == levels.product_id)
+            .values(current_stock=levels.current_stock, reserved_stock=levels.reserved_stock,
+                    available_stock=levels.available_stock)
+        )
+    db.add_all([row for row in rows if row is not None])
+    db.flush()
+    ids = [None if row is None else row.id for row in rows]
     db.commit()
-    db.refresh(db_transaction)
-    
-    return db_transaction
 
-def get_inventory_transactions(db: Session, skip: int = 0, limit: int = 100, product_id: Optional[int] = None):
-    query = db.query(models.InventoryTransaction)
+    loaded = {
+        row.id: row for row in db.query(models.InventoryTransaction).options(
+            joinedload(models.InventoryTransaction.product), joinedload(models.InventoryTransaction.user)
+        ).filter(models.InventoryTransaction.id.in_([row_id for row_id in ids if row_id is not None]))
+    }
+    return [None if row_id is None else loaded[row_id] for row_id in ids]
+
+def _ledger_window(date_from: Optional[date], date_to: Optional[date]):
+    start = datetime.combine(date_from, datetime.min.time()) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time()) if date_to else None
+    return start, end
+
+def _filter_ledger(query, product_id: Optional[int], start: Optional[datetime], end: Optional[datetime]):
     if product_id:
         query = query.filter(models.InventoryTransaction.product_id == product_id)
-    return query.order_by(models.InventoryTransaction.created_at.desc()).offset(skip).limit(limit).all()
+    if start:
+        query = query.filter(models.InventoryTransaction.created_at >= start)
+    if end:
+        query = query.filter(models.InventoryTransaction.created_at < end)
+    return query
+
+def get_inventory_transactions(db: Session, skip: int = 0, limit: int = 100, product_id: Optional[int] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               archive_dir: Optional[str] = None):
+    """Newest-first ledger page over the hot table, continuing into archived months when the page runs past it."""
+    start, end = _ledger_window(date_from, date_to)
+    query = _filter_ledger(db.query(models.InventoryTransaction), product_id, start, end)
+    transactions = query.order_by(models.InventoryTransaction.created_at.desc()).offset(skip).limit(limit).all()
+    if len(transactions) == limit:
+        return transactions
+
+    # Archived months are all older than the hot table, so they only matter past its last row
+    archive_dir = archive_dir or ledger_archive.LEDGER_ARCHIVE_DIR
+    boundary = ledger_archive.archive_boundary(archive_dir)
+    if boundary is None or (start is not None and start >= boundary):
+        return transactions
+    hot_rows = skip + len(transactions) if transactions else query.count()
+    archive_skip = max(0, skip - hot_rows)
+    records = islice(ledger_archive.read_archived(archive_dir, product_id=product_id, date_from=start, date_to=end),
+                     archive_skip, archive_skip + limit - len(transactions))
+    return transactions + ledger_archive.as_transactions(db, list(records))
+
+def count_inventory_transactions(db: Session, product_id: Optional[int] = None, date_from: Optional[date] = None,
+                                 date_to: Optional[date] = None, archive_dir: Optional[str] = None) -> int:
+    """Total behind get_inventory_transactions, archived months included."""
+    start, end = _ledger_window(date_from, date_to)
+    total = _filter_ledger(db.query(func.count(models.InventoryTransaction.id)), product_id, start, end).scalar()
+    archive_dir = archive_dir or ledger_archive.LEDGER_ARCHIVE_DIR
+    boundary = ledger_archive.archive_boundary(archive_dir)
+    if boundary is None or (start is not None and start >= boundary):
+        return total
+    return total + ledger_archive.count_archived(archive_dir, product_id=product_id, date_from=start, date_to=end)
+
+# Forecast operations
+def get_product_forecast(db: Session, product_id: int):
+    return db.query(models.ProductForecast).filter(models.ProductForecast.product_id == product_id).first()
+
+def get_product_forecasts(db: Session, skip: int = 0, limit: int = 100, product_ids: Optional[List[int]] = None):
+    query = db.query(models.ProductForecast)
+    if product_ids:
+        query = query.filter(models.ProductForecast.product_id.in_(product_ids))
+    return query.order_by(models.ProductForecast.product_id).offset(skip).limit(limit).all()
+
+def count_product_forecasts(db: Session, product_ids: Optional[List[int]] = None) -> int:
+    query = db.query(func.count(models.ProductForecast.id))
+    if product_ids:
+        query = query.filter(models.ProductForecast.product_id.in_(product_ids))
+    return query.scalar()
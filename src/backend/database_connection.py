@@ -3,6 +3,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from pool_monitor import InstrumentedQueuePool
 
 load_dotenv()
 
@@ -13,14 +14,51 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "inventory_management")
 
+# Connection pool configuration
+# DB_MAX_CONNECTIONS is the share of MySQL's max_connections this service may use,
+# split across every uvicorn worker (WEB_CONCURRENCY) of every replica the HPA
+# may schedule (DB_MAX_REPLICAS).
+DEFAULT_POOL_SIZE = 5
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "150"))
+DB_MAX_REPLICAS = int(os.getenv("DB_MAX_REPLICAS", "1"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_POOL_SIZE = os.getenv("DB_POOL_SIZE")
+DB_MAX_OVERFLOW = os.getenv("DB_MAX_OVERFLOW")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+def derive_pool_settings(max_connections: int, replicas: int, workers: int,
+                         pool_size=None, max_overflow=None):
+    """Return (pool_size, max_overflow) that keeps every process within the connection budget."""
+    budget = max(1, max_connections // (max(1, replicas) * max(1, workers)))
+    if pool_size is None:
+        pool_size = min(DEFAULT_POOL_SIZE, budget)
+    pool_size = max(1, min(int(pool_size), budget))
+    if max_overflow is None:
+        max_overflow = budget - pool_size
+    max_overflow = max(0, min(int(max_overflow), budget - pool_size))
+    return pool_size, max_overflow
+
+POOL_SIZE, MAX_OVERFLOW = derive_pool_settings(
+    DB_MAX_CONNECTIONS,
+    DB_MAX_REPLICAS,
+    WEB_CONCURRENCY,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
+)
+
 # Create database URL
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Create engine
 engine = create_engine(
     DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
     pool_pre_ping=True,
-    pool_recycle=300,
+    pool_recycle=DB_POOL_RECYCLE,
     echo=False
 )
 
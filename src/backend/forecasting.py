@@ -0,0 +1,150 @@
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select, func, insert, delete
+from sqlalchemy.orm import Session
+import models
+
+SMOOTHING_ALPHAS = (0.1, 0.3, 0.5)
+MOVING_AVERAGE_WINDOWS = (7, 28)
+
+def load_daily_sales(db: Session, history_days: int, end_date: date = None):
+    """Aggregate sale movements into a dense (products x days) matrix, oldest day first."""
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=history_days - 1)
+
+    product_ids = np.asarray(
+        db.execute(
+            select(models.Product.id)
+            .where(models.Product.status == models.ProductStatus.active)
+            .order_by(models.Product.id)
+        ).scalars().all(),
+        dtype=np.int64
+    )
+    matrix = np.zeros((len(product_ids), history_days), dtype=np.float64)
+
+    sale_day = func.date(models.InventoryTransaction.created_at)
+    rows = db.execute(
+        select(
+            models.InventoryTransaction.product_id,
+            sale_day,
+            func.sum(func.abs(models.InventoryTransaction.quantity))
+        )
+        .where(
+            models.InventoryTransaction.transaction_type == models.TransactionType.sale,
+            models.InventoryTransaction.created_at >= start_date
+        )
+        .group_by(models.InventoryTransaction.product_id, sale_day)
+    ).all()
+    if not rows or not len(product_ids):
+        return product_ids, matrix
+
+    keys = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    days = np.array([str(row[1])[:10] for row in rows], dtype="datetime64[D]")
+    quantities = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+
+    day_index = (days - np.datetime64(start_date, "D")).astype(np.int64)
+    row_index = np.searchsorted(product_ids, keys)
+    row_clipped = np.minimum(row_index, len(product_ids) - 1)
+    valid = (product_ids[row_clipped] == keys) & (day_index >= 0) & (day_index < history_days)
+    np.add.at(matrix, (row_clipped[valid], day_index[valid]), quantities[valid])
+    return product_ids, matrix
+
+def fit_forecasts(matrix: np.ndarray, alphas=SMOOTHING_ALPHAS, windows=MOVING_AVERAGE_WINDOWS) -> dict:
+    """Fit every candidate model to every product at once and keep the lowest one-step-ahead MAE.
+
+    Candidates are simple exponential smoothing at each alpha and trailing moving
+    averages at each window. Errors are scored over the same trailing days for all
+    candidates so their MAE is comparable.
+    """
+    n_products, n_days = matrix.shape
+    windows = [w for w in windows if w < n_days]
+    start = max(windows, default=1)
+    scored_days = max(n_days - start, 1)
+
+    methods, parameters, demands, errors = [], [], [], []
+
+    # Simple exponential smoothing, vectorized over (alpha, product) and iterated over days
+    alpha = np.asarray(alphas, dtype=np.float64)[:, None]
+    level = np.broadcast_to(matrix[:, 0], (len(alphas), n_products)).copy()
+    abs_error = np.zeros_like(level)
+    for t in range(1, n_days):
+        observed = matrix[:, t]
+        if t >= start:
+            abs_error += np.abs(observed - level)
+        level = alpha * observed + (1 - alpha) * level
+    for index, value in enumerate(alphas):
+        methods.append("exponential_smoothing")
+        parameters.append(value)
+        demands.append(level[index])
+        errors.append(abs_error[index] / scored_days)
+
+    # Trailing moving averages from a single cumulative sum
+    cumulative = np.concatenate([np.zeros((n_products, 1)), np.cumsum(matrix, axis=1)], axis=1)
+    for window in windows:
+        # Forecast for day t is the mean of days [t - window, t)
+        predictions = (cumulative[:, start:n_days] - cumulative[:, start - window:n_days - window]) / window
+        mae = np.abs(matrix[:, start:n_days] - predictions).mean(axis=1)
+        methods.append("moving_average")
+        parameters.append(float(window))
+        demands.append((cumulative[:, n_days] - cumulative[:, n_days - window]) / window)
+        errors.append(mae)
+
+    errors = np.vstack(errors)
+    best = np.argmin(errors, axis=0)
+    columns = np.arange(n_products)
+    return {
+        "method": np.asarray(methods)[best],
+        "parameter": np.asarray(parameters, dtype=np.float64)[best],
+        "daily_demand": np.vstack(demands)[best, columns],
+        "mean_absolute_error": errors[best, columns],
+    }
+
+def run_forecast(db: Session, history_days: int = 90, horizon_days: int = 28) -> dict:
+    """Refresh the stored forecast for every active product."""
+    product_ids, matrix = load_daily_sales(db, history_days)
+    fitted = fit_forecasts(matrix)
+
+    db.execute(delete(models.ProductForecast))
+    if len(product_ids):
+        daily_demand = np.round(fitted["daily_demand"], 4)
+        db.execute(insert(models.ProductForecast), [
+            {
+                "product_id": int(product_id),
+                "method": str(method),
+                "parameter": float(parameter),
+                "daily_demand": float(demand),
+                "horizon_days": horizon_days,
+                "forecast_quantity": round(float(demand) * horizon_days, 2),
+                "mean_absolute_error": round(float(error), 4),
+                "history_days": history_days,
+            }
+            for product_id, method, parameter, demand, error in zip(
+                product_ids,
+                fitted["method"],
+                fitted["parameter"],
+                daily_demand,
+                fitted["mean_absolute_error"]
+            )
+        ])
+    db.commit()
+    return {
+        "products_forecast": int(len(product_ids)),
+        "history_days": history_days,
+        "horizon_days": horizon_days,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Refresh demand forecasts from the sales ledger")
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--horizon-days", type=int, default=28)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = run_forecast(db, history_days=args.history_days, horizon_days=args.horizon_days)
+        print(f"Forecast {result['products_forecast']} products over {result['horizon_days']} days")
+    finally:
+        db.close()
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import event, select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.1"))
+# Must outlast any request, including its lock and queue waits
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "300"))
+
+keys = models.IdempotencyKey.__table__
+MAX_KEY_LENGTH = keys.c.idempotency_key.type.length
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different payload."""
+
+class IdempotencyRequestInProgress(Exception):
+    """The original request is still running and did not finish within the wait timeout."""
+
+class IdempotencyResponseMissing(Exception):
+    """The original request's work committed, but its response was never stored."""
+
+class IdempotencyClaimLost(Exception):
+    """The claim's lease ran out and another request took the key over before this one committed."""
+
+def fingerprint(route: str, payload: str) -> str:
+    return hashlib.sha256(f"{route}\n{payload}".encode("utf-8")).hexdigest()
+
+class Claim:
+    """A key held by the request running its handler.
+
+    Attached to a session, the claim is marked used in the same transaction as the
+    first commit there, so the handler's work and the key commit together. If the
+    lease ran out and another request took the key over, that commit fails instead.
+    """
+
+    def __init__(self, user_id: int, key: str, claim_id: str, expires_at: datetime):
+        self.user_id = user_id
+        self.key = key
+        self.claim_id = claim_id
+        self.expires_at = expires_at
+        self.committed = False
+
+    def attach(self, session: Session):
+        event.listen(session, "before_commit", self._before_commit)
+        event.listen(session, "after_commit", self._after_commit)
+
+    def detach(self, session: Session):
+        event.remove(session, "before_commit", self._before_commit)
+        event.remove(session, "after_commit", self._after_commit)
+
+    def _before_commit(self, session: Session):
+        if self.committed:
+            return
+        marked = session.execute(
+            update(keys)
+            .where(keys.c.user_id == self.user_id, keys.c.idempotency_key == self.key,
+                   keys.c.claim_id == self.claim_id)
+            .values(claim_id=None, expires_at=self.expires_at)
+        ).rowcount
+        if not marked:
+            raise IdempotencyClaimLost()
+
+    def _after_commit(self, session: Session):
+        self.committed = True
+
+    def reopen(self, session: Session):
+        """Undo the mark after a commit that turned out to apply nothing for this claim."""
+        session.execute(
+            update(keys)
+            .where(keys.c.user_id == self.user_id, keys.c.idempotency_key == self.key, keys.c.claim_id.is_(None))
+            .values(claim_id=self.claim_id)
+        )
+        session.commit()
+        self.committed = False
+
+# The claim of the handler running in this context, for work it hands to another session
+active_claim: ContextVar[Optional[Claim]] = ContextVar("active_claim", default=None)
+
+def reopen_active_claim(db: Session):
+    """Give the running handler's key back after it committed without applying anything, so a retry runs again."""
+    claim = active_claim.get()
+    if claim is not None and claim.committed:
+        claim.reopen(db)
+
+class IdempotencyStore:
+    """Committed responses keyed by (user, Idempotency-Key) in the idempotency_keys table.
+
+    The first request for a key claims it by inserting a row without a response; the
+    primary key lets exactly one request win, in any process or replica. Duplicates
+    poll the row until the response is stored and then replay it. If the handler
+    raises before its work commits, the claim is deleted so a retry can run it again.
+
+    A claim is leased for lease_seconds, so one left behind by a crashed process is
+    taken over once the lease runs out. The handler's commit marks the key used, after
+    which it is kept for ttl_seconds and never taken over, even if the process dies
+    before storing the response. Duplicates then get IdempotencyResponseMissing.
+    """
+
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+                 poll_seconds: float = IDEMPOTENCY_POLL_SECONDS, lease_seconds: float = IDEMPOTENCY_LEASE_SECONDS,
+                 clock=datetime.now):
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+
+    def _claim(self, db: Session, user_id: int, key: str, request_fingerprint: str) -> Optional[Claim]:
+        now = self._clock()
+        where = (keys.c.user_id == user_id, keys.c.idempotency_key == key)
+        claim = Claim(user_id, key, uuid.uuid4().hex, now + timedelta(seconds=self.ttl_seconds))
+        try:
+            # Expired responses and abandoned claims give the key up
+            db.execute(delete(keys).where(*where, keys.c.expires_at <= now))
+            db.execute(insert(keys).values(
+                user_id=user_id, idempotency_key=key, fingerprint=request_fingerprint,
+                claim_id=claim.claim_id, expires_at=now + timedelta(seconds=self.lease_seconds)
+            ))
+            db.commit()
+            return claim
+        except IntegrityError:
+            db.rollback()
+            return None
+
+    def _read(self, db: Session, user_id: int, key: str):
+        row = db.execute(
+            select(keys.c.fingerprint, keys.c.response, keys.c.claim_id, keys.c.expires_at)
+            .where(keys.c.user_id == user_id, keys.c.idempotency_key == key)
+        ).first()
+        # End the read, so the next poll sees what the first request committed since
+        db.rollback()
+        return row
+
+    def _release(self, db: Session, claim: Claim):
+        db.rollback()
+        # A claim marked by committed work, or taken over by another request, stays
+        db.execute(delete(keys).where(keys.c.user_id == claim.user_id, keys.c.idempotency_key == claim.key,
+                                      keys.c.claim_id == claim.claim_id))
+        db.commit()
+
+    def _store(self, db: Session, claim: Claim, result):
+        owned = keys.c.claim_id.is_(None) if claim.committed else keys.c.claim_id == claim.claim_id
+        db.execute(
+            update(keys)
+            .where(keys.c.user_id == claim.user_id, keys.c.idempotency_key == claim.key, owned)
+            .values(response=json.dumps(result), claim_id=None,
+                    expires_at=self._clock() + timedelta(seconds=self.ttl_seconds))
+        )
+        db.commit()
+
+    def run(self, db: Session, user_id: int, key: str, request_fingerprint: str, handler):
+        """Return (result, replayed) for the user's key, running handler at most once per TTL window.
+
+        handler's result must be JSON serialisable; it is what duplicates replay.
+        Work that handler commits on another session must attach active_claim there.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            claim = self._claim(db, user_id, key, request_fingerprint)
+            if claim is not None:
+                claim.attach(db)
+                token = active_claim.set(claim)
+                try:
+                    try:
+                        result = handler()
+                    finally:
+                        active_claim.reset(token)
+                        claim.detach(db)
+                except BaseException:
+                    self._release(db, claim)
+                    raise
+                self._store(db, claim, result)
+                return result, False
+
+            row = self._read(db, user_id, key)
+            if row is None or row.expires_at <= self._clock():
+                # The first request failed and released the key, or its row expired; try to take it over
+                continue
+            if row.fingerprint != request_fingerprint:
+                raise IdempotencyKeyMismatch()
+            if row.response is not None:
+                return json.loads(row.response), True
+            if time.monotonic() >= deadline:
+                raise IdempotencyRequestInProgress() if row.claim_id is not None else IdempotencyResponseMissing()
+            time.sleep(self.poll_seconds)
+
+def purge_expired(db: Session, now: datetime = None) -> int:
+    """Delete expired responses and abandoned claims and return how many keys were removed."""
+    removed = db.execute(delete(keys).where(keys.c.expires_at <= (now or datetime.now()))).rowcount
+    db.commit()
+    return removed
+
+store = IdempotencyStore()
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain stored Idempotency-Key responses")
+    parser.add_argument("command", choices=["purge"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Removed {purge_expired(db)} expired idempotency keys")
+    finally:
+        db.close()
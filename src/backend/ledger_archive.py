@@ -0,0 +1,361 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from itertools import groupby
+from typing import Iterator, List, Optional
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+import models
+
+LEDGER_ARCHIVE_DIR = os.getenv("LEDGER_ARCHIVE_DIR", "ledger_archive")
+LEDGER_HOT_MONTHS = int(os.getenv("LEDGER_HOT_MONTHS", "12"))
+LEDGER_PARTITIONS_AHEAD = int(os.getenv("LEDGER_PARTITIONS_AHEAD", "3"))
+ARCHIVE_BATCH_SIZE = 10000
+MANIFEST_NAME = "manifest.json"
+
+ledger = models.InventoryTransaction.__table__
+LEDGER_COLUMNS = [column.name for column in ledger.columns]
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def _month_bounds(month: date):
+    return datetime.combine(month, datetime.min.time()), datetime.combine(add_months(month, 1), datetime.min.time())
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+# Manifest: one entry per archived segment file
+def load_manifest(archive_dir: str = LEDGER_ARCHIVE_DIR) -> dict:
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path) as handle:
+        return json.load(handle)
+
+def _replace_atomically(path: str, write):
+    """Write through a temporary file in the same directory, fsync it, then rename it over ``path``."""
+    directory = os.path.dirname(path) or "."
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            write(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+def save_manifest(manifest: dict, archive_dir: str = LEDGER_ARCHIVE_DIR):
+    manifest["segments"].sort(key=lambda segment: (segment["month"], segment["min_id"]))
+    body = json.dumps(manifest, indent=2).encode()
+    _replace_atomically(os.path.join(archive_dir, MANIFEST_NAME), lambda handle: handle.write(body))
+
+def archive_boundary(archive_dir: str = LEDGER_ARCHIVE_DIR) -> Optional[datetime]:
+    """End of the newest archived month; every hot ledger row is at or after it."""
+    segments = load_manifest(archive_dir)["segments"]
+    if not segments:
+        return None
+    return max(datetime.fromisoformat(segment["to"]) for segment in segments)
+
+# Native monthly partitions (MySQL). SQLite has none, so archiving falls back to range deletes there.
+def _is_mysql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+def existing_partitions(db: Session) -> dict:
+    """Partition name -> upper bound (UNIX time, or None for MAXVALUE); empty when unpartitioned."""
+    rows = db.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+    ), {"table": ledger.name}).all()
+    return {name: None if bound == "MAXVALUE" else int(bound) for name, bound in rows}
+
+def partition_table(db: Session):
+    """Convert an unpartitioned ledger (databases created before partitioning) in place.
+
+    MySQL forbids foreign keys on partitioned tables and requires the partitioning
+    column in every unique key, so the foreign keys are dropped and created_at
+    joins the primary key. This rebuilds the table once.
+    """
+    foreign_keys = db.execute(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+    ), {"table": ledger.name}).scalars().all()
+    for name in foreign_keys:
+        db.execute(text(f"ALTER TABLE {ledger.name} DROP FOREIGN KEY `{name}`"))
+    db.execute(text(
+        f"ALTER TABLE {ledger.name} "
+        "MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at), "
+        "ADD INDEX idx_inventory_transactions_created (created_at), "
+        "ADD INDEX idx_inventory_transactions_product (product_id, created_at) "
+        "PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    ))
+
+def ensure_partitions(db: Session, months_ahead: int = LEDGER_PARTITIONS_AHEAD, today: Optional[date] = None) -> List[str]:
+    """Split the catch-all partition so every month up to ``months_ahead`` has its own; return the new names.
+
+    The first run after partitioning also splits out every month that already
+    holds rows. Later runs only carve empty future months off ``pmax``, which is
+    instant.
+    """
+    if not _is_mysql(db):
+        return []
+    partitions = existing_partitions(db)
+    if not partitions:
+        partition_table(db)
+        partitions = existing_partitions(db)
+
+    bounds = [bound for bound in partitions.values() if bound is not None]
+    if bounds:
+        # Convert on the server so the session time zone matches the one used to write the bounds
+        first = month_start(db.execute(text("SELECT FROM_UNIXTIME(:bound)"), {"bound": max(bounds)}).scalar())
+    else:
+        oldest = db.execute(select(func.min(ledger.c.created_at))).scalar()
+        first = month_start(oldest or today or date.today())
+    last = add_months(month_start(today or date.today()), months_ahead)
+
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    if not months:
+        return []
+    definitions = ", ".join(
+        f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{add_months(month, 1)} 00:00:00'))"
+        for month in months
+    )
+    db.execute(text(
+        f"ALTER TABLE {ledger.name} REORGANIZE PARTITION pmax INTO "
+        f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    ))
+    return [partition_name(month) for month in months]
+
+# Archiving
+def _encode(row) -> bytes:
+    record = {}
+    for column, value in zip(LEDGER_COLUMNS, row):
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, models.TransactionType):
+            value = value.value
+        record[column] = value
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+def _decode(line: bytes) -> dict:
+    record = json.loads(line)
+    record["created_at"] = datetime.fromisoformat(record["created_at"])
+    record["transaction_type"] = models.TransactionType(record["transaction_type"])
+    return record
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _delete_archived(db: Session, month: date, min_id: int, max_id: int, rows: int):
+    """Remove a month's archived rows from the hot table, dropping its partition when it holds nothing else."""
+    start, end = _month_bounds(month)
+    name = partition_name(month)
+    if _is_mysql(db) and name in existing_partitions(db):
+        in_partition = db.execute(text(f"SELECT COUNT(*) FROM {ledger.name} PARTITION ({name})")).scalar()
+        if in_partition == rows:
+            db.execute(text(f"ALTER TABLE {ledger.name} DROP PARTITION {name}"))
+            return
+    window = (ledger.c.created_at >= start, ledger.c.created_at < end)
+    for low in range(min_id, max_id + 1, ARCHIVE_BATCH_SIZE):
+        db.execute(delete(ledger).where(*window, ledger.c.id >= low, ledger.c.id < low + ARCHIVE_BATCH_SIZE,
+                                        ledger.c.id <= max_id))
+        db.commit()
+
+def archive_month(db: Session, month: date, archive_dir: str = LEDGER_ARCHIVE_DIR,
+                  now: Optional[datetime] = None) -> Optional[dict]:
+    """Move one month of ledger rows into a gzipped NDJSON segment and return its manifest entry.
+
+    The segment is fsynced and recorded in the manifest before any row is
+    deleted, so a crash can leave rows in both places but never in neither;
+    a rerun only finishes the deletes for segments that are already recorded.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    month = month_start(month)
+    start, end = _month_bounds(month)
+    window = (ledger.c.created_at >= start, ledger.c.created_at < end)
+    manifest = load_manifest(archive_dir)
+
+    # Finish an interrupted run: rows already covered by a recorded segment only need deleting
+    for segment in manifest["segments"]:
+        if segment["month"] == f"{month:%Y-%m}":
+            leftover = db.execute(select(func.count()).select_from(ledger).where(
+                *window, ledger.c.id.between(segment["min_id"], segment["max_id"])
+            )).scalar()
+            if leftover:
+                _delete_archived(db, month, segment["min_id"], segment["max_id"], leftover)
+                db.commit()
+
+    summary = db.execute(
+        select(func.count(), func.min(ledger.c.id), func.max(ledger.c.id)).where(*window)
+    ).one()
+    rows, min_id, max_id = summary
+    if not rows:
+        return None
+
+    path = os.path.join(archive_dir, f"{ledger.name}-{month:%Y-%m}-{min_id}.ndjson.gz")
+    written = 0
+
+    def write(handle):
+        nonlocal written
+        # mtime=0 keeps the bytes, and so the checksum, identical for identical rows
+        with gzip.GzipFile(fileobj=handle, mode="wb", mtime=0) as archive:
+            last_id = min_id - 1
+            while True:
+                batch = db.execute(
+                    select(*ledger.columns).where(*window, ledger.c.id > last_id, ledger.c.id <= max_id)
+                    .order_by(ledger.c.id).limit(ARCHIVE_BATCH_SIZE)
+                ).all()
+                if not batch:
+                    break
+                for row in batch:
+                    archive.write(_encode(row))
+                written += len(batch)
+                last_id = batch[-1].id
+
+    _replace_atomically(path, write)
+    if written != rows:
+        os.unlink(path)
+        raise RuntimeError(f"{month:%Y-%m} changed while it was being archived ({written} of {rows} rows)")
+
+    segment = {
+        "month": f"{month:%Y-%m}",
+        "file": os.path.basename(path),
+        "rows": rows,
+        "min_id": min_id,
+        "max_id": max_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "sha256": _sha256(path),
+        "archived_at": (now or datetime.now()).isoformat(timespec="seconds")
+    }
+    manifest["segments"].append(segment)
+    save_manifest(manifest, archive_dir)
+
+    _delete_archived(db, month, min_id, max_id, rows)
+    db.commit()
+    return segment
+
+def archive_closed_months(db: Session, archive_dir: str = LEDGER_ARCHIVE_DIR, hot_months: int = LEDGER_HOT_MONTHS,
+                          today: Optional[date] = None) -> List[dict]:
+    """Archive every month older than the newest ``hot_months`` (the current month included), oldest first."""
+    cutoff = add_months(month_start(today or date.today()), -(hot_months - 1))
+    oldest = db.execute(select(func.min(ledger.c.created_at))).scalar()
+    segments = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        segment = archive_month(db, month, archive_dir)
+        if segment:
+            segments.append(segment)
+        month = add_months(month, 1)
+    return segments
+
+# Reading archived segments
+def _matches(record: dict, product_id: Optional[int], date_from: Optional[datetime],
+             date_to: Optional[datetime]) -> bool:
+    if product_id is not None and record["product_id"] != product_id:
+        return False
+    if date_from is not None and record["created_at"] < date_from:
+        return False
+    return date_to is None or record["created_at"] < date_to
+
+def read_archived(archive_dir: str = LEDGER_ARCHIVE_DIR, product_id: Optional[int] = None,
+                  date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Iterator[dict]:
+    """Yield archived rows newest first, opening only segments that overlap [date_from, date_to)."""
+    segments = sorted(load_manifest(archive_dir)["segments"], key=lambda segment: segment["month"], reverse=True)
+    for month, parts in groupby(segments, key=lambda segment: segment["month"]):
+        parts = list(parts)
+        if date_to is not None and datetime.fromisoformat(parts[0]["from"]) >= date_to:
+            continue
+        if date_from is not None and datetime.fromisoformat(parts[0]["to"]) <= date_from:
+            break
+        records = []
+        for part in parts:
+            with gzip.open(os.path.join(archive_dir, part["file"]), "rb") as archive:
+                records.extend(record for record in map(_decode, archive)
+                               if _matches(record, product_id, date_from, date_to))
+        records.sort(key=lambda record: (record["created_at"], record["id"]), reverse=True)
+        yield from records
+
+def count_archived(archive_dir: str = LEDGER_ARCHIVE_DIR, product_id: Optional[int] = None,
+                   date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> int:
+    """Number of archived rows in [date_from, date_to); whole months are counted from the manifest alone."""
+    total = 0
+    for segment in load_manifest(archive_dir)["segments"]:
+        start, end = datetime.fromisoformat(segment["from"]), datetime.fromisoformat(segment["to"])
+        if (date_to is not None and start >= date_to) or (date_from is not None and end <= date_from):
+            continue
+        if product_id is None and (date_from is None or date_from <= start) and (date_to is None or end <= date_to):
+            total += segment["rows"]
+            continue
+        with gzip.open(os.path.join(archive_dir, segment["file"]), "rb") as archive:
+            total += sum(1 for record in map(_decode, archive) if _matches(record, product_id, date_from, date_to))
+    return total
+
+def as_transactions(db: Session, records: List[dict]) -> List[models.InventoryTransaction]:
+    """Detached InventoryTransaction objects for archived rows, with product and user loaded in two queries."""
+    if not records:
+        return []
+    products = {
+        product.id: product for product in
+        db.query(models.Product).filter(models.Product.id.in_({record["product_id"] for record in records}))
+    }
+    users = {
+        user.id: user for user in
+        db.query(models.User).filter(models.User.id.in_({record["user_id"] for record in records}))
+    }
+    transactions = []
+    for record in records:
+        product = products.get(record["product_id"])
+        user = users.get(record["user_id"])
+        # Archived rows outlive the foreign keys; rows whose product or user is gone cannot be rendered
+        if product is None or user is None:
+            continue
+        transaction = models.InventoryTransaction(**record)
+        set_committed_value(transaction, "product", product)
+        set_committed_value(transaction, "user", user)
+        transactions.append(transaction)
+    return transactions
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain ledger partitions and archive closed months")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    partition_parser = subcommands.add_parser("partition", help="create monthly partitions ahead of time")
+    partition_parser.add_argument("--months-ahead", type=int, default=LEDGER_PARTITIONS_AHEAD)
+    archive_parser = subcommands.add_parser("archive", help="move months older than --hot-months to the archive")
+    archive_parser.add_argument("--hot-months", type=int, default=LEDGER_HOT_MONTHS)
+    archive_parser.add_argument("--archive-dir", default=LEDGER_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "partition":
+            created = ensure_partitions(db, months_ahead=args.months_ahead)
+            print(f"Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+        else:
+            ensure_partitions(db)
+            for segment in archive_closed_months(db, archive_dir=args.archive_dir, hot_months=args.hot_months):
+                print(f"Archived {segment['month']}: {segment['rows']} rows to {segment['file']}")
+    finally:
+        db.close()
@@ -1,16 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query
+from contextlib import asynccontextmanager
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Header, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
-from datetime import timedelta
-import models, schemas, data_access, auth
-from database_connection import engine, get_db
+from datetime import date, timedelta
+import hashlib
+import json
+import models, schemas, data_access, auth, rollups, idempotency, stock_stream, startup, counts, stock_shards, movement_queue
+from database_connection import engine, get_db, SessionLocal
 from auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, authenticate_user
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve /health immediately; /ready turns green once the database answers and the pool is warm
+    startup.start_in_background(engine)
+    if movement_queue.MOVEMENT_INGEST_MODE == "batched":
+        movement_queue.start(SessionLocal)
+    yield
+    # Commit movements that were accepted before shutdown
+    movement_queue.stop()
+
 app = FastAPI(
     title="Inventory Management System API",
     description="A comprehensive API for product catalog and inventory management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -20,8 +39,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count"],
 )
 
+# Fail fast when no pooled connection frees up within DB_POOL_TIMEOUT
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database connection pool exhausted, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+# Optimistic concurrency helpers for versioned resources
+def etag(db_obj) -> str:
+    return f'"{db_obj.version}"'
+
+def expected_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """Read the expected row version from If-Match; absent or "*" means an unconditional update."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+def version_conflict_response(current, schema, not_found_detail: str):
+    if current is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": "Resource was modified by another request",
+            "current": jsonable_encoder(schema.model_validate(current))
+        },
+        headers={"ETag": etag(current)}
+    )
+
+# Revalidation for slow-changing reference lists: the ETag is a hash of the body,
+# so a client holding the same copy gets a 304 instead of the payload
+USER_ADAPTER = TypeAdapter(schemas.User)
+CATEGORY_LIST_ADAPTER = TypeAdapter(List[schemas.Category])
+SUPPLIER_LIST_ADAPTER = TypeAdapter(List[schemas.Supplier])
+
+def reference_response(request: Request, adapter: TypeAdapter, data):
+    body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    headers = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"', "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+# Totals for paginated lists. COUNT(*) on a large InnoDB table is a scan, so
+# X-Total-Count comes from a short-lived per-process cache unless exact=true
+EXACT_COUNT_DESCRIPTION = "Count the total now instead of using a recent cached count"
+
+def total_count_header(table: str, filters: tuple, count, exact: bool) -> dict:
+    return {"X-Total-Count": str(counts.cache.get(table, filters, count, exact=exact))}
+
+# Idempotent POST support: retries carrying the same Idempotency-Key replay the first response
+def run_idempotent(db: Session, idempotency_key: Optional[str], user_id: int, route: str, payload: BaseModel, handler):
+    if not idempotency_key:
+        return handler()
+    if len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400,
+                            detail=f"Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters")
+    try:
+        result, replayed = idempotency.store.run(
+            db, user_id, idempotency_key,
+            idempotency.fingerprint(route, payload.model_dump_json()),
+            handler
+        )
+    except idempotency.IdempotencyKeyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except idempotency.IdempotencyRequestInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    except idempotency.IdempotencyResponseMissing:
+        raise HTTPException(status_code=409, detail="The request with this Idempotency-Key was applied, "
+                                                    "but its response is not available")
+    except idempotency.IdempotencyClaimLost:
+        raise HTTPException(status_code=409, detail="This request ran past its Idempotency-Key lease and was "
+                                                    "not applied; a retry with the same key took over")
+    if replayed:
+        return JSONResponse(content=result, headers={"Idempotent-Replayed": "true"})
+    return result
+
 # Authentication endpoints
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
@@ -56,14 +161,24 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @app.get("/users/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     users = data_access.get_users(db, skip=skip, limit=limit)
+    response.headers.update(total_count_header("users", (), lambda: data_access.count_users(db), exact))
     return users
 
+@app.get("/users/me", response_model=schemas.User)
+def read_current_user(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return reference_response(request, USER_ADAPTER, current_user)
+
 @app.get("/users/{user_id}", response_model=schemas.User)
 def read_user(
     user_id: int, 
@@ -109,12 +224,16 @@ def create_category(
 
 @app.get("/categories/", response_model=List[schemas.Category])
 def read_categories(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     categories = data_access.get_categories(db, skip=skip, limit=limit)
-    return categories
+    response = reference_response(request, CATEGORY_LIST_ADAPTER, categories)
+    response.headers.update(total_count_header("categories", (), lambda: data_access.count_categories(db), exact))
+    return response
 
 @app.get("/categories/{category_id}", response_model=schemas.Category)
 def read_category(
@@ -161,28 +280,158 @@ def create_product(
         raise HTTPException(status_code=400, detail="SKU already exists")
     return data_access.create_product(db=db, product=product)
 
+def keyed_lookup(lookup: schemas.LookupRequest, rows, product_of):
+    # Requested keys start out as explicit not-found entries
+    items = {product_id: None for product_id in lookup.ids}
+    skus = {sku: None for sku in lookup.skus}
+    for row in rows:
+        product = product_of(row)
+        items[product.id] = row
+        if product.sku in skus:
+            skus[product.sku] = product.id
+    return {"items": items, "skus": skus}
+
+@app.post("/products/lookup", response_model=schemas.ProductLookupResult)
+def lookup_products(
+    lookup: schemas.LookupRequest,
+    db: Session = Depends(get_db)
+):
+    products = data_access.lookup_products(db, ids=lookup.ids, skus=lookup.skus)
+    return keyed_lookup(lookup, products, lambda product: product)
+
+@app.post("/products/bulk-update", response_model=schemas.ProductBulkUpdateResult)
+def bulk_update_products(
+    request: schemas.ProductBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    try:
+        return data_access.bulk_update_products(db, request)
+    except data_access.InvalidRequestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def run_bulk_delete(db: Session, match, delete_chunk, chunked: bool):
+    """Delete every matched row in one transaction, or stream NDJSON progress while committing chunk by chunk."""
+    try:
+        ids = match()
+    except data_access.InvalidRequestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not chunked:
+        if len(ids) > schemas.BULK_DELETE_MAX:
+            raise HTTPException(status_code=400, detail=(
+                f"{len(ids)} rows match, more than the {schemas.BULK_DELETE_MAX} one request may delete; "
+                "send \"chunked\": true to delete them in chunks"
+            ))
+        return {"matched": len(ids), **delete_chunk(db, ids)}
+
+    def progress():
+        deleted = 0
+        skipped = []
+        try:
+            for start in range(0, len(ids), schemas.BULK_DELETE_CHUNK_SIZE):
+                result = delete_chunk(db, ids[start:start + schemas.BULK_DELETE_CHUNK_SIZE])
+                deleted += result["deleted"]
+                skipped += result["skipped"]
+                yield json.dumps({"matched": len(ids), "deleted": deleted, "skipped": len(skipped)}) + "\n"
+            yield json.dumps({"matched": len(ids), "deleted": deleted, "skipped": skipped, "done": True}) + "\n"
+        except Exception as exc:
+            # Chunks already committed stay deleted; the client can rerun the same selector
+            db.rollback()
+            yield json.dumps({"matched": len(ids), "deleted": deleted, "error": str(exc)}) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+@app.post("/products/bulk-delete", response_model=schemas.BulkDeleteResult)
+def bulk_delete_products(
+    request: schemas.ProductBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return run_bulk_delete(db, lambda: data_access.match_products(db, request.selector),
+                           data_access.delete_products, request.chunked)
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[tuple]:
+    """Split a ?fields= list, rejecting names the resource does not have."""
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def product_response_fields(fields: Optional[str], expand: Optional[str]) -> Optional[tuple]:
+    """Fields of a product response, or None for the default full product."""
+    selected = parse_fields(fields, schemas.PRODUCT_FIELDS)
+    expansions = parse_fields(expand, schemas.PRODUCT_EXPANSIONS)
+    if not expansions:
+        return selected
+    selected = selected or schemas.PRODUCT_FIELDS
+    return selected + tuple(name for name in expansions if name not in selected)
+
+def with_pending_product_stock(db: Session, products, views):
+    """Expanded product responses with sharded products' shard reservations counted in."""
+    pending = stock_shards.pending_reservations(
+        db, [product.id for product in products if product.inventory is not None and product.inventory.shard_count]
+    )
+    for product, view in zip(products, views):
+        reserved = pending.get(product.id, 0)
+        if reserved:
+            view.inventory = view.inventory.model_copy(update={
+                "reserved_stock": view.inventory.reserved_stock + reserved,
+                "available_stock": view.inventory.available_stock - reserved
+            })
+    return views
+
 @app.get("/products/", response_model=List[schemas.Product])
 def read_products(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     category_id: Optional[int] = None,
     search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
+    expand: Optional[str] = Query(None, description="Related objects to include: inventory"),
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
+    selected = product_response_fields(fields, expand)
     if search:
-        products = data_access.search_products(db, search_term=search, skip=skip, limit=limit)
+        products = data_access.search_products(db, search_term=search, skip=skip, limit=limit, fields=selected)
+        category_id = None
     else:
-        products = data_access.get_products(db, skip=skip, limit=limit, category_id=category_id)
+        products = data_access.get_products(db, skip=skip, limit=limit, category_id=category_id, fields=selected)
+    total = total_count_header(
+        "products", (category_id, search),
+        lambda: data_access.count_products(db, category_id=category_id, search_term=search), exact
+    )
+    if selected:
+        adapter = schemas.product_fields_list_adapter(selected)
+        views = adapter.validate_python(products, from_attributes=True)
+        if "inventory" in selected:
+            views = with_pending_product_stock(db, products, views)
+        return Response(adapter.dump_json(views), media_type="application/json", headers=total)
+    response.headers.update(total)
     return products
 
 @app.get("/products/{product_id}", response_model=schemas.Product)
 def read_product(
     product_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
+    expand: Optional[str] = Query(None, description="Related objects to include: inventory"),
     db: Session = Depends(get_db)
 ):
-    db_product = data_access.get_product(db, product_id=product_id)
+    selected = product_response_fields(fields, expand)
+    db_product = data_access.get_product(db, product_id=product_id, fields=selected)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    if selected:
+        view = schemas.product_fields_model(selected).model_validate(db_product)
+        if "inventory" in selected:
+            view = with_pending_product_stock(db, [db_product], [view])[0]
+        return Response(view.model_dump_json(), media_type="application/json")
     return db_product
 
 @app.put("/products/{product_id}", response_model=schemas.Product)
@@ -209,38 +458,125 @@ def delete_product(
     return {"message": "Product deleted successfully"}
 
 # Inventory endpoints
+def with_pending_reservations(db: Session, rows):
+    """Inventory responses with sharded products' shard reservations counted in."""
+    pending = stock_shards.pending_reservations(db, [row.product_id for row in rows if row.shard_count])
+    views = []
+    for row in rows:
+        reserved = pending.get(row.product_id, 0)
+        if reserved:
+            row = schemas.Inventory.model_validate(row).model_copy(update={
+                "reserved_stock": row.reserved_stock + reserved,
+                "available_stock": row.available_stock - reserved
+            })
+        views.append(row)
+    return views
+
 @app.get("/inventory/", response_model=List[schemas.Inventory])
 def read_inventory(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     inventory = data_access.get_all_inventory(db, skip=skip, limit=limit)
-    return inventory
+    response.headers.update(total_count_header("inventory", (), lambda: data_access.count_inventory(db), exact))
+    return with_pending_reservations(db, inventory)
+
+@app.post("/inventory/lookup", response_model=schemas.InventoryLookupResult)
+def lookup_inventory(
+    lookup: schemas.LookupRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    inventory = data_access.lookup_inventory(db, product_ids=lookup.ids, skus=lookup.skus)
+    return keyed_lookup(lookup, with_pending_reservations(db, inventory), lambda row: row.product)
+
+@app.get("/inventory/stream")
+async def stream_inventory(
+    request: Request,
+    product_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # The stream can stay open for hours; don't hold a pooled connection for it
+    db.close()
+    subscriber = stock_stream.stream.subscribe(product_ids)
+    return StreamingResponse(
+        stock_stream.event_stream(stock_stream.stream, subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/inventory/{product_id}", response_model=schemas.Inventory)
 def read_product_inventory(
     product_id: int,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     db_inventory = data_access.get_inventory(db, product_id=product_id)
     if db_inventory is None:
         raise HTTPException(status_code=404, detail="Inventory not found")
-    return db_inventory
+    response.headers["ETag"] = etag(db_inventory)
+    return with_pending_reservations(db, [db_inventory])[0]
 
 @app.put("/inventory/{product_id}", response_model=schemas.Inventory)
 def update_inventory(
     product_id: int,
     inventory_update: schemas.InventoryUpdate,
+    response: Response,
+    if_match_version: Optional[int] = Depends(expected_version),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db_inventory = data_access.update_inventory(db, product_id=product_id, inventory_update=inventory_update)
+    try:
+        db_inventory = data_access.update_inventory(
+            db, product_id=product_id, inventory_update=inventory_update, expected_version=if_match_version
+        )
+    except data_access.VersionConflictError as exc:
+        return version_conflict_response(exc.current, schemas.Inventory, "Inventory not found")
     if db_inventory is None:
         raise HTTPException(status_code=404, detail="Inventory not found")
+    response.headers["ETag"] = etag(db_inventory)
     return db_inventory
 
+# Hot products: reservations spread over stock shards
+def stock_shard_status(db: Session, db_inventory):
+    levels = stock_shards.snapshot(db, db_inventory)
+    return {
+        "product_id": db_inventory.product_id,
+        "shard_count": db_inventory.shard_count,
+        "current_stock": levels.current_stock,
+        "reserved_stock": levels.reserved_stock,
+        "available_stock": levels.available_stock,
+        "shards": stock_shards.get_shards(db, db_inventory.product_id)
+    }
+
+@app.get("/inventory/{product_id}/shards", response_model=schemas.InventoryShardStatus)
+def read_inventory_shards(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    db_inventory = data_access.get_inventory(db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    return stock_shard_status(db, db_inventory)
+
+@app.put("/inventory/{product_id}/shards", response_model=schemas.InventoryShardStatus)
+def configure_inventory_shards(
+    product_id: int,
+    config: schemas.InventoryShardConfig,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    db_inventory = stock_shards.configure(db, product_id, config.shards)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    return stock_shard_status(db, db_inventory)
+
 @app.get("/inventory/low-stock/", response_model=List[schemas.Inventory])
 def get_low_stock_products(
     db: Session = Depends(get_db),
@@ -259,12 +595,16 @@ def create_supplier(
 
 @app.get("/suppliers/", response_model=List[schemas.Supplier])
 def read_suppliers(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     suppliers = data_access.get_suppliers(db, skip=skip, limit=limit)
-    return suppliers
+    response = reference_response(request, SUPPLIER_LIST_ADAPTER, suppliers)
+    response.headers.update(total_count_header("suppliers", (), lambda: data_access.count_suppliers(db), exact))
+    return response
 
 @app.get("/suppliers/{supplier_id}", response_model=schemas.Supplier)
 def read_supplier(
@@ -310,19 +650,32 @@ def create_customer(
 
 @app.get("/customers/", response_model=List[schemas.Customer])
 def read_customers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     customers = data_access.get_customers(db, skip=skip, limit=limit)
+    response.headers.update(total_count_header("customers", (), lambda: data_access.count_customers(db), exact))
     return customers
 
-@app.get("/customers/{customer_id}", response_model=schemas.Customer)
+@app.get("/customers/top", response_model=List[schemas.TopCustomer])
+def read_top_customers(
+    sort_by: str = Query("lifetime_spend", pattern="^(lifetime_spend|order_count|last_order_at)$"),
+    skip: int = 0,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return data_access.get_top_customers(db, sort_by=sort_by, skip=skip, limit=limit)
+
+@app.get("/customers/{customer_id}", response_model=schemas.CustomerDetail)
 def read_customer(
     customer_id: int,
     db: Session = Depends(get_db)
 ):
-    db_customer = data_access.get_customer(db, customer_id=customer_id)
+    db_customer = data_access.get_customer(db, customer_id=customer_id, with_summary=True)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return db_customer
@@ -354,43 +707,87 @@ def delete_customer(
 @app.post("/orders/", response_model=schemas.Order)
 def create_order(
     order: schemas.OrderCreate,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    return data_access.create_order(db=db, order=order, user_id=current_user.id)
+    def handler():
+        db_order = data_access.create_order(db=db, order=order, user_id=current_user.id)
+        return jsonable_encoder(schemas.Order.model_validate(db_order))
+    return run_idempotent(db, idempotency_key, current_user.id, "POST /orders/", order, handler)
 
 @app.get("/orders/", response_model=List[schemas.Order])
 def read_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     customer_id: Optional[int] = None,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     orders = data_access.get_orders(db, skip=skip, limit=limit, customer_id=customer_id)
+    response.headers.update(total_count_header(
+        "orders", (customer_id,), lambda: data_access.count_orders(db, customer_id=customer_id), exact
+    ))
     return orders
 
 @app.get("/orders/{order_id}", response_model=schemas.Order)
 def read_order(
     order_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     db_order = data_access.get_order(db, order_id=order_id)
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    response.headers["ETag"] = etag(db_order)
+    return db_order
+
+@app.post("/orders/ship", response_model=schemas.ShipOrdersResult)
+def ship_orders(
+    request: schemas.ShipOrdersRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return data_access.ship_orders(db, order_ids=request.order_ids, user_id=current_user.id, notes=request.notes)
+
+@app.post("/orders/{order_id}/ship", response_model=schemas.Order)
+def ship_order(
+    order_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    result = data_access.ship_orders(db, order_ids=[order_id], user_id=current_user.id)
+    if result["failed"]:
+        detail = result["failed"][0]["detail"]
+        raise HTTPException(status_code=404 if detail == "Order not found" else 409, detail=detail)
+    db_order = data_access.get_order(db, order_id=order_id)
+    response.headers["ETag"] = etag(db_order)
     return db_order
 
 @app.put("/orders/{order_id}", response_model=schemas.Order)
 def update_order(
     order_id: int,
     order_update: schemas.OrderUpdate,
+    response: Response,
+    if_match_version: Optional[int] = Depends(expected_version),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db_order = data_access.update_order(db, order_id=order_id, order_update=order_update)
+    try:
+        db_order = data_access.update_order(
+            db, order_id=order_id, order_update=order_update, expected_version=if_match_version
+        )
+    except data_access.InvalidRequestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except data_access.VersionConflictError as exc:
+        return version_conflict_response(exc.current, schemas.Order, "Order not found")
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    response.headers["ETag"] = etag(db_order)
     return db_order
 
 @app.delete("/orders/{order_id}")
@@ -404,6 +801,15 @@ def delete_order(
         raise HTTPException(status_code=404, detail="Order not found")
     return {"message": "Order deleted successfully"}
 
+@app.post("/orders/bulk-delete", response_model=schemas.BulkDeleteResult)
+def bulk_delete_orders(
+    request: schemas.OrderBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return run_bulk_delete(db, lambda: data_access.match_orders(db, request.selector),
+                           data_access.delete_orders, request.chunked)
+
 # Purchase Order endpoints
 @app.post("/purchase-orders/", response_model=schemas.PurchaseOrder)
 def create_purchase_order(
@@ -415,38 +821,78 @@ def create_purchase_order(
 
 @app.get("/purchase-orders/", response_model=List[schemas.PurchaseOrder])
 def read_purchase_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     supplier_id: Optional[int] = None,
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     pos = data_access.get_purchase_orders(db, skip=skip, limit=limit, supplier_id=supplier_id)
+    response.headers.update(total_count_header(
+        "purchase_orders", (supplier_id,), lambda: data_access.count_purchase_orders(db, supplier_id=supplier_id), exact
+    ))
     return pos
 
 @app.get("/purchase-orders/{po_id}", response_model=schemas.PurchaseOrder)
 def read_purchase_order(
     po_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     db_po = data_access.get_purchase_order(db, po_id=po_id)
     if db_po is None:
         raise HTTPException(status_code=404, detail="Purchase order not found")
+    response.headers["ETag"] = etag(db_po)
     return db_po
 
 @app.put("/purchase-orders/{po_id}", response_model=schemas.PurchaseOrder)
 def update_purchase_order(
     po_id: int,
     po_update: schemas.PurchaseOrderUpdate,
+    response: Response,
+    if_match_version: Optional[int] = Depends(expected_version),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db_po = data_access.update_purchase_order(db, po_id=po_id, po_update=po_update)
+    try:
+        db_po = data_access.update_purchase_order(
+            db, po_id=po_id, po_update=po_update, expected_version=if_match_version
+        )
+    except data_access.VersionConflictError as exc:
+        return version_conflict_response(exc.current, schemas.PurchaseOrder, "Purchase order not found")
     if db_po is None:
         raise HTTPException(status_code=404, detail="Purchase order not found")
+    response.headers["ETag"] = etag(db_po)
     return db_po
 
+@app.post("/purchase-orders/{po_id}/receive", response_model=schemas.PurchaseOrderReceiptResult)
+def receive_purchase_order(
+    po_id: int,
+    response: Response,
+    receipt: Optional[schemas.PurchaseOrderReceipt] = None,
+    if_match_version: Optional[int] = Depends(expected_version),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    try:
+        result = data_access.receive_purchase_order(
+            db, po_id=po_id, receipt=receipt or schemas.PurchaseOrderReceipt(),
+            user_id=current_user.id, expected_version=if_match_version
+        )
+    except data_access.VersionConflictError as exc:
+        return version_conflict_response(exc.current, schemas.PurchaseOrder, "Purchase order not found")
+    except data_access.InvalidStateError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except data_access.InvalidRequestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Purchase order not found")
+    response.headers["ETag"] = etag(result["purchase_order"])
+    return result
+
 @app.delete("/purchase-orders/{po_id}")
 def delete_purchase_order(
     po_id: int,
@@ -458,27 +904,146 @@ def delete_purchase_order(
         raise HTTPException(status_code=404, detail="Purchase order not found")
     return {"message": "Purchase order deleted successfully"}
 
+@app.post("/purchase-orders/bulk-delete", response_model=schemas.BulkDeleteResult)
+def bulk_delete_purchase_orders(
+    request: schemas.PurchaseOrderBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return run_bulk_delete(db, lambda: data_access.match_purchase_orders(db, request.selector),
+                           data_access.delete_purchase_orders, request.chunked)
+
+# Replenishment endpoints
+@app.post("/replenishment/run", response_model=schemas.ReplenishmentRunResult)
+def run_replenishment(
+    run: schemas.ReplenishmentRunRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Imported on first use: numpy is the slowest import in the app and only these jobs need it
+    import replenishment
+    if run.default_supplier_id is not None and data_access.get_supplier(db, supplier_id=run.default_supplier_id) is None:
+        raise HTTPException(status_code=404, detail="Supplier not found")
+    return replenishment.run_replenishment(
+        db,
+        user_id=current_user.id,
+        lookback_days=run.lookback_days,
+        lead_time_days=run.lead_time_days,
+        default_supplier_id=run.default_supplier_id,
+        dry_run=run.dry_run
+    )
+
+# Forecast endpoints
+@app.post("/forecasts/run", response_model=schemas.ForecastRunResult)
+def run_forecasts(
+    run: schemas.ForecastRunRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    import forecasting
+    return forecasting.run_forecast(db, history_days=run.history_days, horizon_days=run.horizon_days)
+
+@app.get("/forecasts/", response_model=List[schemas.ProductForecast])
+def read_forecasts(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    product_ids: Optional[List[int]] = Query(None),
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    response.headers.update(total_count_header(
+        "product_forecasts", tuple(sorted(set(product_ids or []))),
+        lambda: data_access.count_product_forecasts(db, product_ids=product_ids), exact
+    ))
+    return data_access.get_product_forecasts(db, skip=skip, limit=limit, product_ids=product_ids)
+
+@app.get("/products/{product_id}/forecast", response_model=schemas.ProductForecast)
+def read_product_forecast(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    db_forecast = data_access.get_product_forecast(db, product_id=product_id)
+    if db_forecast is None:
+        raise HTTPException(status_code=404, detail="Forecast not found")
+    return db_forecast
+
+# Report endpoints
+@app.get("/reports/sales", response_model=schemas.SalesReport)
+def read_sales_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    group_by: str = Query("day", pattern="^(day|product|category)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    rows = rollups.get_sales_report(db, date_from=date_from, date_to=date_to, group_by=group_by)
+    return {"date_from": date_from, "date_to": date_to, "group_by": group_by, "rows": rows}
+
 # Inventory Transaction endpoints
+def queued_movement(db: Session, transaction: schemas.InventoryTransactionCreate, user_id: int):
+    """Hand a movement to the group-commit queue and wait until its batch is durable."""
+    try:
+        # Under an Idempotency-Key, the worker's commit marks the key used together with the movement
+        future = movement_queue.active.submit(transaction, user_id, idempotency.active_claim.get())
+    except movement_queue.MovementQueueFull:
+        raise HTTPException(status_code=503, detail="Too many stock movements queued, please retry",
+                            headers={"Retry-After": "1"})
+    # Give the request's pooled connection back while waiting; the worker needs one from the same pool
+    db.close()
+    try:
+        result = future.result(movement_queue.MOVEMENT_ACK_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        raise HTTPException(status_code=504, detail="Stock movement not confirmed in time; it may still be applied")
+    if result is None:
+        idempotency.reopen_active_claim(db)
+        raise HTTPException(status_code=404, detail="Product not found")
+    return result
+
 @app.post("/inventory-transactions/", response_model=schemas.InventoryTransaction)
 def create_inventory_transaction(
     transaction: schemas.InventoryTransactionCreate,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db_transaction = data_access.create_inventory_transaction(db=db, transaction=transaction, user_id=current_user.id)
-    if db_transaction is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return db_transaction
+    def handler():
+        if movement_queue.active is not None:
+            return queued_movement(db, transaction, current_user.id)
+        db_transaction = data_access.create_inventory_transaction(db=db, transaction=transaction, user_id=current_user.id)
+        if db_transaction is None:
+            idempotency.reopen_active_claim(db)
+            raise HTTPException(status_code=404, detail="Product not found")
+        return jsonable_encoder(schemas.InventoryTransaction.model_validate(db_transaction))
+    return run_idempotent(db, idempotency_key, current_user.id, "POST /inventory-transactions/", transaction, handler)
 
 @app.get("/inventory-transactions/", response_model=List[schemas.InventoryTransaction])
 def read_inventory_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     product_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    exact: bool = Query(False, description=EXACT_COUNT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    transactions = data_access.get_inventory_transactions(db, skip=skip, limit=limit, product_id=product_id)
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    transactions = data_access.get_inventory_transactions(
+        db, skip=skip, limit=limit, product_id=product_id, date_from=date_from, date_to=date_to
+    )
+    response.headers.update(total_count_header(
+        "inventory_transactions", (product_id, date_from, date_to),
+        lambda: data_access.count_inventory_transactions(db, product_id=product_id, date_from=date_from,
+                                                         date_to=date_to),
+        exact
+    ))
     return transactions
 
 # Health check endpoint
@@ -486,6 +1051,17 @@ def read_inventory_transactions(
 def health_check():
     return {"status": "healthy", "message": "Inventory Management System API is running"}
 
+@app.get("/ready")
+def readiness_check():
+    state = startup.readiness.status()
+    if not state["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=state)
+    return state
+
+@app.get("/health/pool")
+def pool_health():
+    return engine.pool.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
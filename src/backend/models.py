@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, Boolean, ForeignKey, Enum
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
 from database_connection import Base
@@ -94,9 +94,25 @@ class Inventory(Base):
     reserved_stock = Column(Integer, default=0, nullable=False)
     available_stock = Column(Integer, default=0, nullable=False)
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, default=1, nullable=False)
+    # Number of inventory_shards rows taking this product's reservations; 0 reserves on this row
+    shard_count = Column(Integer, default=0, nullable=False)
     
     # Relationships
     product = relationship("Product", back_populates="inventory")
+    
+    # Optimistic concurrency: every UPDATE checks and bumps the version
+    __mapper_args__ = {"version_id_col": version}
+
+class InventoryShard(Base):
+    __tablename__ = "inventory_shards"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    # Units this shard may still hand out before the product is rebalanced
+    available_stock = Column(Integer, default=0, nullable=False)
+    # Reservations taken here and not yet folded into the inventory row
+    reserved_stock = Column(Integer, default=0, nullable=False)
 
 class Supplier(Base):
     __tablename__ = "suppliers"
@@ -128,6 +144,7 @@ class Customer(Base):
     
     # Relationships
     orders = relationship("Order", back_populates="customer")
+    summary = relationship("CustomerSummary", back_populates="customer", uselist=False, cascade="all, delete-orphan")
 
 class Order(Base):
     __tablename__ = "orders"
@@ -141,11 +158,14 @@ class Order(Base):
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, default=1, nullable=False)
     
     # Relationships
     customer = relationship("Customer", back_populates="orders")
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order")
+    
+    __mapper_args__ = {"version_id_col": version}
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -174,11 +194,14 @@ class PurchaseOrder(Base):
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, default=1, nullable=False)
     
     # Relationships
     supplier = relationship("Supplier", back_populates="purchase_orders")
     user = relationship("User")
     purchase_order_items = relationship("PurchaseOrderItem", back_populates="purchase_order")
+    
+    __mapper_args__ = {"version_id_col": version}
 
 class PurchaseOrderItem(Base):
     __tablename__ = "purchase_order_items"
@@ -187,6 +210,7 @@ class PurchaseOrderItem(Base):
     purchase_order_id = Column(Integer, ForeignKey("purchase_orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
+    received_quantity = Column(Integer, default=0, nullable=False)
     unit_cost = Column(Float, nullable=False)
     total_cost = Column(Float, nullable=False)
     
@@ -196,6 +220,8 @@ class PurchaseOrderItem(Base):
 
 class InventoryTransaction(Base):
     __tablename__ = "inventory_transactions"
+    # On MySQL the table is partitioned by month (see init.sql and ledger_archive.py),
+    # so the foreign keys below are enforced only where the table is not partitioned
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -212,3 +238,91 @@ class InventoryTransaction(Base):
     # Relationships
     product = relationship("Product", back_populates="transactions")
     user = relationship("User", back_populates="transactions")
+
+class ProductForecast(Base):
+    __tablename__ = "product_forecasts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), unique=True, nullable=False)
+    method = Column(String(50), nullable=False)  # 'exponential_smoothing', 'moving_average'
+    parameter = Column(Float, nullable=False)  # Smoothing alpha or window length in days
+    daily_demand = Column(Float, nullable=False)
+    horizon_days = Column(Integer, nullable=False)
+    forecast_quantity = Column(Float, nullable=False)
+    mean_absolute_error = Column(Float, nullable=False)
+    history_days = Column(Integer, nullable=False)
+    generated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    product = relationship("Product")
+
+class DailyProductSales(Base):
+    __tablename__ = "daily_product_sales"
+    
+    sales_date = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True, index=True)
+    units_sold = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+    order_lines = Column(Integer, default=0, nullable=False)
+
+class DailyCategorySales(Base):
+    __tablename__ = "daily_category_sales"
+    
+    sales_date = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True, index=True)
+    units_sold = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+    order_lines = Column(Integer, default=0, nullable=False)
+
+class CustomerSummary(Base):
+    __tablename__ = "customer_summaries"
+    
+    # Kept up to date by every order change, counting orders that are not cancelled
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    order_count = Column(Integer, default=0, nullable=False, index=True)
+    lifetime_spend = Column(Float, default=0, nullable=False, index=True)
+    last_order_at = Column(DateTime(timezone=True), index=True)
+    
+    # Relationships
+    customer = relationship("Customer", back_populates="summary")
+
+class NumberSequence(Base):
+    __tablename__ = "number_sequences"
+    
+    name = Column(String(50), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+class NodeLease(Base):
+    __tablename__ = "node_leases"
+    
+    node_id = Column(Integer, primary_key=True)
+    holder = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(50), nullable=False)  # 'inventory.adjusted', 'inventory.reserved', ...
+    aggregate_type = Column(String(50), nullable=False)  # 'inventory'
+    aggregate_id = Column(Integer, nullable=False, index=True)  # Product ID for inventory events
+    payload = Column(Text, nullable=False)  # JSON document
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class OutboxOffset(Base):
+    __tablename__ = "outbox_offsets"
+    
+    sink = Column(String(100), primary_key=True)
+    last_event_id = Column(Integer, default=0, nullable=False)
+    skipped_ids = Column(Text)  # JSON list of ids passed over while their transactions were in flight
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of route and request body
+    response = Column(Text)  # JSON document, NULL while the first request is still running
+    claim_id = Column(String(32))  # Set while the first request holds the key, NULL once its work committed
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,132 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+from fastapi.encoders import jsonable_encoder
+import schemas, data_access
+
+MOVEMENT_INGEST_MODE = os.getenv("MOVEMENT_INGEST_MODE", "direct")  # "direct" or "batched"
+MOVEMENT_BATCH_SIZE = int(os.getenv("MOVEMENT_BATCH_SIZE", "500"))
+MOVEMENT_BATCH_WINDOW_MS = float(os.getenv("MOVEMENT_BATCH_WINDOW_MS", "5"))
+MOVEMENT_QUEUE_MAX_PENDING = int(os.getenv("MOVEMENT_QUEUE_MAX_PENDING", "10000"))
+MOVEMENT_ACK_TIMEOUT_SECONDS = float(os.getenv("MOVEMENT_ACK_TIMEOUT_SECONDS", "30"))
+
+class MovementQueueFull(Exception):
+    """More movements are waiting than the queue holds."""
+
+class MovementQueue:
+    """Stock movements waiting for one background worker to commit them in groups.
+
+    submit() returns a Future that resolves once the movement's batch has committed,
+    to its serialized ledger row, or to None when the product has no inventory. The
+    worker takes the first waiting movement, collects more for up to window_seconds
+    or until batch_size, and commits them all in one transaction, so one fsync
+    covers the whole batch. If a batch fails, its movements are retried one per
+    transaction so only the bad one fails. A movement submitted with an idempotency
+    claim marks its key in the transaction that commits it.
+    """
+
+    def __init__(self, session_factory, batch_size: int = MOVEMENT_BATCH_SIZE,
+                 window_seconds: float = MOVEMENT_BATCH_WINDOW_MS / 1000,
+                 max_pending: int = MOVEMENT_QUEUE_MAX_PENDING):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.movements = 0
+
+    def start(self) -> "MovementQueue":
+        self._thread = threading.Thread(target=self._run, name="movement-queue", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Commit everything already submitted, then stop the worker."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, transaction: schemas.InventoryTransactionCreate, user_id: int, claim=None) -> Future:
+        if self._stopping.is_set():
+            raise RuntimeError("Movement queue is stopped")
+        future = Future()
+        try:
+            self._pending.put_nowait((transaction, user_id, claim, future))
+        except queue.Full:
+            raise MovementQueueFull()
+        return future
+
+    def _collect(self) -> list:
+        try:
+            batch = [self._pending.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch: list):
+        db = self.session_factory()
+        for _, _, claim, _ in batch:
+            if claim is not None:
+                claim.attach(db)
+        try:
+            try:
+                rows = data_access.create_inventory_transactions(
+                    db, [(transaction, user_id) for transaction, user_id, _, _ in batch]
+                )
+            except Exception:
+                db.rollback()
+                raise
+            self.batches += 1
+            self.movements += len(batch)
+            # Committed: from here on a failure must not send the batch round again
+            for (_, _, _, future), row in zip(batch, rows):
+                try:
+                    future.set_result(None if row is None else
+                                      jsonable_encoder(schemas.InventoryTransaction.model_validate(row)))
+                except Exception as exc:
+                    future.set_exception(exc)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._pending.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                if len(batch) == 1:
+                    batch[0][3].set_exception(exc)
+                    continue
+                for movement in batch:
+                    try:
+                        self._commit([movement])
+                    except Exception as single_exc:
+                        movement[3].set_exception(single_exc)
+
+# The running queue when MOVEMENT_INGEST_MODE=batched, else None
+active: Optional[MovementQueue] = None
+
+def start(session_factory) -> MovementQueue:
+    global active
+    active = MovementQueue(session_factory).start()
+    return active
+
+def stop():
+    global active
+    if active is not None:
+        active.stop()
+        active = None
@@ -0,0 +1,210 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# "sequence" (block-allocated database sequence) or "snowflake" (time-ordered ids per node)
+NUMBER_GENERATOR = os.getenv("NUMBER_GENERATOR", "sequence")
+NUMBER_BLOCK_SIZE = int(os.getenv("NUMBER_BLOCK_SIZE", "100"))
+# Fixed snowflake node id for a single process; leave unset to lease one per worker
+NODE_ID = os.getenv("NODE_ID")
+NODE_LEASE_SECONDS = int(os.getenv("NODE_LEASE_SECONDS", "300"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Wide enough for a 64-bit snowflake id, so numbers sort lexicographically in insert order
+NUMBER_WIDTH = 19
+
+class BlockSequenceGenerator:
+    """Hands out values from blocks reserved in the number_sequences table.
+
+    Each block is reserved in its own short transaction, so values never repeat
+    across processes or nodes, and within a process they are strictly increasing.
+    """
+
+    def __init__(self, engine, name: str, block_size: int = NUMBER_BLOCK_SIZE):
+        self.engine = engine
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        table = models.NumberSequence.__table__
+        while True:
+            try:
+                with self.engine.begin() as conn:
+                    result = conn.execute(
+                        update(table)
+                        .where(table.c.name == self.name)
+                        .values(next_value=table.c.next_value + self.block_size)
+                    )
+                    if result.rowcount == 0:
+                        conn.execute(insert(table).values(name=self.name, next_value=1 + self.block_size))
+                    end = conn.execute(select(table.c.next_value).where(table.c.name == self.name)).scalar_one()
+                break
+            except IntegrityError:
+                # Another process created the sequence row first; reserve from it instead
+                continue
+        self._next = end - self.block_size
+        self._end = end
+
+    def next_value(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+class NodeLease:
+    """A snowflake node id leased from the node_leases table.
+
+    Every worker of every replica leases its own id, so no two live processes
+    share one. The lease is renewed on the first id issued after half of it has
+    run out; if it lapsed and another process took the id over meanwhile, a free
+    id is leased instead. Ids whose holder stopped renewing are reused once
+    their lease expires.
+    """
+
+    NODE_COUNT = 1 << 10
+
+    def __init__(self, engine, lease_seconds: float = NODE_LEASE_SECONDS, holder: str = None, clock=datetime.now):
+        self.engine = engine
+        self.lease_seconds = lease_seconds
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._clock = clock
+        self._node_id = None
+        self._renew_at = None
+        self._lock = threading.Lock()
+
+    def _renew(self, conn, now) -> bool:
+        table = models.NodeLease.__table__
+        return conn.execute(
+            update(table)
+            .where(table.c.node_id == self._node_id, table.c.holder == self.holder)
+            .values(expires_at=now + timedelta(seconds=self.lease_seconds))
+        ).rowcount == 1
+
+    def _claim(self, conn, now) -> int:
+        table = models.NodeLease.__table__
+        held = dict(conn.execute(select(table.c.node_id, table.c.expires_at)).all())
+        free = [node_id for node_id in range(self.NODE_COUNT) if node_id not in held]
+        if free:
+            conn.execute(insert(table).values(
+                node_id=free[0], holder=self.holder, expires_at=now + timedelta(seconds=self.lease_seconds)
+            ))
+            return free[0]
+        for node_id in sorted(node_id for node_id, expires_at in held.items() if expires_at <= now):
+            taken = conn.execute(
+                update(table)
+                .where(table.c.node_id == node_id, table.c.expires_at <= now)
+                .values(holder=self.holder, expires_at=now + timedelta(seconds=self.lease_seconds))
+            ).rowcount
+            if taken:
+                return node_id
+        raise RuntimeError(f"All {self.NODE_COUNT} snowflake node ids are leased")
+
+    def node_id(self) -> int:
+        with self._lock:
+            now = self._clock()
+            if self._node_id is not None and now < self._renew_at:
+                return self._node_id
+            while True:
+                try:
+                    with self.engine.begin() as conn:
+                        if self._node_id is None or not self._renew(conn, now):
+                            self._node_id = self._claim(conn, now)
+                    break
+                except IntegrityError:
+                    # Another process leased the same free id first; pick again
+                    self._node_id = None
+                    continue
+            self._renew_at = now + timedelta(seconds=self.lease_seconds / 2)
+            return self._node_id
+
+class SnowflakeGenerator:
+    """64-bit time-ordered ids: 41 bits of milliseconds, 10 bits of node id, 12 bits of sequence.
+
+    The node id is either fixed or taken from a NodeLease on every id.
+    """
+
+    EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+
+    def __init__(self, node_id: int = None, clock=time.time, lease: NodeLease = None):
+        if lease is None and not 0 <= node_id < (1 << self.NODE_BITS):
+            raise ValueError(f"NODE_ID must be between 0 and {(1 << self.NODE_BITS) - 1}")
+        self.node_id = node_id
+        self.lease = lease
+        self._clock = clock
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_value(self) -> int:
+        with self._lock:
+            node_id = self.lease.node_id() if self.lease is not None else self.node_id
+            now_ms = int(self._clock() * 1000) - self.EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Same millisecond or the clock stepped back: keep counting on the last timestamp
+                self._sequence += 1
+                if self._sequence >> self.SEQUENCE_BITS:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (
+                (self._last_ms << (self.NODE_BITS + self.SEQUENCE_BITS))
+                | (node_id << self.SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    @classmethod
+    def timestamp(cls, value: int) -> datetime:
+        return datetime.fromtimestamp(((value >> (cls.NODE_BITS + cls.SEQUENCE_BITS)) + cls.EPOCH_MS) / 1000)
+
+_generators = {}
+_leases = {}
+_generators_lock = threading.Lock()
+
+def get_generator(db: Session, name: str):
+    """Return the process-wide generator for a named sequence on the session's database."""
+    engine = db.get_bind()
+    key = (id(engine), name)
+    with _generators_lock:
+        generator = _generators.get(key)
+        if generator is None:
+            if NUMBER_GENERATOR == "snowflake" and NODE_ID is not None:
+                if WEB_CONCURRENCY > 1:
+                    # Every worker would issue ids with the same node id
+                    raise RuntimeError("NODE_ID is shared by all WEB_CONCURRENCY workers; unset it to lease a node id per worker")
+                generator = SnowflakeGenerator(int(NODE_ID))
+            elif NUMBER_GENERATOR == "snowflake":
+                # One leased node id per process, shared by all of its sequences
+                lease = _leases.get(id(engine))
+                if lease is None:
+                    lease = _leases[id(engine)] = NodeLease(engine)
+                generator = SnowflakeGenerator(lease=lease)
+            else:
+                generator = BlockSequenceGenerator(engine, name)
+            _generators[key] = generator
+        return generator
+
+def format_number(prefix: str, value: int, issued_at: datetime = None) -> str:
+    issued_at = issued_at or datetime.now()
+    return f"{prefix}-{issued_at.strftime('%Y%m%d')}-{value:0{NUMBER_WIDTH}d}"
+
+def next_number(db: Session, name: str, prefix: str) -> str:
+    generator = get_generator(db, name)
+    value = generator.next_value()
+    issued_at = SnowflakeGenerator.timestamp(value) if isinstance(generator, SnowflakeGenerator) else None
+    return format_number(prefix, value, issued_at)
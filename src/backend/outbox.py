@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import queue
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import func, select, insert
+from sqlalchemy.orm import Session
+import models
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_GAP_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_GAP_TIMEOUT_SECONDS", "10"))
+OUTBOX_LATE_WINDOW_SECONDS = float(os.getenv("OUTBOX_LATE_WINDOW_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+def inventory_snapshot(inventory) -> dict:
+    return {
+        "product_id": inventory.product_id,
+        "current_stock": inventory.current_stock,
+        "reserved_stock": inventory.reserved_stock,
+        "available_stock": inventory.available_stock
+    }
+
+def record_inventory_event(db: Session, event_type: str, inventory, **details):
+    """Queue a stock change event in the caller's transaction, so it commits or rolls back with the change."""
+    db.add(models.OutboxEvent(
+        event_type=event_type,
+        aggregate_type="inventory",
+        aggregate_id=inventory.product_id,
+        payload=json.dumps({**inventory_snapshot(inventory), **details}, default=str)
+    ))
+
+def record_inventory_events(db: Session, event_type: str, product_details: dict):
+    """Queue one event per product after a set-based stock update, reading the resulting levels in one query.
+
+    product_details maps product id to the extra payload fields for that product.
+    """
+    if not product_details:
+        return
+    inventory = models.Inventory.__table__
+    shards = models.InventoryShard.__table__
+    # Count in reservations still held in the shards of sharded products
+    pending = (
+        select(shards.c.product_id, func.sum(shards.c.reserved_stock).label("reserved"))
+        .where(shards.c.product_id.in_(list(product_details)))
+        .group_by(shards.c.product_id)
+        .subquery()
+    )
+    reserved = func.coalesce(pending.c.reserved, 0)
+    levels = db.execute(
+        select(inventory.c.product_id, inventory.c.current_stock,
+               (inventory.c.reserved_stock + reserved).label("reserved_stock"),
+               (inventory.c.available_stock - reserved).label("available_stock"))
+        .outerjoin(pending, pending.c.product_id == inventory.c.product_id)
+        .where(inventory.c.product_id.in_(list(product_details)))
+    ).all()
+    db.execute(insert(models.OutboxEvent), [
+        {
+            "event_type": event_type,
+            "aggregate_type": "inventory",
+            "aggregate_id": level.product_id,
+            "payload": json.dumps({**inventory_snapshot(level), **product_details[level.product_id]}, default=str)
+        }
+        for level in levels
+    ])
+
+def serialize_event(event) -> dict:
+    return {
+        "id": event.id,
+        "event_type": event.event_type,
+        "aggregate_type": event.aggregate_type,
+        "aggregate_id": event.aggregate_id,
+        "payload": json.loads(event.payload),
+        "created_at": event.created_at.isoformat() if event.created_at else None
+    }
+
+# Sinks
+class FileSink:
+    """Appends events to a file as newline-delimited JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, events: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as output:
+            for event in events:
+                output.write(json.dumps(event) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+
+class WebhookSink:
+    """POSTs each batch as {"events": [...]}; any non-2xx response fails the batch."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def publish(self, events: List[dict]):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"events": events}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"Webhook returned HTTP {response.status}")
+
+class QueueSink:
+    """In-process queue, standing in for a message broker."""
+
+    def __init__(self, target: queue.Queue = None):
+        self.queue = target if target is not None else queue.Queue()
+
+    def publish(self, events: List[dict]):
+        for event in events:
+            self.queue.put(event)
+
+class EventCursor:
+    """Position in the outbox that only advances over contiguous event ids.
+
+    Ids are assigned at insert but become visible at commit, so a missing id may
+    still be in flight. The cursor holds back behind it until it shows up or, after
+    gap_timeout, moves past it and remembers the id in skipped. Callers look the
+    skipped ids up again on every poll and hand them to late, so an event from a
+    long transaction is still delivered, out of order. An id is only given up as
+    rolled back once it has been skipped for late_window.
+    """
+
+    def __init__(self, position: int = 0, gap_timeout: float = OUTBOX_GAP_TIMEOUT_SECONDS,
+                 late_window: float = OUTBOX_LATE_WINDOW_SECONDS, clock=time.monotonic):
+        self.position = position
+        self.gap_timeout = gap_timeout
+        self.late_window = late_window
+        self._clock = clock
+        self._gaps = {}
+        self.skipped = {}
+
+    def resume(self, position: int, skipped_ids):
+        """Continue from a stored position and skipped ids, keeping when already known ids were skipped."""
+        now = self._clock()
+        self.position = position
+        self.skipped = {event_id: self.skipped.get(event_id, now) for event_id in skipped_ids}
+
+    def advance(self, events) -> list:
+        """Return the events (ordered by id, all after position) that are safe to hand out, and move past them."""
+        ready = []
+        expected = self.position + 1
+        for event in events:
+            if event.id != expected:
+                first_seen = self._gaps.setdefault(expected, self._clock())
+                if self._clock() - first_seen < self.gap_timeout:
+                    break
+                for missing in range(expected, event.id):
+                    self.skipped[missing] = self._clock()
+            ready.append(event)
+            expected = event.id + 1
+        if ready:
+            self.position = ready[-1].id
+            self._gaps = {gap: seen for gap, seen in self._gaps.items() if gap > self.position}
+        return ready
+
+    def late(self, events) -> list:
+        """Return the skipped events that have committed since, and give up on ids skipped for late_window."""
+        found = [event for event in events if event.id in self.skipped]
+        found_ids = {event.id for event in found}
+        now = self._clock()
+        self.skipped = {
+            event_id: skipped_at for event_id, skipped_at in self.skipped.items()
+            if event_id not in found_ids and now - skipped_at < self.late_window
+        }
+        return found
+
+def fetch_events(db: Session, after_id: int, limit: int):
+    return db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.id > after_id
+    ).order_by(models.OutboxEvent.id).limit(limit).all()
+
+def starting_point(db: Session):
+    """Position and skipped ids for a relay without a stored offset.
+
+    It starts before the oldest stored event, so missing ids below it count as gaps
+    that may still commit. Ids no further back than every relay has read may also
+    have been purged, so it starts no earlier than that and takes over the other
+    relays' skipped ids there instead.
+    """
+    offsets = db.query(models.OutboxOffset).all()
+    if not offsets:
+        return 0, []
+    oldest = db.query(func.min(models.OutboxEvent.id)).scalar()
+    start = min(offset.last_event_id for offset in offsets)
+    if oldest is not None:
+        start = min(start, oldest - 1)
+    skipped = {event_id for offset in offsets for event_id in json.loads(offset.skipped_ids or "[]")}
+    return start, sorted(event_id for event_id in skipped if event_id <= start)
+
+def fetch_skipped(db: Session, cursor: EventCursor):
+    """The cursor's skipped events that are visible now."""
+    if not cursor.skipped:
+        return []
+    return db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.id.in_(list(cursor.skipped))
+    ).order_by(models.OutboxEvent.id).all()
+
+class OutboxRelay:
+    """Publishes committed outbox events to a sink in id order, resuming from a stored offset.
+
+    The offset only moves after the sink accepts a batch, so delivery is at least
+    once: a crash between publishing and saving the offset re-sends that batch,
+    and consumers should deduplicate on the event id.
+    """
+
+    def __init__(self, session_factory, sink, name: str, batch_size: int = OUTBOX_BATCH_SIZE,
+                 gap_timeout: float = OUTBOX_GAP_TIMEOUT_SECONDS, late_window: float = OUTBOX_LATE_WINDOW_SECONDS,
+                 clock=time.monotonic):
+        self.session_factory = session_factory
+        self.sink = sink
+        self.name = name
+        self.batch_size = batch_size
+        self.cursor = EventCursor(gap_timeout=gap_timeout, late_window=late_window, clock=clock)
+
+    def run_once(self) -> int:
+        """Publish one batch and return how many events were delivered."""
+        db = self.session_factory()
+        try:
+            position = db.query(models.OutboxOffset).filter(models.OutboxOffset.sink == self.name).first()
+            # Always resume from the stored offset; a failed publish leaves it where it was
+            if position is not None:
+                stored_skipped = json.loads(position.skipped_ids or "[]")
+                self.cursor.resume(position.last_event_id, stored_skipped)
+            else:
+                start, stored_skipped = starting_point(db)
+                self.cursor.resume(start, stored_skipped)
+            ready = self.cursor.late(fetch_skipped(db, self.cursor))
+            ready += self.cursor.advance(fetch_events(db, self.cursor.position, self.batch_size))
+            skipped = sorted(self.cursor.skipped)
+            if position is not None and not ready and skipped == stored_skipped:
+                return 0
+            if ready:
+                self.sink.publish([serialize_event(event) for event in ready])
+
+            if position is None:
+                position = models.OutboxOffset(sink=self.name)
+                db.add(position)
+            position.last_event_id = self.cursor.position
+            position.skipped_ids = json.dumps(skipped)
+            db.commit()
+            return len(ready)
+        finally:
+            db.close()
+
+    def run_forever(self, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        while True:
+            try:
+                published = self.run_once()
+            except Exception:
+                logger.exception("Outbox relay '%s' failed, retrying", self.name)
+                published = 0
+            if published < self.batch_size:
+                time.sleep(poll_seconds)
+
+def purge_published(db: Session, retention_days: int = 7) -> int:
+    """Delete events that every sink has already published and that are older than the retention window."""
+    delivered = db.query(func.min(models.OutboxOffset.last_event_id)).scalar()
+    if not delivered:
+        return 0
+    deleted = db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.id <= delivered,
+        models.OutboxEvent.created_at < datetime.now() - timedelta(days=retention_days)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Relay inventory change events from the outbox")
+    parser.add_argument("command", choices=["relay", "purge"])
+    parser.add_argument("--sink", choices=["file", "webhook"], default="file")
+    parser.add_argument("--path", default="inventory-events.ndjson", help="Output file for the file sink")
+    parser.add_argument("--url", help="Endpoint for the webhook sink")
+    parser.add_argument("--name", help="Offset name; run one relay per name (default: the sink type)")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="Publish a single batch and exit")
+    parser.add_argument("--retention-days", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        db = SessionLocal()
+        try:
+            print(f"Purged {purge_published(db, args.retention_days)} published events")
+        finally:
+            db.close()
+    else:
+        if args.sink == "webhook" and not args.url:
+            parser.error("--url is required for the webhook sink")
+        sink = WebhookSink(args.url) if args.sink == "webhook" else FileSink(args.path)
+        relay = OutboxRelay(SessionLocal, sink, args.name or args.sink, batch_size=args.batch_size)
+        if args.once:
+            print(f"Published {relay.run_once()} events")
+        else:
+            relay.run_forever()
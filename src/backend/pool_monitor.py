@@ -0,0 +1,80 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (in milliseconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and how many timed out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self._wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total_ms = 0.0
+        self._checkouts = 0
+        self._timeouts = 0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self._record_wait(start, timed_out=True)
+            raise
+        self._record_wait(start)
+        return connection
+
+    def _record_wait(self, start: float, timed_out: bool = False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        bucket = len(WAIT_BUCKETS_MS)
+        for index, upper in enumerate(WAIT_BUCKETS_MS):
+            if elapsed_ms <= upper:
+                bucket = index
+                break
+        with self._stats_lock:
+            self._wait_counts[bucket] += 1
+            self._wait_total_ms += elapsed_ms
+            if timed_out:
+                self._timeouts += 1
+            else:
+                self._checkouts += 1
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_counters()
+
+    def stats(self) -> dict:
+        """Snapshot of live pool occupancy and the cumulative checkout wait histogram."""
+        with self._stats_lock:
+            counts = list(self._wait_counts)
+            total_ms = self._wait_total_ms
+            checkouts = self._checkouts
+            timeouts = self._timeouts
+        cumulative = 0
+        buckets = []
+        for upper, count in zip(list(WAIT_BUCKETS_MS) + ["+Inf"], counts):
+            cumulative += count
+            buckets.append({"le_ms": upper, "count": cumulative})
+        observed = checkouts + timeouts
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_seconds": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_ms": {
+                "count": observed,
+                "sum": round(total_ms, 3),
+                "avg": round(total_ms / observed, 3) if observed else 0.0,
+                "buckets": buckets
+            }
+        }
@@ -0,0 +1,240 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import select, func, insert
+from sqlalchemy.orm import Session
+import models
+from data_access import generate_po_number
+
+OPEN_PO_STATUSES = (
+    models.OrderStatus.pending,
+    models.OrderStatus.confirmed,
+    models.OrderStatus.shipped,
+)
+UNASSIGNED_SAMPLE_SIZE = 100
+
+def _scatter(product_ids: np.ndarray, keys, values, dtype=np.float64) -> np.ndarray:
+    """Align (key, value) pairs from a GROUP BY onto the sorted product id array."""
+    out = np.zeros(len(product_ids), dtype=dtype)
+    if len(keys) == 0 or len(product_ids) == 0:
+        return out
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=dtype)
+    idx = np.searchsorted(product_ids, keys)
+    idx_clipped = np.minimum(idx, len(product_ids) - 1)
+    found = product_ids[idx_clipped] == keys
+    out[idx_clipped[found]] = values[found]
+    return out
+
+def _columns(rows, count: int):
+    if not rows:
+        return [[] for _ in range(count)]
+    return [list(column) for column in zip(*rows)]
+
+def load_catalog(db: Session, lookback_days: int) -> dict:
+    """Load every active product's replenishment inputs as column arrays keyed by product id."""
+    # Sharded products hold part of their reservations in shards until the next fold
+    pending = (
+        select(models.InventoryShard.product_id, func.sum(models.InventoryShard.reserved_stock).label("reserved"))
+        .group_by(models.InventoryShard.product_id)
+        .subquery()
+    )
+    product_rows = db.execute(
+        select(
+            models.Product.id,
+            func.coalesce(models.Product.min_stock_level, 0),
+            func.coalesce(models.Product.max_stock_level, 0),
+            models.Product.cost_price,
+            func.coalesce(models.Inventory.available_stock, 0) - func.coalesce(pending.c.reserved, 0),
+        )
+        .outerjoin(models.Inventory, models.Inventory.product_id == models.Product.id)
+        .outerjoin(pending, pending.c.product_id == models.Product.id)
+        .where(models.Product.status == models.ProductStatus.active)
+        .order_by(models.Product.id)
+    ).all()
+    ids, min_levels, max_levels, costs, available = _columns(product_rows, 5)
+    product_ids = np.asarray(ids, dtype=np.int64)
+
+    # Only the part of an open purchase order that has not been received yet is still on order
+    on_order_rows = db.execute(
+        select(
+            models.PurchaseOrderItem.product_id,
+            func.sum(models.PurchaseOrderItem.quantity - models.PurchaseOrderItem.received_quantity)
+        )
+        .join(models.PurchaseOrder)
+        .where(models.PurchaseOrder.status.in_(OPEN_PO_STATUSES))
+        .group_by(models.PurchaseOrderItem.product_id)
+    ).all()
+
+    cutoff = datetime.now() - timedelta(days=lookback_days)
+    sales_rows = db.execute(
+        select(
+            models.InventoryTransaction.product_id,
+            func.sum(func.abs(models.InventoryTransaction.quantity))
+        )
+        .where(
+            models.InventoryTransaction.transaction_type == models.TransactionType.sale,
+            models.InventoryTransaction.created_at >= cutoff
+        )
+        .group_by(models.InventoryTransaction.product_id)
+    ).all()
+
+    # Preferred supplier is whoever received the product's most recent purchase order
+    latest_po = (
+        select(
+            models.PurchaseOrderItem.product_id.label("product_id"),
+            func.max(models.PurchaseOrder.id).label("po_id")
+        )
+        .join(models.PurchaseOrder)
+        .where(models.PurchaseOrder.status != models.OrderStatus.cancelled)
+        .group_by(models.PurchaseOrderItem.product_id)
+        .subquery()
+    )
+    supplier_rows = db.execute(
+        select(latest_po.c.product_id, models.PurchaseOrder.supplier_id)
+        .join(models.PurchaseOrder, models.PurchaseOrder.id == latest_po.c.po_id)
+    ).all()
+
+    on_order_keys, on_order_values = _columns(on_order_rows, 2)
+    sales_keys, sales_values = _columns(sales_rows, 2)
+    supplier_keys, supplier_values = _columns(supplier_rows, 2)
+    return {
+        "product_id": product_ids,
+        "min_level": np.asarray(min_levels, dtype=np.float64),
+        "max_level": np.asarray(max_levels, dtype=np.float64),
+        "unit_cost": np.asarray(costs, dtype=np.float64),
+        "available": np.asarray(available, dtype=np.float64),
+        "on_order": _scatter(product_ids, on_order_keys, on_order_values),
+        "sold": _scatter(product_ids, sales_keys, sales_values),
+        "supplier_id": _scatter(product_ids, supplier_keys, supplier_values, dtype=np.int64),
+    }
+
+def compute_reorder_quantities(catalog: dict, lookback_days: int, lead_time_days: int) -> np.ndarray:
+    """Order-up-to quantities for every product whose stock position is at or below its reorder point."""
+    daily_velocity = catalog["sold"] / max(lookback_days, 1)
+    reorder_point = catalog["min_level"] + daily_velocity * lead_time_days
+    position = catalog["available"] + catalog["on_order"]
+    target = np.maximum(catalog["max_level"], reorder_point)
+    quantities = np.ceil(target - position).clip(min=0).astype(np.int64)
+    needs_reorder = (position <= reorder_point) & (reorder_point > 0)
+    return np.where(needs_reorder, quantities, 0)
+
+def run_replenishment(
+    db: Session,
+    user_id: int,
+    lookback_days: int = 30,
+    lead_time_days: int = 7,
+    default_supplier_id: Optional[int] = None,
+    dry_run: bool = False
+) -> dict:
+    catalog = load_catalog(db, lookback_days)
+    quantities = compute_reorder_quantities(catalog, lookback_days, lead_time_days)
+
+    supplier_ids = catalog["supplier_id"]
+    if default_supplier_id is not None:
+        supplier_ids = np.where(supplier_ids == 0, default_supplier_id, supplier_ids)
+
+    reorder = quantities > 0
+    unassigned = reorder & (supplier_ids == 0)
+    selected = np.flatnonzero(reorder & (supplier_ids != 0))
+
+    # Group the selected lines by supplier with one stable sort
+    selected = selected[np.argsort(supplier_ids[selected], kind="stable")]
+    line_suppliers = supplier_ids[selected]
+    line_products = catalog["product_id"][selected]
+    line_quantities = quantities[selected]
+    line_costs = catalog["unit_cost"][selected]
+    line_totals = np.round(line_quantities * line_costs, 2)
+
+    drafts = []
+    if len(selected):
+        groups, starts = np.unique(line_suppliers, return_index=True)
+        group_totals = np.add.reduceat(line_totals, starts)
+        group_quantities = np.add.reduceat(line_quantities, starts)
+        ends = np.append(starts[1:], len(selected))
+        expected_delivery = datetime.now() + timedelta(days=lead_time_days)
+        # Reserve numbers before the first flush so the sequence never waits on this transaction
+        po_numbers = [] if dry_run else [generate_po_number(db) for _ in groups]
+
+        for index, (supplier_id, start, end, total, quantity) in enumerate(zip(groups, starts, ends, group_totals, group_quantities)):
+            draft = {
+                "supplier_id": int(supplier_id),
+                "purchase_order_id": None,
+                "po_number": None,
+                "line_count": int(end - start),
+                "total_quantity": int(quantity),
+                "total_amount": round(float(total), 2),
+            }
+            if not dry_run:
+                db_po = models.PurchaseOrder(
+                    po_number=po_numbers[index],
+                    supplier_id=int(supplier_id),
+                    user_id=user_id,
+                    status=models.OrderStatus.pending,
+                    total_amount=draft["total_amount"],
+                    expected_delivery=expected_delivery,
+                    notes="Draft generated by replenishment run"
+                )
+                db.add(db_po)
+                db.flush()
+                db.execute(insert(models.PurchaseOrderItem), [
+                    {
+                        "purchase_order_id": db_po.id,
+                        "product_id": int(product_id),
+                        "quantity": int(line_quantity),
+                        "unit_cost": float(unit_cost),
+                        "total_cost": float(line_total),
+                    }
+                    for product_id, line_quantity, unit_cost, line_total in zip(
+                        line_products[start:end],
+                        line_quantities[start:end],
+                        line_costs[start:end],
+                        line_totals[start:end]
+                    )
+                ])
+                draft["purchase_order_id"] = db_po.id
+                draft["po_number"] = db_po.po_number
+            drafts.append(draft)
+        if not dry_run:
+            db.commit()
+
+    unassigned_ids = catalog["product_id"][unassigned]
+    return {
+        "products_evaluated": int(len(catalog["product_id"])),
+        "products_to_reorder": int(reorder.sum()),
+        "purchase_orders": drafts,
+        "unassigned_count": int(len(unassigned_ids)),
+        "unassigned_product_ids": [int(product_id) for product_id in unassigned_ids[:UNASSIGNED_SAMPLE_SIZE]],
+    }
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Draft purchase orders for products below their reorder point")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--lookback-days", type=int, default=30)
+    parser.add_argument("--lead-time-days", type=int, default=7)
+    parser.add_argument("--default-supplier-id", type=int)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = run_replenishment(
+            db,
+            user_id=args.user_id,
+            lookback_days=args.lookback_days,
+            lead_time_days=args.lead_time_days,
+            default_supplier_id=args.default_supplier_id,
+            dry_run=args.dry_run
+        )
+        print(f"Evaluated {result['products_evaluated']} products, "
+              f"{result['products_to_reorder']} need reordering")
+        for draft in result["purchase_orders"]:
+            print(f"Supplier {draft['supplier_id']}: {draft['line_count']} lines, "
+                  f"{draft['total_amount']:.2f} ({draft['po_number'] or 'dry run'})")
+        if result["unassigned_count"]:
+            print(f"{result['unassigned_count']} products have no known supplier")
+    finally:
+        db.close()
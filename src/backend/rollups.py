@@ -0,0 +1,285 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, func, insert, delete, update, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+import models
+
+def _later(current, new):
+    return case((current.is_(None), new), (new.is_(None), current), (new > current, new), else_=current)
+
+def upsert_increment(db: Session, model, key_columns, rows, latest_columns=()):
+    """Add each row's non-key values onto the existing row with the same key, inserting it when missing.
+
+    Columns in latest_columns keep the later of the stored and the new value instead.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    value_columns = [column for column in rows[0] if column not in key_columns]
+    mysql = db.get_bind().dialect.name == "mysql"
+    stmt = mysql_insert(table) if mysql else sqlite_insert(table)
+    new = stmt.inserted if mysql else stmt.excluded
+    values = {
+        column: _later(table.c[column], new[column]) if column in latest_columns else table.c[column] + new[column]
+        for column in value_columns
+    }
+    if mysql:
+        stmt = stmt.on_duplicate_key_update(values)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=values)
+    db.execute(stmt, rows)
+
+def _sales_date(order) -> date:
+    created_at = order.created_at or datetime.now()
+    return created_at.date()
+
+def apply_order_items(db: Session, order, items, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an order's lines from the daily rollups.
+
+    Runs inside the caller's transaction so the rollups commit or roll back with
+    the order change itself.
+    """
+    per_product = {}
+    for item in items:
+        units, revenue, lines = per_product.get(item.product_id, (0, 0.0, 0))
+        per_product[item.product_id] = (units + item.quantity, revenue + item.total_price, lines + 1)
+    if not per_product:
+        return
+
+    sales_date = _sales_date(order)
+    product_rows = [
+        {
+            "sales_date": sales_date,
+            "product_id": product_id,
+            "units_sold": sign * units,
+            "revenue": sign * revenue,
+            "order_lines": sign * lines
+        }
+        for product_id, (units, revenue, lines) in per_product.items()
+    ]
+
+    per_category = {}
+    categories = db.execute(
+        select(models.Product.id, models.Product.category_id)
+        .where(models.Product.id.in_(list(per_product)))
+    ).all()
+    for product_id, category_id in categories:
+        units, revenue, lines = per_product[product_id]
+        total_units, total_revenue, total_lines = per_category.get(category_id, (0, 0.0, 0))
+        per_category[category_id] = (total_units + units, total_revenue + revenue, total_lines + lines)
+    category_rows = [
+        {
+            "sales_date": sales_date,
+            "category_id": category_id,
+            "units_sold": sign * units,
+            "revenue": sign * revenue,
+            "order_lines": sign * lines
+        }
+        for category_id, (units, revenue, lines) in per_category.items()
+    ]
+
+    upsert_increment(db, models.DailyProductSales, ("sales_date", "product_id"), product_rows)
+    upsert_increment(db, models.DailyCategorySales, ("sales_date", "category_id"), category_rows)
+
+def remove_orders(db: Session, order_ids):
+    """Take the lines of many orders out of the daily rollups, with one read and one upsert per rollup table.
+
+    Cancelled orders are skipped; their lines left the rollups when they were cancelled.
+    """
+    orders = models.Order.__table__
+    items = models.OrderItem.__table__
+    products = models.Product.__table__
+    lines = db.execute(
+        select(orders.c.created_at, items.c.product_id, products.c.category_id, items.c.quantity, items.c.total_price)
+        .join_from(items, orders, orders.c.id == items.c.order_id)
+        .join(products, products.c.id == items.c.product_id)
+        .where(orders.c.id.in_(list(order_ids)), orders.c.status != models.OrderStatus.cancelled)
+    ).all()
+
+    per_product = {}
+    per_category = {}
+    for created_at, product_id, category_id, quantity, total_price in lines:
+        sales_date = (created_at or datetime.now()).date()
+        for totals, key in ((per_product, (sales_date, product_id)), (per_category, (sales_date, category_id))):
+            units, revenue, count = totals.get(key, (0, 0.0, 0))
+            totals[key] = (units + quantity, revenue + total_price, count + 1)
+
+    upsert_increment(db, models.DailyProductSales, ("sales_date", "product_id"), [
+        {"sales_date": sales_date, "product_id": product_id, "units_sold": -units, "revenue": -revenue,
+         "order_lines": -count}
+        for (sales_date, product_id), (units, revenue, count) in per_product.items()
+    ])
+    upsert_increment(db, models.DailyCategorySales, ("sales_date", "category_id"), [
+        {"sales_date": sales_date, "category_id": category_id, "units_sold": -units, "revenue": -revenue,
+         "order_lines": -count}
+        for (sales_date, category_id), (units, revenue, count) in per_category.items()
+    ])
+
+def apply_customer_orders(db: Session, orders, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) orders from their customers' summaries.
+
+    Removing an order cannot undo a latest date, so the removed orders' customers
+    get their last order date re-read from their remaining orders. That is one
+    statement, and it only reads the rows of those customers. Like
+    apply_order_items, this runs in the caller's transaction.
+    """
+    per_customer = {}
+    for order in orders:
+        count, spend, latest = per_customer.get(order.customer_id, (0, 0.0, None))
+        created_at = order.created_at or datetime.now()
+        per_customer[order.customer_id] = (count + 1, spend + order.total_amount,
+                                           created_at if latest is None else max(latest, created_at))
+    if not per_customer:
+        return
+
+    if sign > 0:
+        upsert_increment(db, models.CustomerSummary, ("customer_id",), [
+            {"customer_id": customer_id, "order_count": count, "lifetime_spend": spend, "last_order_at": latest}
+            for customer_id, (count, spend, latest) in per_customer.items()
+        ], latest_columns=("last_order_at",))
+        return
+
+    upsert_increment(db, models.CustomerSummary, ("customer_id",), [
+        {"customer_id": customer_id, "order_count": -count, "lifetime_spend": -spend}
+        for customer_id, (count, spend, _) in per_customer.items()
+    ])
+    summaries = models.CustomerSummary.__table__
+    orders_table = models.Order.__table__
+    db.execute(
+        update(summaries)
+        .where(summaries.c.customer_id.in_(list(per_customer)))
+        .values(last_order_at=select(func.max(orders_table.c.created_at)).where(
+            orders_table.c.customer_id == summaries.c.customer_id,
+            orders_table.c.status != models.OrderStatus.cancelled,
+            orders_table.c.id.notin_([order.id for order in orders])
+        ).scalar_subquery())
+    )
+
+def rebuild_customer_summaries(db: Session) -> int:
+    """Recompute every customer summary from the orders table and return the number of summaries written."""
+    orders = models.Order.__table__
+    db.execute(delete(models.CustomerSummary))
+    rows = db.execute(
+        insert(models.CustomerSummary).from_select(
+            ["customer_id", "order_count", "lifetime_spend", "last_order_at"],
+            select(orders.c.customer_id, func.count(orders.c.id), func.sum(orders.c.total_amount),
+                   func.max(orders.c.created_at))
+            .where(orders.c.status != models.OrderStatus.cancelled)
+            .group_by(orders.c.customer_id)
+        )
+    ).rowcount
+    db.commit()
+    return rows
+
+def rebuild_rollups(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """Recompute the rollups for a date range (everything by default) from orders and order items."""
+    product_filter = []
+    category_filter = []
+    order_filter = [models.Order.status != models.OrderStatus.cancelled]
+    if date_from:
+        product_filter.append(models.DailyProductSales.sales_date >= date_from)
+        category_filter.append(models.DailyCategorySales.sales_date >= date_from)
+        order_filter.append(models.Order.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        product_filter.append(models.DailyProductSales.sales_date <= date_to)
+        category_filter.append(models.DailyCategorySales.sales_date <= date_to)
+        order_filter.append(models.Order.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    db.execute(delete(models.DailyCategorySales).where(*category_filter))
+    db.execute(delete(models.DailyProductSales).where(*product_filter))
+
+    sales_date = func.date(models.Order.created_at)
+    product_select = (
+        select(
+            sales_date,
+            models.OrderItem.product_id,
+            func.sum(models.OrderItem.quantity),
+            func.sum(models.OrderItem.total_price),
+            func.count(models.OrderItem.id)
+        )
+        .join(models.Order, models.Order.id == models.OrderItem.order_id)
+        .where(*order_filter)
+        .group_by(sales_date, models.OrderItem.product_id)
+    )
+    product_rows = db.execute(
+        insert(models.DailyProductSales).from_select(
+            ["sales_date", "product_id", "units_sold", "revenue", "order_lines"],
+            product_select
+        )
+    ).rowcount
+
+    category_select = (
+        select(
+            models.DailyProductSales.sales_date,
+            models.Product.category_id,
+            func.sum(models.DailyProductSales.units_sold),
+            func.sum(models.DailyProductSales.revenue),
+            func.sum(models.DailyProductSales.order_lines)
+        )
+        .join(models.Product, models.Product.id == models.DailyProductSales.product_id)
+        .where(*product_filter)
+        .group_by(models.DailyProductSales.sales_date, models.Product.category_id)
+    )
+    category_rows = db.execute(
+        insert(models.DailyCategorySales).from_select(
+            ["sales_date", "category_id", "units_sold", "revenue", "order_lines"],
+            category_select
+        )
+    ).rowcount
+    db.commit()
+    return {"product_rows": product_rows, "category_rows": category_rows}
+
+def get_sales_report(db: Session, date_from: date, date_to: date, group_by: str = "day"):
+    """Aggregate the rollups over [date_from, date_to] by day, product or category."""
+    if group_by == "category":
+        table = models.DailyCategorySales
+        key = table.category_id
+    else:
+        table = models.DailyProductSales
+        key = table.sales_date if group_by == "day" else table.product_id
+
+    rows = db.execute(
+        select(
+            key,
+            func.sum(table.units_sold),
+            func.sum(table.revenue),
+            func.sum(table.order_lines)
+        )
+        .where(table.sales_date >= date_from, table.sales_date <= date_to)
+        .group_by(key)
+        .order_by(key)
+    ).all()
+
+    key_name = {"day": "sales_date", "product": "product_id", "category": "category_id"}[group_by]
+    return [
+        {
+            key_name: key_value,
+            "units_sold": int(units or 0),
+            "revenue": round(float(revenue or 0), 2),
+            "order_lines": int(lines or 0)
+        }
+        for key_value, units, revenue, lines in rows
+        if units or lines
+    ]
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild daily sales rollups or customer summaries from orders")
+    parser.add_argument("command", choices=["rebuild", "rebuild-customers"])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild-customers":
+            print(f"Rebuilt {rebuild_customer_summaries(db)} customer summaries")
+        else:
+            result = rebuild_rollups(db, date_from=args.date_from, date_to=args.date_to)
+            print(f"Rebuilt {result['product_rows']} product rows and {result['category_rows']} category rows")
+    finally:
+        db.close()
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from functools import lru_cache
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, create_model
+from typing import Optional, List, Dict, Tuple, Union
+from datetime import date, datetime
 from models import UserRole, ProductStatus, OrderStatus, TransactionType
 
 # User Schemas
@@ -96,6 +97,35 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductStock(BaseModel):
+    current_stock: int
+    reserved_stock: int
+    available_stock: int
+    version: int
+
+    class Config:
+        from_attributes = True
+
+class ProductExpanded(Product):
+    inventory: Optional[ProductStock] = None
+
+PRODUCT_FIELDS = tuple(Product.model_fields)
+# The category is a field of every product already; select it with ?fields=
+PRODUCT_EXPANSIONS = ("inventory",)
+
+@lru_cache(maxsize=256)
+def product_fields_model(fields: Tuple[str, ...]):
+    """Product response trimmed to the requested fields, built once per field set."""
+    return create_model(
+        "ProductFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (ProductExpanded.model_fields[name].annotation, ...) for name in fields}
+    )
+
+@lru_cache(maxsize=256)
+def product_fields_list_adapter(fields: Tuple[str, ...]):
+    return TypeAdapter(List[product_fields_model(fields)])
+
 # Inventory Schemas
 class InventoryBase(BaseModel):
     current_stock: int
@@ -114,11 +144,84 @@ class Inventory(InventoryBase):
     id: int
     product_id: int
     last_updated: Optional[datetime] = None
+    version: int
     product: Product
 
     class Config:
         from_attributes = True
 
+# Stock shard Schemas
+STOCK_SHARDS_MAX = 64
+
+class InventoryShardConfig(BaseModel):
+    shards: int = Field(..., ge=0, le=STOCK_SHARDS_MAX)  # 0 turns sharding off
+
+class InventoryShard(BaseModel):
+    shard: int
+    available_stock: int
+    reserved_stock: int
+
+    class Config:
+        from_attributes = True
+
+class InventoryShardStatus(BaseModel):
+    product_id: int
+    shard_count: int
+    current_stock: int
+    reserved_stock: int  # Including reservations still held in shards
+    available_stock: int
+    shards: List[InventoryShard]
+
+# Lookup Schemas
+LOOKUP_MAX_KEYS = 5000
+
+class LookupRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list, max_length=LOOKUP_MAX_KEYS)
+    skus: List[str] = Field(default_factory=list, max_length=LOOKUP_MAX_KEYS)
+
+class ProductLookupResult(BaseModel):
+    items: Dict[int, Optional[Product]]  # Every requested or SKU-matched id, null if not found
+    skus: Dict[str, Optional[int]]  # Requested SKU to product id, null if not found
+
+class InventoryLookupResult(BaseModel):
+    items: Dict[int, Optional[Inventory]]  # Keyed by product id
+    skus: Dict[str, Optional[int]]
+
+# Bulk product update Schemas
+BULK_UPDATE_SAMPLE_SIZE = 20
+
+class ProductSelector(BaseModel):
+    # Criteria are combined with AND; at least one is required
+    ids: List[int] = Field(default_factory=list, max_length=LOOKUP_MAX_KEYS)
+    category_id: Optional[int] = None  # The category and all its subcategories
+    brand: Optional[str] = None
+    status: Optional[ProductStatus] = None
+
+class ProductBulkOperation(BaseModel):
+    # Set the price or change it by a percentage, not both
+    price: Optional[float] = Field(None, ge=0)
+    price_change_percent: Optional[float] = Field(None, gt=-100)
+    status: Optional[ProductStatus] = None
+    min_stock_level: Optional[int] = Field(None, ge=0)
+    max_stock_level: Optional[int] = Field(None, ge=0)
+
+class ProductBulkUpdate(BaseModel):
+    selector: ProductSelector
+    operation: ProductBulkOperation
+    dry_run: bool = False
+
+class ProductChange(BaseModel):
+    id: int
+    sku: str
+    before: Dict[str, Optional[Union[int, float, str]]]
+    after: Dict[str, Optional[Union[int, float, str]]]
+
+class ProductBulkUpdateResult(BaseModel):
+    matched: int
+    updated: int  # 0 on a dry run
+    dry_run: bool
+    sample: List[ProductChange]  # Up to BULK_UPDATE_SAMPLE_SIZE matched products, lowest ids first
+
 # Supplier Schemas
 class SupplierBase(BaseModel):
     name: str
@@ -173,6 +276,20 @@ class Customer(CustomerBase):
     class Config:
         from_attributes = True
 
+class CustomerSummary(BaseModel):
+    order_count: int
+    lifetime_spend: float
+    last_order_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class CustomerDetail(Customer):
+    summary: Optional[CustomerSummary] = None  # null until the customer's first order
+
+class TopCustomer(CustomerSummary):
+    customer: Customer
+
 # Order Item Schemas
 class OrderItemBase(BaseModel):
     product_id: int
@@ -212,12 +329,29 @@ class Order(OrderBase):
     status: OrderStatus
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int
     customer: Customer
     order_items: List[OrderItem]
 
     class Config:
         from_attributes = True
 
+# Fulfilment Schemas
+FULFILMENT_MAX_ORDERS = 1000
+
+class ShipOrdersRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=FULFILMENT_MAX_ORDERS)
+    notes: Optional[str] = None
+
+class ShipmentFailure(BaseModel):
+    order_id: int
+    detail: str
+
+class ShipOrdersResult(BaseModel):
+    shipped: List[int]
+    failed: List[ShipmentFailure]
+    units_shipped: int
+
 # Purchase Order Item Schemas
 class PurchaseOrderItemBase(BaseModel):
     product_id: int
@@ -231,6 +365,7 @@ class PurchaseOrderItemCreate(PurchaseOrderItemBase):
 class PurchaseOrderItem(PurchaseOrderItemBase):
     id: int
     purchase_order_id: int
+    received_quantity: int = 0
     product: Product
 
     class Config:
@@ -259,12 +394,130 @@ class PurchaseOrder(PurchaseOrderBase):
     status: OrderStatus
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int
     supplier: Supplier
     purchase_order_items: List[PurchaseOrderItem]
 
     class Config:
         from_attributes = True
 
+# Receiving Schemas
+class ReceiptLine(BaseModel):
+    item_id: int
+    quantity: int = Field(..., gt=0)
+
+class PurchaseOrderReceipt(BaseModel):
+    lines: Optional[List[ReceiptLine]] = None  # Omit to receive everything still outstanding
+    notes: Optional[str] = None
+
+class ReceivedLine(BaseModel):
+    item_id: int
+    product_id: int
+    quantity: int
+    received_quantity: int
+    ordered_quantity: int
+
+class PurchaseOrderReceiptResult(BaseModel):
+    purchase_order: PurchaseOrder
+    lines: List[ReceivedLine]
+    units_received: int
+    fully_received: bool
+
+# Bulk delete Schemas
+BULK_DELETE_MAX = 5000  # Rows one non-chunked request may delete
+BULK_DELETE_CHUNK_SIZE = 500  # Rows per transaction in chunked mode
+
+class OrderSelector(BaseModel):
+    # Criteria are combined with AND; at least one is required
+    ids: List[int] = Field(default_factory=list, max_length=BULK_DELETE_MAX)
+    status: Optional[OrderStatus] = None
+    customer_id: Optional[int] = None
+    created_before: Optional[date] = None
+
+class PurchaseOrderSelector(BaseModel):
+    ids: List[int] = Field(default_factory=list, max_length=BULK_DELETE_MAX)
+    status: Optional[OrderStatus] = None
+    supplier_id: Optional[int] = None
+    created_before: Optional[date] = None
+
+class OrderBulkDelete(BaseModel):
+    selector: OrderSelector
+    chunked: bool = False  # Stream progress and commit every BULK_DELETE_CHUNK_SIZE rows
+
+class PurchaseOrderBulkDelete(BaseModel):
+    selector: PurchaseOrderSelector
+    chunked: bool = False
+
+class ProductBulkDelete(BaseModel):
+    selector: ProductSelector
+    chunked: bool = False
+
+class BulkDeleteResult(BaseModel):
+    matched: int
+    deleted: int
+    skipped: List[int]  # Matched but kept, e.g. products that orders or the ledger still refer to
+
+# Replenishment Schemas
+class ReplenishmentRunRequest(BaseModel):
+    lookback_days: int = Field(30, ge=1)
+    lead_time_days: int = Field(7, ge=0)
+    default_supplier_id: Optional[int] = None
+    dry_run: bool = False
+
+class ReplenishmentDraft(BaseModel):
+    supplier_id: int
+    purchase_order_id: Optional[int] = None
+    po_number: Optional[str] = None
+    line_count: int
+    total_quantity: int
+    total_amount: float
+
+class ReplenishmentRunResult(BaseModel):
+    products_evaluated: int
+    products_to_reorder: int
+    purchase_orders: List[ReplenishmentDraft]
+    unassigned_count: int
+    unassigned_product_ids: List[int]
+
+# Forecast Schemas
+class ForecastRunRequest(BaseModel):
+    history_days: int = Field(90, ge=1, le=730)
+    horizon_days: int = Field(28, ge=1)
+
+class ForecastRunResult(BaseModel):
+    products_forecast: int
+    history_days: int
+    horizon_days: int
+
+class ProductForecast(BaseModel):
+    product_id: int
+    method: str
+    parameter: float
+    daily_demand: float
+    horizon_days: int
+    forecast_quantity: float
+    mean_absolute_error: float
+    history_days: int
+    generated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Report Schemas
+class SalesReportRow(BaseModel):
+    sales_date: Optional[date] = None
+    product_id: Optional[int] = None
+    category_id: Optional[int] = None
+    units_sold: int
+    revenue: float
+    order_lines: int
+
+class SalesReport(BaseModel):
+    date_from: date
+    date_to: date
+    group_by: str
+    rows: List[SalesReportRow]
+
 # Inventory Transaction Schemas
 class InventoryTransactionBase(BaseModel):
     product_id: int
@@ -0,0 +1,363 @@
+import os
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, func, insert, text
+from sqlalchemy.orm import Session
+import models, rollups, numbering, auth
+
+SEED_CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "5000"))
+
+# Row counts at scale 1.0; every count is multiplied by the scale factor
+SCALE_ONE = {
+    "suppliers": 25,
+    "products": 10_000,
+    "customers": 5_000,
+    "orders": 50_000,
+}
+USERS = 5
+ROOT_CATEGORIES = ("Electronics", "Home & Garden", "Clothing", "Books", "Sports", "Toys", "Health", "Automotive")
+CHILDREN_PER_CATEGORY = 4
+LEAVES_PER_CHILD = 3
+
+BRANDS = ("Acme", "Northwind", "Contoso", "Globex", "Initech", "Umbrella", "Vandelay", "Hooli", "Stark", "Wayne")
+ADJECTIVES = ("Compact", "Deluxe", "Classic", "Portable", "Premium", "Eco", "Smart", "Heavy-Duty", "Mini", "Pro")
+NOUNS = ("Speaker", "Lamp", "Jacket", "Novel", "Racket", "Puzzle", "Monitor", "Kettle", "Backpack", "Charger",
+         "Drill", "Blender", "Helmet", "Camera", "Watch", "Chair", "Notebook", "Headset", "Bottle", "Router")
+FIRST_NAMES = ("Alice", "Bob", "Carmen", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jamal", "Kofi", "Lena")
+LAST_NAMES = ("Smith", "Garcia", "Chen", "Okafor", "Novak", "Patel", "Kowalski", "Silva", "Nguyen", "Haddad")
+CITIES = ("Springfield", "Riverton", "Lakeside", "Fairview", "Georgetown", "Kingston", "Milford", "Ashland")
+
+# Orders placed within this many days may still be open; older ones are settled
+OPEN_ORDER_DAYS = 14
+ITEMS_PER_ORDER_WEIGHTS = (40, 25, 15, 12, 8)
+
+def scaled_counts(scale: float) -> dict:
+    return {name: max(1, round(count * scale)) for name, count in SCALE_ONE.items()}
+
+def _skewed_index(rng: random.Random, size: int, power: float) -> int:
+    """Index in [0, size) biased towards 0, so a few customers and products dominate like in real sales."""
+    return min(size - 1, int(size * rng.random() ** power))
+
+def _order_status(rng: random.Random, age_days: float) -> models.OrderStatus:
+    roll = rng.random()
+    if age_days > OPEN_ORDER_DAYS:
+        if roll < 0.05:
+            return models.OrderStatus.cancelled
+        return models.OrderStatus.shipped if roll < 0.08 else models.OrderStatus.delivered
+    for status, cumulative in ((models.OrderStatus.pending, 0.40), (models.OrderStatus.confirmed, 0.70),
+                               (models.OrderStatus.shipped, 0.90), (models.OrderStatus.delivered, 0.95)):
+        if roll < cumulative:
+            return status
+    return models.OrderStatus.cancelled
+
+class BulkLoader:
+    """Writes generated rows in chunks, one transaction and one executemany per table per chunk."""
+
+    def __init__(self, engine, chunk_size: int = SEED_CHUNK_SIZE, log=print):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.log = log
+        self.counts = {}
+        self._started = {}
+
+    def write(self, tables_and_rows):
+        """Insert several tables' rows in one transaction, parents first."""
+        with self.engine.begin() as connection:
+            if connection.dialect.name == "mysql":
+                # The generator guarantees referential integrity and uniqueness, so skip the per-row checks
+                connection.execute(text("SET SESSION foreign_key_checks = 0, unique_checks = 0"))
+            for table, rows in tables_and_rows:
+                if rows:
+                    self._started.setdefault(table.name, time.perf_counter())
+                    connection.execute(insert(table), rows)
+                    self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def load(self, table, rows, report: bool = True):
+        """Insert an iterable of rows in chunks of ``chunk_size``."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == self.chunk_size:
+                self.write([(table, chunk)])
+                chunk = []
+        self.write([(table, chunk)])
+        if report:
+            self.report(table.name)
+
+    def report(self, name: str):
+        rows = self.counts.get(name, 0)
+        elapsed = time.perf_counter() - self._started.get(name, time.perf_counter())
+        rate = f", {rows / elapsed:,.0f} rows/s" if elapsed > 0 else ""
+        self.log(f"{name:>24} {rows:>12,} rows{rate}")
+
+def _next_ids(engine) -> dict:
+    """First free id per seeded table, so a seed run can extend an existing database."""
+    tables = (models.User, models.Category, models.Supplier, models.Product, models.Customer,
+              models.Order, models.OrderItem)
+    with engine.connect() as connection:
+        return {
+            model.__tablename__: (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+            for model in tables
+        }
+
+def seed(engine, scale: float = 1.0, seed: int = 42, years: int = 3, chunk_size: int = SEED_CHUNK_SIZE,
+         now: Optional[datetime] = None, rebuild_rollups: bool = True, log=print) -> dict:
+    """Generate a referentially consistent dataset and bulk-load it.
+
+    The same ``seed`` and ``scale`` always produce the same rows. Orders are laid
+    out chronologically over ``years``; shipped and delivered lines become sale
+    ledger rows, open lines become reservations, and restocks are booked as
+    purchases whenever stock would fall below a product's minimum. Returns the
+    number of rows written per table.
+    """
+    now = now or datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=365 * years)
+    counts = scaled_counts(scale)
+    next_id = _next_ids(engine)
+    loader = BulkLoader(engine, chunk_size=chunk_size, log=log)
+
+    def stream(name: str) -> random.Random:
+        # One stream per table keeps each table reproducible even if another table's shape changes
+        return random.Random(f"{seed}:{name}")
+
+    # Users: seeded staff who place the orders and book the ledger rows
+    password_hash = auth.get_password_hash(f"seed-{seed}")
+    user_ids = list(range(next_id["users"], next_id["users"] + USERS))
+    loader.load(models.User.__table__, (
+        {
+            "id": user_id,
+            "username": f"seed_staff_{user_id}",
+            "email": f"seed_staff_{user_id}@example.com",
+            "hashed_password": password_hash,
+            "full_name": f"Seed Staff {user_id}",
+            "role": models.UserRole.staff,
+            "is_active": True,
+            "created_at": start
+        }
+        for user_id in user_ids
+    ))
+
+    # Category tree: roots, children and the leaves products are filed under
+    category_rows = []
+    leaf_ids = []
+    category_id = next_id["categories"]
+    for root_name in ROOT_CATEGORIES:
+        root_id = category_id
+        category_rows.append({"id": root_id, "name": f"{root_name} {root_id}", "parent_id": None})
+        category_id += 1
+        for child in range(1, CHILDREN_PER_CATEGORY + 1):
+            child_id = category_id
+            category_rows.append({"id": child_id, "name": f"{root_name} {root_id}.{child}", "parent_id": root_id})
+            category_id += 1
+            for leaf in range(1, LEAVES_PER_CHILD + 1):
+                category_rows.append({
+                    "id": category_id, "name": f"{root_name} {root_id}.{child}.{leaf}", "parent_id": child_id
+                })
+                leaf_ids.append(category_id)
+                category_id += 1
+    for row in category_rows:
+        row.update({"description": f"Generated category {row['name']}", "is_active": True, "created_at": start})
+    loader.load(models.Category.__table__, category_rows)
+
+    rng = stream("suppliers")
+    loader.load(models.Supplier.__table__, (
+        {
+            "id": supplier_id,
+            "name": f"{rng.choice(BRANDS)} Wholesale {supplier_id}",
+            "contact_person": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"orders{supplier_id}@supplier.example.com",
+            "phone": f"+1-555-{rng.randrange(10000):04d}",
+            "address": f"{rng.randrange(1, 999)} Industrial Way, {rng.choice(CITIES)}",
+            "is_active": True,
+            "created_at": start
+        }
+        for supplier_id in range(next_id["suppliers"], next_id["suppliers"] + counts["suppliers"])
+    ))
+
+    # Products, with their opening stock booked as a purchase on the first day
+    n_products = counts["products"]
+    first_product = next_id["products"]
+    prices = array("d")
+    min_levels = array("l")
+    max_levels = array("l")
+    stock = array("l")
+    rng = stream("products")
+
+    def product_rows():
+        for index in range(n_products):
+            product_id = first_product + index
+            price = max(1.0, round(rng.lognormvariate(3.5, 1.0), 2))
+            min_level = rng.randint(5, 50)
+            max_level = min_level * rng.randint(5, 20)
+            prices.append(price)
+            min_levels.append(min_level)
+            max_levels.append(max_level)
+            stock.append(max_level)
+            roll = rng.random()
+            yield {
+                "id": product_id,
+                "sku": f"SKU-{seed}-{product_id:08d}",
+                "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}",
+                "description": f"Generated product {product_id}",
+                "price": price,
+                "cost_price": round(price * rng.uniform(0.45, 0.8), 2),
+                "category_id": rng.choice(leaf_ids),
+                "brand": rng.choice(BRANDS),
+                "model": f"M-{rng.randrange(100000):05d}",
+                "weight": round(rng.uniform(0.05, 25.0), 2),
+                "dimensions": f"{rng.randint(5, 120)} x {rng.randint(5, 120)} x {rng.randint(1, 80)} cm",
+                "status": (models.ProductStatus.active if roll < 0.95 else
+                           models.ProductStatus.inactive if roll < 0.98 else models.ProductStatus.discontinued),
+                "min_stock_level": min_level,
+                "max_stock_level": max_level,
+                "created_at": start
+            }
+
+    loader.load(models.Product.__table__, product_rows())
+    loader.load(models.InventoryTransaction.__table__, (
+        {
+            "product_id": first_product + index,
+            "user_id": user_ids[0],
+            "transaction_type": models.TransactionType.purchase,
+            "quantity": stock[index],
+            "previous_stock": 0,
+            "new_stock": stock[index],
+            "reference_id": None,
+            "reference_type": None,
+            "notes": "Opening stock",
+            "created_at": start
+        }
+        for index in range(n_products)
+    ), report=False)
+
+    rng = stream("customers")
+    n_customers = counts["customers"]
+    first_customer = next_id["customers"]
+    loader.load(models.Customer.__table__, (
+        {
+            "id": customer_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"customer{customer_id}.{seed}@example.com",
+            "phone": f"+1-555-{rng.randrange(10000):04d}",
+            "address": f"{rng.randrange(1, 9999)} Main St, {rng.choice(CITIES)}",
+            "is_active": True,
+            "created_at": start
+        }
+        for customer_id in range(first_customer, first_customer + n_customers)
+    ))
+
+    # Orders in chronological order; each chunk writes its orders, items and ledger rows together
+    rng = stream("orders")
+    n_orders = counts["orders"]
+    span = (now - start).total_seconds()
+    reserved = array("l", [0]) * n_products
+    order_id = next_id["orders"]
+    item_id = next_id["order_items"]
+    item_counts = range(1, len(ITEMS_PER_ORDER_WEIGHTS) + 1)
+    orders_table = models.Order.__table__
+    items_table = models.OrderItem.__table__
+    ledger_table = models.InventoryTransaction.__table__
+    for chunk_start in range(0, n_orders, chunk_size):
+        order_rows, item_rows, ledger_rows = [], [], []
+        for position in range(chunk_start, min(chunk_start + chunk_size, n_orders)):
+            created_at = start + timedelta(seconds=span * (position + rng.random()) / n_orders)
+            status = _order_status(rng, (now - created_at).total_seconds() / 86400)
+            user_id = rng.choice(user_ids)
+            products = set()
+            for _ in range(rng.choices(item_counts, weights=ITEMS_PER_ORDER_WEIGHTS)[0]):
+                products.add(_skewed_index(rng, n_products, 3))
+            total = 0.0
+            for index in sorted(products):
+                product_id = first_product + index
+                quantity = min(20, 1 + int(rng.expovariate(0.7)))
+                line_total = round(quantity * prices[index], 2)
+                total += line_total
+                item_rows.append({
+                    "id": item_id, "order_id": order_id, "product_id": product_id,
+                    "quantity": quantity, "unit_price": prices[index], "total_price": line_total
+                })
+                item_id += 1
+                if status in (models.OrderStatus.pending, models.OrderStatus.confirmed):
+                    reserved[index] += quantity
+                elif status in (models.OrderStatus.shipped, models.OrderStatus.delivered):
+                    if stock[index] - quantity < min_levels[index]:
+                        # Restocked by a delivery the morning before the sale
+                        restock = max(max_levels[index], min_levels[index] + quantity) - stock[index]
+                        ledger_rows.append({
+                            "product_id": product_id, "user_id": user_id,
+                            "transaction_type": models.TransactionType.purchase, "quantity": restock,
+                            "previous_stock": stock[index], "new_stock": stock[index] + restock,
+                            "reference_id": None, "reference_type": None, "notes": "Restock",
+                            "created_at": created_at - timedelta(hours=1)
+                        })
+                        stock[index] += restock
+                    ledger_rows.append({
+                        "product_id": product_id, "user_id": user_id,
+                        "transaction_type": models.TransactionType.sale, "quantity": quantity,
+                        "previous_stock": stock[index], "new_stock": stock[index] - quantity,
+                        "reference_id": order_id, "reference_type": "order", "notes": None,
+                        "created_at": created_at
+                    })
+                    stock[index] -= quantity
+            order_rows.append({
+                "id": order_id,
+                "order_number": numbering.format_number("SEED", order_id, created_at),
+                "customer_id": first_customer + _skewed_index(rng, n_customers, 2),
+                "user_id": user_id,
+                "status": status,
+                "total_amount": round(total, 2),
+                "notes": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "version": 1
+            })
+            order_id += 1
+        loader.write([(orders_table, order_rows), (items_table, item_rows), (ledger_table, ledger_rows)])
+    for name in (orders_table.name, items_table.name, ledger_table.name):
+        loader.report(name)
+
+    # Inventory last: current stock is where the ledger ends, reservations are the open order lines
+    loader.load(models.Inventory.__table__, (
+        {
+            "product_id": first_product + index,
+            "current_stock": stock[index],
+            "reserved_stock": reserved[index],
+            "available_stock": stock[index] - reserved[index],
+            "last_updated": now,
+            "version": 1
+        }
+        for index in range(n_products)
+    ))
+
+    if rebuild_rollups:
+        db = Session(bind=engine)
+        try:
+            result = rollups.rebuild_rollups(db)
+            customers = rollups.rebuild_customer_summaries(db)
+        finally:
+            db.close()
+        log(f"{'rollups rebuilt':>24} {result['product_rows']:>12,} product days")
+        log(f"{'customer summaries':>24} {customers:>12,} customers")
+    return loader.counts
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import engine
+
+    parser = argparse.ArgumentParser(description="Generate and bulk-load a synthetic dataset")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplier on the scale-1 row counts (10k products, 50k orders)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--years", type=int, default=3, help="length of the order and ledger history")
+    parser.add_argument("--chunk-size", type=int, default=SEED_CHUNK_SIZE)
+    parser.add_argument("--skip-rollups", action="store_true",
+                        help="leave the daily sales rollups and customer summaries untouched")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(engine, scale=args.scale, seed=args.seed, years=args.years, chunk_size=args.chunk_size,
+                  rebuild_rollups=not args.skip_rollups)
+    print(f"Loaded {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,125 @@
+import os
+import random
+import threading
+import time
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+DB_WAIT_TIMEOUT_SECONDS = float(os.getenv("DB_WAIT_TIMEOUT_SECONDS", "120"))
+DB_WAIT_INITIAL_DELAY_SECONDS = float(os.getenv("DB_WAIT_INITIAL_DELAY_SECONDS", "0.25"))
+DB_WAIT_MAX_DELAY_SECONDS = float(os.getenv("DB_WAIT_MAX_DELAY_SECONDS", "5"))
+
+class Readiness:
+    """Whether this process has reached the database and warmed its pool."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started_at = clock()
+        self._lock = threading.Lock()
+        self._ready = False
+        self._detail = "starting"
+        self._ready_after: Optional[float] = None
+
+    def update(self, detail: str):
+        with self._lock:
+            self._detail = detail
+
+    def mark_ready(self):
+        with self._lock:
+            self._ready = True
+            self._detail = "ready"
+            self._ready_after = self.clock() - self.started_at
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "detail": self._detail,
+                "ready_after_seconds": None if self._ready_after is None else round(self._ready_after, 3)
+            }
+
+readiness = Readiness()
+
+def wait_for_database(engine, timeout: Optional[float] = DB_WAIT_TIMEOUT_SECONDS,
+                      initial_delay: float = DB_WAIT_INITIAL_DELAY_SECONDS,
+                      max_delay: float = DB_WAIT_MAX_DELAY_SECONDS,
+                      on_retry=None, clock=time.monotonic, sleep=time.sleep) -> int:
+    """Block until the database answers ``SELECT 1`` and return the number of attempts.
+
+    Retries back off exponentially up to ``max_delay`` with jitter, so replicas
+    started together do not retry in lockstep. ``timeout=None`` waits forever;
+    otherwise the last connection error is raised once it runs out.
+    """
+    deadline = None if timeout is None else clock() + timeout
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return attempt
+        except DBAPIError as exc:
+            remaining = None if deadline is None else deadline - clock()
+            if remaining is not None and remaining <= 0:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, exc)
+            pause = delay / 2 + random.uniform(0, delay / 2)
+            sleep(pause if remaining is None else min(pause, remaining))
+            delay = min(delay * 2, max_delay)
+
+def warm_pool(engine) -> int:
+    """Open the pool's steady-state connections up front and return how many were opened."""
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        # Hold every checkout until the end so the pool opens distinct connections
+        for _ in range(size):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+def prepare(engine, state: Readiness = readiness, **wait_options):
+    """Wait for the database, warm the pool, then mark the process ready."""
+    def on_retry(attempt, exc):
+        state.update(f"waiting for database (attempt {attempt}): {type(exc.orig or exc).__name__}")
+
+    state.update("waiting for database")
+    wait_for_database(engine, on_retry=on_retry, **wait_options)
+    state.update("warming connection pool")
+    warm_pool(engine)
+    state.mark_ready()
+
+def start_in_background(engine, state: Readiness = readiness) -> threading.Thread:
+    """Run prepare() off the event loop so the app can answer /health straight away."""
+    thread = threading.Thread(target=prepare, args=(engine, state), kwargs={"timeout": None},
+                              name="startup", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from database_connection import engine
+
+    parser = argparse.ArgumentParser(description="Wait until the database accepts connections")
+    parser.add_argument("--timeout", type=float, default=DB_WAIT_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    try:
+        attempts = wait_for_database(
+            engine,
+            timeout=args.timeout,
+            on_retry=lambda attempt, exc: print(f"Database not ready (attempt {attempt}), retrying")
+        )
+    except DBAPIError:
+        print(f"Database still unavailable after {args.timeout:.0f}s")
+        sys.exit(1)
+    print(f"Database ready after {attempts} attempt(s) in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,205 @@
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, update, delete, insert, func, case
+from sqlalchemy.orm import Session
+import models
+
+STOCK_SHARD_CACHE_SECONDS = float(os.getenv("STOCK_SHARD_CACHE_SECONDS", "1"))
+
+inventory = models.Inventory.__table__
+shards = models.InventoryShard.__table__
+
+# Pending shard reservations per product, so reads do not sum the shards every time
+_pending_cache: Dict[int, tuple] = {}
+_pending_lock = threading.Lock()
+
+def _forget_pending(product_ids: Iterable[int]):
+    with _pending_lock:
+        for product_id in product_ids:
+            _pending_cache.pop(product_id, None)
+
+def clear_cache():
+    with _pending_lock:
+        _pending_cache.clear()
+
+def spread(total: int, count: int) -> List[int]:
+    """Split total into count near-equal parts, the first ones taking the remainder."""
+    share, remainder = divmod(total, count)
+    return [share + (1 if index < remainder else 0) for index in range(count)]
+
+def reserve(db: Session, product_id: int, quantity: int, shard_count: int) -> bool:
+    """Take a reservation on one of the product's shards and return whether the product needs rebalancing.
+
+    The shard is picked at random among those with enough allowance, so concurrent
+    orders for the same product lock different rows. Allowances are read without
+    locking and are only a hint: a reservation is never refused, it just leaves
+    the shard short, and the caller rebalances once its transaction has committed.
+    """
+    allowances = dict(db.execute(
+        select(shards.c.shard, shards.c.available_stock).where(shards.c.product_id == product_id)
+    ).all())
+    candidates = [shard for shard, allowance in allowances.items() if allowance >= quantity]
+    if candidates:
+        shard = random.choice(candidates)
+    elif allowances:
+        shard = max(allowances, key=allowances.get)
+    else:
+        shard = random.randrange(shard_count)
+    db.execute(
+        update(shards)
+        .where(shards.c.product_id == product_id, shards.c.shard == shard)
+        .values(available_stock=shards.c.available_stock - quantity,
+                reserved_stock=shards.c.reserved_stock + quantity)
+    )
+    return allowances.get(shard, 0) <= quantity
+
+def release(db: Session, product_id: int, quantity: int, shard_count: int):
+    """Hand reserved units back through a random shard."""
+    db.execute(
+        update(shards)
+        .where(shards.c.product_id == product_id, shards.c.shard == random.randrange(shard_count))
+        .values(available_stock=shards.c.available_stock + quantity,
+                reserved_stock=shards.c.reserved_stock - quantity)
+    )
+
+def fold(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Move the reservations held in shards onto the inventory rows and return the units moved per product.
+
+    Locks the shards before the inventory rows, the same order every other shard
+    operation uses. Inventory objects already loaded in the session are expired
+    because their row changed underneath them.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+    pending = {}
+    for product_id, reserved in db.execute(
+        select(shards.c.product_id, shards.c.reserved_stock)
+        .where(shards.c.product_id.in_(product_ids))
+        .order_by(shards.c.product_id, shards.c.shard)
+        .with_for_update()
+    ):
+        pending[product_id] = pending.get(product_id, 0) + reserved
+    pending = {product_id: reserved for product_id, reserved in pending.items() if reserved}
+    if pending:
+        delta = case(pending, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(pending)))
+            .values(
+                reserved_stock=inventory.c.reserved_stock + delta,
+                available_stock=inventory.c.available_stock - delta,
+                version=inventory.c.version + 1,
+                last_updated=func.now()
+            )
+        )
+        db.execute(update(shards).where(shards.c.product_id.in_(list(pending))).values(reserved_stock=0))
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, models.Inventory) and obj.product_id in pending:
+                db.expire(obj)
+    _forget_pending(product_ids)
+    return pending
+
+def rebalance(db: Session, product_ids: Iterable[int]):
+    """Fold each product's shards and deal its available stock out to them again in equal parts."""
+    product_ids = sorted(set(product_ids))
+    fold(db, product_ids)
+    rows = db.execute(
+        select(inventory.c.product_id, inventory.c.available_stock, inventory.c.shard_count)
+        .where(inventory.c.product_id.in_(product_ids), inventory.c.shard_count > 0)
+        .with_for_update()
+    ).all()
+    for product_id, available, shard_count in rows:
+        allowances = spread(max(available, 0), shard_count)
+        db.execute(
+            update(shards)
+            .where(shards.c.product_id == product_id)
+            .values(available_stock=case(dict(enumerate(allowances)), value=shards.c.shard, else_=0))
+        )
+
+def configure(db: Session, product_id: int, shard_count: int) -> Optional[models.Inventory]:
+    """Spread a product's reservations over shard_count shards, or go back to the inventory row with 0."""
+    fold(db, [product_id])
+    available = db.execute(
+        select(inventory.c.available_stock).where(inventory.c.product_id == product_id).with_for_update()
+    ).scalar()
+    if available is None:
+        return None
+    db.execute(delete(shards).where(shards.c.product_id == product_id))
+    if shard_count:
+        db.execute(insert(shards), [
+            {"product_id": product_id, "shard": shard, "available_stock": allowance, "reserved_stock": 0}
+            for shard, allowance in enumerate(spread(max(available, 0), shard_count))
+        ])
+    db.execute(
+        update(inventory)
+        .where(inventory.c.product_id == product_id)
+        .values(shard_count=shard_count, version=inventory.c.version + 1)
+    )
+    db.commit()
+    return db.query(models.Inventory).populate_existing().filter(models.Inventory.product_id == product_id).first()
+
+def get_shards(db: Session, product_id: int):
+    return db.query(models.InventoryShard).filter(
+        models.InventoryShard.product_id == product_id
+    ).order_by(models.InventoryShard.shard).all()
+
+def pending_reservations(db: Session, product_ids: Iterable[int], max_age: Optional[float] = None) -> Dict[int, int]:
+    """Units reserved in shards and not yet folded, per product, at most max_age seconds old."""
+    max_age = STOCK_SHARD_CACHE_SECONDS if max_age is None else max_age
+    now = time.monotonic()
+    result = {}
+    missing = []
+    with _pending_lock:
+        for product_id in set(product_ids):
+            cached = _pending_cache.get(product_id)
+            if cached is not None and cached[1] > now:
+                result[product_id] = cached[0]
+            else:
+                missing.append(product_id)
+    if missing:
+        fresh = dict.fromkeys(missing, 0)
+        fresh.update(db.execute(
+            select(shards.c.product_id, func.sum(shards.c.reserved_stock))
+            .where(shards.c.product_id.in_(missing))
+            .group_by(shards.c.product_id)
+        ).all())
+        with _pending_lock:
+            for product_id, reserved in fresh.items():
+                _pending_cache[product_id] = (int(reserved or 0), now + max_age)
+        result.update({product_id: int(reserved or 0) for product_id, reserved in fresh.items()})
+    return result
+
+def snapshot(db: Session, row) -> SimpleNamespace:
+    """A sharded product's stock levels with its pending shard reservations, summed now."""
+    reserved = pending_reservations(db, [row.product_id], max_age=0)[row.product_id]
+    return SimpleNamespace(
+        product_id=row.product_id,
+        current_stock=row.current_stock,
+        reserved_stock=row.reserved_stock + reserved,
+        available_stock=row.available_stock - reserved
+    )
+
+if __name__ == "__main__":
+    import argparse
+    from database_connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Fold and rebalance sharded stock counters")
+    parser.add_argument("command", choices=["rebalance"])
+    parser.add_argument("--product-id", type=int, action="append", help="Product to rebalance (repeatable, default all sharded)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        product_ids = args.product_id or [
+            product_id for product_id, in db.execute(select(inventory.c.product_id).where(inventory.c.shard_count > 0))
+        ]
+        rebalance(db, product_ids)
+        db.commit()
+        print(f"Rebalanced {len(product_ids)} sharded product(s)")
+    finally:
+        db.close()
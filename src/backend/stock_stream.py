@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+from typing import List, Optional
+from sqlalchemy import func
+import models, outbox
+from database_connection import SessionLocal
+
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "0.5"))
+STREAM_COALESCE_SECONDS = float(os.getenv("STREAM_COALESCE_SECONDS", "0.25"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "1000"))
+STREAM_GAP_TIMEOUT_SECONDS = float(os.getenv("STREAM_GAP_TIMEOUT_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+def stock_update(event) -> dict:
+    payload = json.loads(event.payload)
+    return {
+        "product_id": event.aggregate_id,
+        "current_stock": payload["current_stock"],
+        "reserved_stock": payload["reserved_stock"],
+        "available_stock": payload["available_stock"],
+        "event_type": event.event_type
+    }
+
+class Subscriber:
+    """Unsent stock levels for one client, keeping only the latest per product.
+
+    At most max_pending products are held. A client that falls further behind
+    loses its queued updates and is told to resync, so a slow browser costs a
+    bounded amount of memory.
+    """
+
+    def __init__(self, product_ids: Optional[List[int]] = None, max_pending: int = STREAM_MAX_PENDING):
+        self.product_ids = set(product_ids) if product_ids else None
+        self.max_pending = max_pending
+        self.pending = {}
+        self.overflowed = False
+        self._wakeup = asyncio.Event()
+
+    def offer(self, update: dict):
+        product_id = update["product_id"]
+        if self.product_ids is not None and product_id not in self.product_ids:
+            return
+        if self.overflowed:
+            return
+        if product_id not in self.pending and len(self.pending) >= self.max_pending:
+            self.pending.clear()
+            self.overflowed = True
+        else:
+            self.pending[product_id] = update
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float, coalesce_seconds: float = 0):
+        """Wait for updates and return (resync, updates), or None if nothing arrived within timeout."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if coalesce_seconds:
+            # Let a burst of changes to the same products collapse into one message
+            await asyncio.sleep(coalesce_seconds)
+        self._wakeup.clear()
+        resync, self.overflowed = self.overflowed, False
+        updates, self.pending = list(self.pending.values()), {}
+        return resync, updates
+
+class StockStream:
+    """Tails the outbox and fans committed stock changes out to subscribers.
+
+    Reading the outbox rather than hooking local commits means every API process
+    sees changes made by any replica or worker. The poller only runs while
+    someone is subscribed.
+    """
+
+    def __init__(self, session_factory, poll_seconds: float = STREAM_POLL_SECONDS,
+                 max_pending: int = STREAM_MAX_PENDING, gap_timeout: float = STREAM_GAP_TIMEOUT_SECONDS):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.max_pending = max_pending
+        self.gap_timeout = gap_timeout
+        self.subscribers = set()
+        self.cursor = None
+        self._task = None
+
+    def subscribe(self, product_ids: Optional[List[int]] = None) -> Subscriber:
+        subscriber = Subscriber(product_ids, self.max_pending)
+        self.subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def poll_once(self) -> List[dict]:
+        """Return stock updates committed since the last poll; the first poll only finds the starting point."""
+        db = self.session_factory()
+        try:
+            if self.cursor is None:
+                latest = db.query(func.max(models.OutboxEvent.id)).scalar() or 0
+                self.cursor = outbox.EventCursor(latest, gap_timeout=self.gap_timeout)
+                return []
+            events = self.cursor.late(outbox.fetch_skipped(db, self.cursor))
+            events += self.cursor.advance(outbox.fetch_events(db, self.cursor.position, outbox.OUTBOX_BATCH_SIZE))
+            return [stock_update(event) for event in events if event.aggregate_type == "inventory"]
+        finally:
+            db.close()
+
+    def publish(self, updates: List[dict]):
+        for subscriber in list(self.subscribers):
+            for update in updates:
+                subscriber.offer(update)
+
+    async def _poll_loop(self):
+        while self.subscribers:
+            try:
+                updates = await asyncio.to_thread(self.poll_once)
+            except Exception:
+                logger.exception("Stock stream poll failed, retrying")
+                updates = []
+            self.publish(updates)
+            await asyncio.sleep(self.poll_seconds)
+        # Start from the latest event again next time instead of replaying the backlog
+        self.cursor = None
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def event_stream(stream: StockStream, subscriber: Subscriber, is_disconnected,
+                       heartbeat_seconds: float = STREAM_HEARTBEAT_SECONDS,
+                       coalesce_seconds: float = STREAM_COALESCE_SECONDS):
+    try:
+        yield "retry: 3000\n\n"
+        while not await is_disconnected():
+            batch = await subscriber.next_batch(heartbeat_seconds, coalesce_seconds)
+            if batch is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                continue
+            resync, updates = batch
+            if resync:
+                yield format_event("resync", {})
+            if updates:
+                yield format_event("stock", updates)
+    finally:
+        stream.unsubscribe(subscriber)
+
+stream = StockStream(SessionLocal)
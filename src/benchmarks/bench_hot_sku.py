@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database_connection import Base
+import models, schemas, data_access, stock_shards
+
+def setup(Session, stock: int):
+    """Create a fresh product with stock, plus the user and customer placing the orders."""
+    db = Session()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        category = models.Category(name=f"Bench {tag}")
+        user = models.User(username=f"bench-{tag}", email=f"bench-{tag}@example.com", hashed_password="-",
+                           full_name="Benchmark")
+        customer = models.Customer(name=f"Bench {tag}", email=f"bench-{tag}@example.com")
+        db.add_all([category, user, customer])
+        db.flush()
+        product = models.Product(sku=f"HOT-{tag}", name="Hot product", price=10, cost_price=5,
+                                 category_id=category.id)
+        db.add(product)
+        db.flush()
+        db.add(models.Inventory(product_id=product.id, current_stock=stock, reserved_stock=0, available_stock=stock))
+        db.commit()
+        return product.id, user.id, customer.id
+    finally:
+        db.close()
+
+def place_order(Session, product_id: int, user_id: int, customer_id: int):
+    db = Session()
+    try:
+        started = time.perf_counter()
+        data_access.create_order(db, schemas.OrderCreate(
+            customer_id=customer_id,
+            total_amount=10,
+            items=[schemas.OrderItemCreate(product_id=product_id, quantity=1, unit_price=10, total_price=10)]
+        ), user_id)
+        return None, time.perf_counter() - started
+    except Exception as exc:
+        db.rollback()
+        return type(exc).__name__, None
+    finally:
+        db.close()
+
+def run(Session, shards: int, orders: int, concurrency: int):
+    product_id, user_id, customer_id = setup(Session, stock=orders * 2)
+    if shards:
+        db = Session()
+        try:
+            stock_shards.configure(db, product_id, shards)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: place_order(Session, product_id, user_id, customer_id), range(orders)))
+    elapsed = time.perf_counter() - started
+
+    errors = Counter(error for error, _ in results if error)
+    latencies = sorted(latency for _, latency in results if latency is not None)
+    db = Session()
+    try:
+        inventory = db.query(models.Inventory).filter(models.Inventory.product_id == product_id).one()
+        reserved = inventory.reserved_stock + stock_shards.pending_reservations(db, [product_id], max_age=0)[product_id]
+    finally:
+        db.close()
+
+    label = f"{shards} shards" if shards else "single row"
+    placed = len(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+    print(f"{label:>12}: {placed}/{orders} orders in {elapsed:.2f}s, {placed / elapsed:,.0f} orders/s, p95 {p95:.0f} ms")
+    if errors:
+        print(f"{'':>12}  failed: {', '.join(f'{name} x{count}' for name, count in errors.most_common())}")
+    if reserved != placed:
+        print(f"{'':>12}  MISMATCH: {reserved} units reserved for {placed} placed orders")
+    return placed, errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Place concurrent orders for one SKU with and without stock shards")
+    parser.add_argument("--url", default="sqlite:///./bench_hot_sku.db",
+                        help="Database URL to benchmark against; use MySQL for meaningful row-lock contention")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--shards", type=int, action="append",
+                        help="Shard count to run (repeatable, 0 is the single inventory row; default 0 and 16)")
+    args = parser.parse_args()
+
+    engine_options = {"pool_size": args.concurrency, "max_overflow": 0}
+    if args.url.startswith("sqlite"):
+        engine_options["connect_args"] = {"check_same_thread": False, "timeout": 60}
+    engine = create_engine(args.url, **engine_options)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    for shards in args.shards or [0, 16]:
+        run(Session, shards, args.orders, args.concurrency)
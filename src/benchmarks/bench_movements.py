@@ -0,0 +1,130 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database_connection import Base
+import models, schemas, data_access, movement_queue
+
+def setup(Session, products: int):
+    """Create products with stock and the user recording the movements."""
+    db = Session()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        category = models.Category(name=f"Bench {tag}")
+        user = models.User(username=f"bench-{tag}", email=f"bench-{tag}@example.com", hashed_password="-",
+                           full_name="Benchmark")
+        db.add_all([category, user])
+        db.flush()
+        rows = [models.Product(sku=f"MOVE-{tag}-{index}", name="Moving product", price=10, cost_price=5,
+                               category_id=category.id) for index in range(products)]
+        db.add_all(rows)
+        db.flush()
+        db.add_all([models.Inventory(product_id=product.id, current_stock=0, reserved_stock=0, available_stock=0)
+                    for product in rows])
+        db.commit()
+        return [product.id for product in rows], user.id
+    finally:
+        db.close()
+
+def movement(product_id: int):
+    return schemas.InventoryTransactionCreate(product_id=product_id, transaction_type="purchase", quantity=1)
+
+def direct(Session, product_id: int, user_id: int):
+    db = Session()
+    try:
+        data_access.create_inventory_transaction(db, movement(product_id), user_id)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def queued(Session, queue, product_id: int, user_id: int):
+    # Like the route: the request's session looks the user up, then hands its connection back before waiting
+    db = Session()
+    try:
+        db.get(models.User, user_id)
+        future = queue.submit(movement(product_id), user_id)
+    finally:
+        db.close()
+    return future.result()
+
+def run(Session, mode: str, movements: int, concurrency: int, products: int, batch_size: int, window_ms: float):
+    product_ids, user_id = setup(Session, products)
+    queue = None
+    if mode == "batched":
+        queue = movement_queue.MovementQueue(Session, batch_size=batch_size, window_seconds=window_ms / 1000).start()
+        record = lambda index: queued(Session, queue, product_ids[index % products], user_id)
+    else:
+        record = lambda index: direct(Session, product_ids[index % products], user_id)
+
+    latencies = []
+    errors = Counter()
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            record(index)
+        except Exception as exc:
+            errors[type(exc).__name__] += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(movements)))
+    elapsed = time.perf_counter() - started
+    if queue is not None:
+        queue.stop()
+
+    latencies.sort()
+    recorded = len(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+    line = (f"{mode:>8}: {recorded}/{movements} movements in {elapsed:.2f}s, "
+            f"{recorded / elapsed:,.0f} movements/s, p95 {p95:.0f} ms")
+    if queue is not None:
+        line += f", {queue.batches} commits"
+    print(line)
+    if errors:
+        print(f"{'':>8}  failed: {', '.join(f'{name} x{count}' for name, count in errors.most_common())}")
+
+    db = Session()
+    try:
+        stock = sum(inventory.current_stock for inventory in db.query(models.Inventory).filter(
+            models.Inventory.product_id.in_(product_ids)
+        ))
+    finally:
+        db.close()
+    if stock != recorded:
+        print(f"{'':>8}  MISMATCH: {stock} units in stock for {recorded} recorded movements")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record stock movements with a commit each and through the group-commit queue")
+    parser.add_argument("--url", default="sqlite:///./bench_movements.db",
+                        help="Database URL to benchmark against; use MySQL to see the cost of a durable commit")
+    parser.add_argument("--movements", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=movement_queue.MOVEMENT_BATCH_SIZE)
+    parser.add_argument("--window-ms", type=float, default=movement_queue.MOVEMENT_BATCH_WINDOW_MS)
+    parser.add_argument("--pool-size", type=int, default=5,
+                        help="Connections shared by the requests and the queue worker, as in one API process")
+    args = parser.parse_args()
+
+    engine_options = {"pool_size": args.pool_size, "max_overflow": 0}
+    if args.url.startswith("sqlite"):
+        engine_options["connect_args"] = {"check_same_thread": False, "timeout": 60}
+    engine = create_engine(args.url, **engine_options)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    for mode in ("direct", "batched"):
+        run(Session, mode, args.movements, args.concurrency, args.products, args.batch_size, args.window_ms)
@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, DateTime, func, insert
+import models, numbering
+
+metadata = MetaData()
+
+# Same shape and unique index as orders.order_number, without the foreign keys
+bench_orders = Table(
+    "bench_orders", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("order_number", String(50), unique=True, nullable=False),
+    Column("created_at", DateTime, server_default=func.now())
+)
+
+def random_numbers():
+    # The previous scheme, widened to a full uuid so the run itself cannot collide
+    while True:
+        yield f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex.upper()}"
+
+def generator_numbers(generator):
+    while True:
+        yield numbering.format_number("ORD", generator.next_value())
+
+def run(engine, strategy: str, rows: int, batch_size: int, report_every: int):
+    metadata.drop_all(engine)
+    models.NumberSequence.__table__.drop(engine, checkfirst=True)
+    metadata.create_all(engine)
+    models.NumberSequence.__table__.create(engine)
+
+    if strategy == "random":
+        numbers = random_numbers()
+    elif strategy == "sequence":
+        numbers = generator_numbers(numbering.BlockSequenceGenerator(engine, "bench", numbering.NUMBER_BLOCK_SIZE))
+    else:
+        numbers = generator_numbers(numbering.SnowflakeGenerator(node_id=1))
+
+    inserted = 0
+    started = window_started = time.perf_counter()
+    while inserted < rows:
+        batch = [{"order_number": next(numbers)} for _ in range(min(batch_size, rows - inserted))]
+        with engine.begin() as conn:
+            conn.execute(insert(bench_orders), batch)
+        inserted += len(batch)
+        if inserted % report_every == 0 or inserted == rows:
+            now = time.perf_counter()
+            window = report_every if inserted % report_every == 0 else inserted % report_every
+            print(f"{strategy:>9} {inserted:>12,} rows  {window / (now - window_started):>10,.0f} rows/s")
+            window_started = now
+    elapsed = time.perf_counter() - started
+    print(f"{strategy:>9} total {elapsed:.1f}s, {rows / elapsed:,.0f} rows/s")
+    metadata.drop_all(engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare order number schemes by insert throughput into a uniquely indexed column")
+    parser.add_argument("--url", default="sqlite:///./bench_order_numbers.db", help="Database URL to benchmark against")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--report-every", type=int, default=1_000_000)
+    parser.add_argument("--strategy", choices=["random", "sequence", "snowflake"], action="append",
+                        help="Scheme to run (repeatable, default all)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    for strategy in args.strategy or ["random", "sequence", "snowflake"]:
+        run(engine, strategy, args.rows, args.batch_size, args.report_every)
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+# Modules main must not pull in at import time; they are loaded by the routes that need them
+LAZY_MODULES = ("numpy", "forecasting", "replenishment")
+
+def measure_import():
+    """Import main in a fresh interpreter.
+
+    Returns (total_ms, direct, imported): the cumulative time of each module main
+    imports directly, which is where a budget overrun is fixed, and the names of
+    every module loaded on the way.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=backend_path, capture_output=True, text=True, check=True
+    )
+    total = None
+    direct = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        # importtime indents each nesting level by two spaces under the separator's one
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imported.add(name.strip())
+        if depth == 0 and name.strip() == "main":
+            total = int(cumulative_us) / 1000
+        elif depth == 1:
+            direct[name.strip()] = int(cumulative_us) / 1000
+    return total, direct, imported
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def poll(url: str, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    return None
+
+def measure_serve(timeout: float):
+    """Start uvicorn and time how long until /health and /ready answer 200."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_path
+    )
+    try:
+        deadline = started + timeout
+        health = poll(f"http://127.0.0.1:{port}/health", deadline)
+        healthy_after = time.perf_counter() - started if health else None
+        ready = poll(f"http://127.0.0.1:{port}/ready", deadline)
+        ready_after = time.perf_counter() - started if ready else None
+    finally:
+        process.terminate()
+        process.wait()
+    return healthy_after, ready_after
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure backend import and start-up time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "2000")),
+                        help="fail when the median import of main exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports of main to list")
+    parser.add_argument("--serve", action="store_true",
+                        help="also start uvicorn and time /health and /ready (needs the database)")
+    parser.add_argument("--serve-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    totals = [total for total, _, _ in runs]
+    median = statistics.median(totals)
+    _, modules, imported = min(runs, key=lambda run: abs(run[0] - median))
+    print(f"import main: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms over {args.runs} runs")
+    for name, elapsed in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {elapsed:>8.1f} ms  {name}")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+
+    if args.serve:
+        healthy_after, ready_after = measure_serve(args.serve_timeout)
+        print(f"/health after {healthy_after:.2f}s" if healthy_after else "/health never answered")
+        print(f"/ready after {ready_after:.2f}s" if ready_after else "/ready never answered")
+        if ready_after is None:
+            failures.append(f"not ready within {args.serve_timeout:.0f}s")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
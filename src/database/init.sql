@@ -54,6 +54,17 @@ CREATE TABLE IF NOT EXISTS inventory (
     reserved_stock INT DEFAULT 0 NOT NULL,
     available_stock INT DEFAULT 0 NOT NULL,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    version INT DEFAULT 1 NOT NULL,
+    shard_count INT DEFAULT 0 NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE TABLE IF NOT EXISTS inventory_shards (
+    product_id INT NOT NULL,
+    shard INT NOT NULL,
+    available_stock INT DEFAULT 0 NOT NULL,
+    reserved_stock INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (product_id, shard),
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
 
@@ -91,6 +102,7 @@ CREATE TABLE IF NOT EXISTS orders (
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    version INT DEFAULT 1 NOT NULL,
     FOREIGN KEY (customer_id) REFERENCES customers(id),
     FOREIGN KEY (user_id) REFERENCES users(id),
     INDEX idx_order_number (order_number)
@@ -118,6 +130,7 @@ CREATE TABLE IF NOT EXISTS purchase_orders (
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    version INT DEFAULT 1 NOT NULL,
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id),
     FOREIGN KEY (user_id) REFERENCES users(id),
     INDEX idx_po_number (po_number)
@@ -128,14 +141,17 @@ CREATE TABLE IF NOT EXISTS purchase_order_items (
     purchase_order_id INT NOT NULL,
     product_id INT NOT NULL,
     quantity INT NOT NULL,
+    received_quantity INT DEFAULT 0 NOT NULL,
     unit_cost DECIMAL(10,2) NOT NULL,
     total_cost DECIMAL(10,2) NOT NULL,
     FOREIGN KEY (purchase_order_id) REFERENCES purchase_orders(id),
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
 
+-- Partitioned by month; ledger_archive.py adds the monthly partitions and archives closed ones.
+-- MySQL does not allow foreign keys on partitioned tables and needs created_at in the primary key.
 CREATE TABLE IF NOT EXISTS inventory_transactions (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     product_id INT NOT NULL,
     user_id INT NOT NULL,
     transaction_type ENUM('purchase', 'sale', 'return', 'adjustment') NOT NULL,
@@ -145,9 +161,100 @@ CREATE TABLE IF NOT EXISTS inventory_transactions (
     reference_id INT,
     reference_type VARCHAR(50),
     notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    INDEX idx_inventory_transactions_created (created_at),
+    INDEX idx_inventory_transactions_product (product_id, created_at),
+    INDEX idx_inventory_transactions_user (user_id)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS product_forecasts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT UNIQUE NOT NULL,
+    method VARCHAR(50) NOT NULL,
+    parameter DOUBLE NOT NULL,
+    daily_demand DOUBLE NOT NULL,
+    horizon_days INT NOT NULL,
+    forecast_quantity DOUBLE NOT NULL,
+    mean_absolute_error DOUBLE NOT NULL,
+    history_days INT NOT NULL,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    sales_date DATE NOT NULL,
+    product_id INT NOT NULL,
+    units_sold INT DEFAULT 0 NOT NULL,
+    revenue DOUBLE DEFAULT 0 NOT NULL,
+    order_lines INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (sales_date, product_id),
     FOREIGN KEY (product_id) REFERENCES products(id),
-    FOREIGN KEY (user_id) REFERENCES users(id)
+    INDEX idx_product_id (product_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_category_sales (
+    sales_date DATE NOT NULL,
+    category_id INT NOT NULL,
+    units_sold INT DEFAULT 0 NOT NULL,
+    revenue DOUBLE DEFAULT 0 NOT NULL,
+    order_lines INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (sales_date, category_id),
+    FOREIGN KEY (category_id) REFERENCES categories(id),
+    INDEX idx_category_id (category_id)
+);
+
+CREATE TABLE IF NOT EXISTS customer_summaries (
+    customer_id INT PRIMARY KEY,
+    order_count INT DEFAULT 0 NOT NULL,
+    lifetime_spend DOUBLE DEFAULT 0 NOT NULL,
+    last_order_at TIMESTAMP NULL,
+    FOREIGN KEY (customer_id) REFERENCES customers(id),
+    INDEX idx_order_count (order_count),
+    INDEX idx_lifetime_spend (lifetime_spend),
+    INDEX idx_last_order_at (last_order_at)
+);
+
+CREATE TABLE IF NOT EXISTS number_sequences (
+    name VARCHAR(50) PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS node_leases (
+    node_id INT PRIMARY KEY,
+    holder VARCHAR(100) NOT NULL,
+    expires_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    aggregate_type VARCHAR(50) NOT NULL,
+    aggregate_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_aggregate_id (aggregate_id)
+);
+
+CREATE TABLE IF NOT EXISTS outbox_offsets (
+    sink VARCHAR(100) PRIMARY KEY,
+    last_event_id INT DEFAULT 0 NOT NULL,
+    skipped_ids TEXT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    fingerprint CHAR(64) NOT NULL,
+    response TEXT NULL,
+    claim_id CHAR(32) NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key),
+    INDEX idx_expires_at (expires_at)
 );
 
 -- Insert sample data
@@ -227,4 +334,23 @@ INSERT INTO inventory_transactions (product_id, user_id, transaction_type, quant
 (3, 2, 'sale', -1, 150, 149, 1, 'order', 'Sale from ORD-2024-001'),
 (3, 3, 'sale', -3, 149, 146, 2, 'order', 'Sale from ORD-2024-002'),
 (6, 2, 'sale', -1, 30, 29, 3, 'order', 'Sale from ORD-2024-003'),
-(7, 3, 'sale', -2, 15, 13, 4, 'order', 'Sale from ORD-2024-004');
\ No newline at end of file
+(7, 3, 'sale', -2, 15, 13, 4, 'order', 'Sale from ORD-2024-004');
+
+-- Populate sales rollups from the sample orders
+INSERT INTO daily_product_sales (sales_date, product_id, units_sold, revenue, order_lines)
+SELECT DATE(o.created_at), oi.product_id, SUM(oi.quantity), SUM(oi.total_price), COUNT(*)
+FROM order_items oi JOIN orders o ON o.id = oi.order_id
+WHERE o.status <> 'cancelled'
+GROUP BY DATE(o.created_at), oi.product_id;
+
+INSERT INTO daily_category_sales (sales_date, category_id, units_sold, revenue, order_lines)
+SELECT s.sales_date, p.category_id, SUM(s.units_sold), SUM(s.revenue), SUM(s.order_lines)
+FROM daily_product_sales s JOIN products p ON p.id = s.product_id
+GROUP BY s.sales_date, p.category_id;
+
+-- Populate customer summaries from the sample orders
+INSERT INTO customer_summaries (customer_id, order_count, lifetime_spend, last_order_at)
+SELECT customer_id, COUNT(*), SUM(total_amount), MAX(created_at)
+FROM orders
+WHERE status <> 'cancelled'
+GROUP BY customer_id;
@@ -1,8 +1,12 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context
 import requests
 import os
+import hashlib
+from urllib.parse import urlencode
 from dotenv import load_dotenv
 from functools import wraps
+from fanout import fetch_all
+from refcache import ReferenceCache
 
 load_dotenv()
 
@@ -12,6 +16,19 @@ app.secret_key = 'your-secret-key-here-change-in-production'
 # Backend API URL
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://backend:8000')
 
+# Categories, suppliers and the user's own profile change rarely; writes proxied
+# through this app drop the matching entries straight away
+reference_cache = ReferenceCache()
+
+def reference_key(resource, params=None):
+    return f"{resource}?{urlencode(sorted((params or {}).items()))}"
+
+def total_count(response):
+    """Pass the backend's X-Total-Count through so list pages can show page counts."""
+    if 'X-Total-Count' in response.headers:
+        return {'X-Total-Count': response.headers['X-Total-Count']}
+    return {}
+
 # Authentication decorator
 def login_required(f):
     @wraps(f)
@@ -56,6 +73,8 @@ def login():
 @app.route('/logout')
 def logout():
     """Logout user"""
+    if 'access_token' in session:
+        reference_cache.invalidate(f"users/me:{hashlib.sha256(session['access_token'].encode()).hexdigest()}")
     session.clear()
     flash('You have been logged out successfully.', 'info')
     return redirect(url_for('login'))
@@ -80,7 +99,7 @@ def api_products():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/products/", headers=headers, params=request.args)
-        return jsonify(response.json()), response.status_code
+        return jsonify(response.json()), response.status_code, total_count(response)
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
@@ -124,7 +143,43 @@ def api_categories():
     """API endpoint to get categories"""
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
-        response = requests.get(f"{BACKEND_URL}/categories/", headers=headers)
+        body, status_code = reference_cache.get(f"{BACKEND_URL}/categories/", reference_key('categories'), headers=headers)
+        return jsonify(body), status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/categories/', methods=['POST'])
+@login_required
+def api_create_category():
+    """API endpoint to create category"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.post(f"{BACKEND_URL}/categories/", headers=headers, json=request.json)
+        reference_cache.invalidate('categories')
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/categories/<int:category_id>', methods=['PUT'])
+@login_required
+def api_update_category(category_id):
+    """API endpoint to update category"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.put(f"{BACKEND_URL}/categories/{category_id}", headers=headers, json=request.json)
+        reference_cache.invalidate('categories')
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/categories/<int:category_id>', methods=['DELETE'])
+@login_required
+def api_delete_category(category_id):
+    """API endpoint to delete category"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.delete(f"{BACKEND_URL}/categories/{category_id}", headers=headers)
+        reference_cache.invalidate('categories')
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
@@ -143,7 +198,7 @@ def api_inventory():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/inventory/", headers=headers, params=request.args)
-        return jsonify(response.json()), response.status_code
+        return jsonify(response.json()), response.status_code, total_count(response)
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
@@ -158,6 +213,32 @@ def api_low_stock():
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
+@app.route('/api/inventory/stream')
+@login_required
+def api_inventory_stream():
+    """API endpoint to stream live stock levels (Server-Sent Events)"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}", 'Accept': 'text/event-stream'}
+        # The backend sends a heartbeat well within the read timeout
+        response = requests.get(f"{BACKEND_URL}/inventory/stream", headers=headers,
+                                params=request.args.to_dict(flat=False), stream=True, timeout=(5, 60))
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+    if response.status_code != 200:
+        return jsonify(response.json()), response.status_code
+
+    def relay():
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            response.close()
+
+    return Response(stream_with_context(relay()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Orders routes
 @app.route('/orders')
 @login_required
@@ -172,7 +253,7 @@ def api_orders():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/orders/", headers=headers, params=request.args)
-        return jsonify(response.json()), response.status_code
+        return jsonify(response.json()), response.status_code, total_count(response)
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
@@ -190,7 +271,7 @@ def api_purchase_orders():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/purchase-orders/", headers=headers, params=request.args)
-        return jsonify(response.json()), response.status_code
+        return jsonify(response.json()), response.status_code, total_count(response)
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
@@ -208,7 +289,7 @@ def api_customers():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/customers/", headers=headers, params=request.args)
-        return jsonify(response.json()), response.status_code
+        return jsonify(response.json()), response.status_code, total_count(response)
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
@@ -225,7 +306,45 @@ def api_suppliers():
     """API endpoint to get suppliers"""
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
-        response = requests.get(f"{BACKEND_URL}/suppliers/", headers=headers, params=request.args)
+        params = request.args.to_dict()
+        body, status_code = reference_cache.get(f"{BACKEND_URL}/suppliers/", reference_key('suppliers', params),
+                                                headers=headers, params=params)
+        return jsonify(body), status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/suppliers/', methods=['POST'])
+@login_required
+def api_create_supplier():
+    """API endpoint to create supplier"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.post(f"{BACKEND_URL}/suppliers/", headers=headers, json=request.json)
+        reference_cache.invalidate('suppliers')
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/suppliers/<int:supplier_id>', methods=['PUT'])
+@login_required
+def api_update_supplier(supplier_id):
+    """API endpoint to update supplier"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.put(f"{BACKEND_URL}/suppliers/{supplier_id}", headers=headers, json=request.json)
+        reference_cache.invalidate('suppliers')
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/suppliers/<int:supplier_id>', methods=['DELETE'])
+@login_required
+def api_delete_supplier(supplier_id):
+    """API endpoint to delete supplier"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.delete(f"{BACKEND_URL}/suppliers/{supplier_id}", headers=headers)
+        reference_cache.invalidate('suppliers')
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
@@ -244,6 +363,54 @@ def api_users():
     try:
         headers = {'Authorization': f"Bearer {session['access_token']}"}
         response = requests.get(f"{BACKEND_URL}/users/", headers=headers, params=request.args)
+        return jsonify(response.json()), response.status_code, total_count(response)
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/users/me')
+@login_required
+def api_current_user():
+    """API endpoint to get the logged-in user's profile"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        # Keyed per token so one user's profile is never served to another
+        token_hash = hashlib.sha256(session['access_token'].encode()).hexdigest()
+        body, status_code = reference_cache.get(f"{BACKEND_URL}/users/me", f"users/me:{token_hash}", headers=headers)
+        return jsonify(body), status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/users/', methods=['POST'])
+@login_required
+def api_create_user():
+    """API endpoint to create user"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.post(f"{BACKEND_URL}/users/", headers=headers, json=request.json)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@login_required
+def api_update_user(user_id):
+    """API endpoint to update user"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.put(f"{BACKEND_URL}/users/{user_id}", headers=headers, json=request.json)
+        reference_cache.invalidate('users/me')
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
+@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@login_required
+def api_delete_user(user_id):
+    """API endpoint to delete user"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.delete(f"{BACKEND_URL}/users/{user_id}", headers=headers)
+        reference_cache.invalidate('users/me')
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException:
         return jsonify({'error': 'Backend service unavailable'}), 503
@@ -255,52 +422,67 @@ def reports():
     """Reports page"""
     return render_template('reports.html')
 
+@app.route('/api/reports/sales')
+@login_required
+def api_sales_report():
+    """API endpoint to get sales report"""
+    try:
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+        response = requests.get(f"{BACKEND_URL}/reports/sales", headers=headers, params=request.args)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException:
+        return jsonify({'error': 'Backend service unavailable'}), 503
+
 # Dashboard API routes
 @app.route('/api/dashboard/stats')
 @login_required
 def api_dashboard_stats():
     """API endpoint to get dashboard statistics"""
-    try:
-        headers = {'Authorization': f"Bearer {session['access_token']}"}
-        
-        # Get basic stats
-        stats = {
-            'total_products': 0,
-            'total_orders': 0,
-            'low_stock_items': 0,
-            'total_revenue': 0
-        }
-        
-        # Get products count
-        products_response = requests.get(f"{BACKEND_URL}/products/", headers=headers)
-        if products_response.status_code == 200:
-            products_data = products_response.json()
-            if isinstance(products_data, list):
-                stats['total_products'] = len(products_data)
-            elif isinstance(products_data, dict) and 'total' in products_data:
-                stats['total_products'] = products_data['total']
-        
-        # Get orders count and revenue
-        orders_response = requests.get(f"{BACKEND_URL}/orders/", headers=headers)
-        if orders_response.status_code == 200:
-            orders_data = orders_response.json()
-            if isinstance(orders_data, list):
-                stats['total_orders'] = len(orders_data)
-                stats['total_revenue'] = sum(order.get('total_amount', 0) for order in orders_data)
-            elif isinstance(orders_data, dict) and 'total' in orders_data:
-                stats['total_orders'] = orders_data['total']
-        
-        # Get low stock items count
-        low_stock_response = requests.get(f"{BACKEND_URL}/inventory/low-stock", headers=headers)
-        if low_stock_response.status_code == 200:
-            low_stock_data = low_stock_response.json()
-            if isinstance(low_stock_data, list):
-                stats['low_stock_items'] = len(low_stock_data)
-        
-        return jsonify(stats), 200
-        
-    except requests.exceptions.RequestException:
+    headers = {'Authorization': f"Bearer {session['access_token']}"}
+
+    # The three calls are independent, so the view waits for the slowest rather than the sum
+    results, errors, totals = fetch_all(BACKEND_URL, {
+        'products': '/products/',
+        'orders': '/orders/',
+        'low_stock': '/inventory/low-stock'
+    }, headers=headers)
+    if not results:
         return jsonify({'error': 'Backend service unavailable'}), 503
 
+    # Get basic stats
+    stats = {
+        'total_products': 0,
+        'total_orders': 0,
+        'low_stock_items': 0,
+        'total_revenue': 0
+    }
+
+    # Counts come from X-Total-Count; the body is only the first page
+    products_data = results.get('products')
+    if 'products' in totals:
+        stats['total_products'] = totals['products']
+    elif isinstance(products_data, list):
+        stats['total_products'] = len(products_data)
+
+    # Get orders count and revenue
+    orders_data = results.get('orders')
+    if 'orders' in totals:
+        stats['total_orders'] = totals['orders']
+    elif isinstance(orders_data, list):
+        stats['total_orders'] = len(orders_data)
+    if isinstance(orders_data, list):
+        stats['total_revenue'] = sum(order.get('total_amount', 0) for order in orders_data)
+
+    # Get low stock items count
+    low_stock_data = results.get('low_stock')
+    if isinstance(low_stock_data, list):
+        stats['low_stock_items'] = len(low_stock_data)
+
+    # Partial results: the figures from the calls that failed are left at 0
+    if errors:
+        stats['unavailable'] = sorted(errors)
+
+    return jsonify(stats), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
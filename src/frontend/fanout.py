@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+# Shared by every request so a burst of dashboard loads cannot spawn unbounded threads
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '16'))
+BACKEND_TIMEOUT_SECONDS = float(os.getenv('BACKEND_TIMEOUT_SECONDS', '5'))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fanout')
+
+def fetch_all(base_url, calls, headers=None, timeout=BACKEND_TIMEOUT_SECONDS):
+    """Run independent GET requests in parallel.
+
+    ``calls`` maps a name to a path, or to a ``(path, params)`` pair. Returns
+    ``(results, errors, totals)``: the parsed JSON of every call that answered
+    200, a reason for every call that failed, timed out, or returned another
+    status, and the ``X-Total-Count`` of every successful call that sent one.
+    """
+    futures = {}
+    for name, call in calls.items():
+        path, params = call if isinstance(call, tuple) else (call, None)
+        futures[name] = _executor.submit(
+            requests.get, f"{base_url}{path}", headers=headers, params=params, timeout=timeout
+        )
+
+    # The per-call timeout bounds each socket wait; this bounds the whole fan-out
+    # when the pool is saturated and calls are still queued
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    errors = {}
+    totals = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors[name] = 'timed out'
+            continue
+        try:
+            response = future.result()
+        except requests.exceptions.RequestException as exc:
+            errors[name] = type(exc).__name__
+            continue
+        if response.status_code != 200:
+            errors[name] = f"HTTP {response.status_code}"
+            continue
+        try:
+            results[name] = response.json()
+        except ValueError:
+            errors[name] = 'invalid JSON'
+            continue
+        if response.headers.get('X-Total-Count', '').isdigit():
+            totals[name] = int(response.headers['X-Total-Count'])
+    return results, errors, totals
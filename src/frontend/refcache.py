@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv('REFERENCE_CACHE_TTL_SECONDS', '60'))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv('REFERENCE_CACHE_MAX_ENTRIES', '256'))
+
+class ReferenceCache:
+    """Bounded TTL cache for slow-changing backend GETs.
+
+    Entries are served from memory until they expire. An expired entry with an
+    ETag is revalidated with If-None-Match, so an unchanged list costs a 304
+    rather than a full body. Least recently used entries are evicted first.
+    """
+
+    def __init__(self, ttl=REFERENCE_CACHE_TTL_SECONDS, max_entries=REFERENCE_CACHE_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url, key, headers=None, params=None, timeout=None):
+        """Return ``(body, status_code)`` for ``url``, cached under ``key``.
+
+        Only 200 responses are cached; anything else is passed through.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry['expires_at'] > self.clock():
+                    return entry['body'], 200
+
+        request_headers = dict(headers or {})
+        if entry is not None and entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        response = requests.get(url, headers=request_headers, params=params, timeout=timeout)
+
+        if response.status_code == 304 and entry is not None:
+            self._store(key, entry['body'], entry['etag'])
+            return entry['body'], 200
+        body = response.json()
+        if response.status_code == 200:
+            self._store(key, body, response.headers.get('ETag'))
+        return body, response.status_code
+
+    def invalidate(self, prefix):
+        """Drop every entry whose key starts with ``prefix``."""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def _store(self, key, body, etag):
+        with self._lock:
+            self._entries[key] = {'body': body, 'etag': etag, 'expires_at': self.clock() + self.ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 import sys
 import os
@@ -11,7 +11,7 @@ sys.path.insert(0, backend_path)
 
 from main import app
 from database_connection import get_db, Base
-import models
+import models, counts, stock_shards
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
@@ -27,6 +27,8 @@ def db():
     finally:
         db.close()
         Base.metadata.drop_all(bind=engine)
+        counts.cache.clear()
+        stock_shards.clear_cache()
 
 @pytest.fixture(scope="function")
 def client(db):
@@ -37,6 +39,19 @@ def client(db):
     yield TestClient(app)
     app.dependency_overrides.clear()
 
+@pytest.fixture
+def statements(db):
+    """SQL statements run on the test engine while the test holds the fixture."""
+    engine = db.get_bind()
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
 @pytest.fixture
 def test_user(db):
     from auth import get_password_hash
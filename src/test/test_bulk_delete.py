@@ -0,0 +1,135 @@
+import pytest
+import sys
+import os
+import json
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import schemas
+import stock_shards
+from models import (Inventory, InventoryShard, Order, OrderItem, Product, PurchaseOrder, PurchaseOrderItem,
+                    DailyProductSales, OutboxEvent)
+
+@pytest.fixture
+def stocked(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    return test_product
+
+def _place_order(client, customer, product, quantity, headers):
+    response = client.post("/orders/", json={
+        "customer_id": customer.id,
+        "total_amount": 10.0 * quantity,
+        "items": [{"product_id": product.id, "quantity": quantity, "unit_price": 10.0, "total_price": 10.0 * quantity}]
+    }, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def _stock(db, product_id):
+    db.expire_all()
+    inventory = db.query(Inventory).filter(Inventory.product_id == product_id).one()
+    return inventory.current_stock, inventory.reserved_stock, inventory.available_stock
+
+def test_delete_orders_releases_reservations_per_product(client, db, stocked, test_customer, auth_headers):
+    order_ids = [_place_order(client, test_customer, stocked, quantity, auth_headers) for quantity in (2, 3, 4)]
+    client.put(f"/orders/{order_ids[1]}", json={"status": "cancelled"}, headers=auth_headers)
+    assert client.post(f"/orders/{order_ids[2]}/ship", headers=auth_headers).status_code == 200
+    assert _stock(db, stocked.id) == (96, 5, 91)
+
+    response = client.post("/orders/bulk-delete", json={"selector": {"ids": order_ids}}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"matched": 3, "deleted": 3, "skipped": []}
+
+    # The shipped order released its reservation when it shipped
+    assert _stock(db, stocked.id) == (96, 0, 96)
+    assert db.query(Order).count() == 0
+    assert db.query(OrderItem).count() == 0
+    assert [row.units_sold for row in db.query(DailyProductSales)] == [0]
+    assert db.query(OutboxEvent).filter(OutboxEvent.event_type == "inventory.released").count() == 1
+
+def test_orders_selected_by_status_and_customer(client, db, stocked, test_customer, auth_headers):
+    order_ids = [_place_order(client, test_customer, stocked, 1, auth_headers) for _ in range(3)]
+    client.put(f"/orders/{order_ids[0]}", json={"status": "cancelled"}, headers=auth_headers)
+
+    response = client.post("/orders/bulk-delete", json={
+        "selector": {"status": "cancelled", "customer_id": test_customer.id}
+    }, headers=auth_headers)
+    assert response.json()["deleted"] == 1
+    assert [order.id for order in db.query(Order).order_by(Order.id)] == order_ids[1:]
+    assert _stock(db, stocked.id) == (100, 2, 98)
+
+def test_delete_orders_of_sharded_product(client, db, stocked, test_customer, auth_headers, monkeypatch):
+    monkeypatch.setattr(stock_shards, "STOCK_SHARD_CACHE_SECONDS", 0)
+    client.put(f"/inventory/{stocked.id}/shards", json={"shards": 4}, headers=auth_headers)
+    order_ids = [_place_order(client, test_customer, stocked, quantity, auth_headers) for quantity in (2, 3)]
+
+    response = client.post("/orders/bulk-delete", json={"selector": {"ids": order_ids}}, headers=auth_headers)
+    assert response.json()["deleted"] == 2
+    assert _stock(db, stocked.id) == (100, 0, 100)
+    shards = stock_shards.get_shards(db, stocked.id)
+    assert sum(shard.reserved_stock for shard in shards) == 0
+    assert sum(shard.available_stock for shard in shards) == 100
+
+def test_size_cap_and_chunked_progress(client, db, stocked, test_customer, auth_headers, monkeypatch):
+    monkeypatch.setattr(schemas, "BULK_DELETE_MAX", 3)
+    monkeypatch.setattr(schemas, "BULK_DELETE_CHUNK_SIZE", 2)
+    product_id = stocked.id
+    for _ in range(5):
+        _place_order(client, test_customer, stocked, 1, auth_headers)
+
+    selector = {"customer_id": test_customer.id}
+    response = client.post("/orders/bulk-delete", json={"selector": selector}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "chunked" in response.json()["detail"]
+    assert db.query(Order).count() == 5
+
+    response = client.post("/orders/bulk-delete", json={"selector": selector, "chunked": True}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["deleted"] for line in lines] == [2, 4, 5, 5]
+    assert lines[-1] == {"matched": 5, "deleted": 5, "skipped": [], "done": True}
+    # The streamed response closes the request's session when it is done
+    assert db.query(Order).count() == 0
+    assert _stock(db, product_id) == (100, 0, 100)
+
+def test_delete_purchase_orders(client, db, test_product, test_supplier, auth_headers):
+    for _ in range(2):
+        client.post("/purchase-orders/", json={
+            "supplier_id": test_supplier.id,
+            "total_amount": 500.00,
+            "items": [{"product_id": test_product.id, "quantity": 10, "unit_cost": 50.00, "total_cost": 500.00}]
+        }, headers=auth_headers)
+
+    response = client.post("/purchase-orders/bulk-delete", json={
+        "selector": {"supplier_id": test_supplier.id, "status": "pending"}
+    }, headers=auth_headers)
+    assert response.json() == {"matched": 2, "deleted": 2, "skipped": []}
+    assert db.query(PurchaseOrder).count() == 0
+    assert db.query(PurchaseOrderItem).count() == 0
+
+def test_delete_products_skips_products_in_use(client, db, stocked, test_category, test_customer, auth_headers):
+    unused = Product(sku="UNUSED1", name="Unused", price=1.0, cost_price=1.0, category_id=test_category.id,
+                     brand="Gone")
+    db.add(unused)
+    db.commit()
+    db.add(Inventory(product_id=unused.id, current_stock=0, reserved_stock=0, available_stock=0))
+    db.commit()
+    client.put(f"/inventory/{unused.id}/shards", json={"shards": 2}, headers=auth_headers)
+    _place_order(client, test_customer, stocked, 1, auth_headers)
+    unused_id = unused.id
+
+    response = client.post("/products/bulk-delete", json={"selector": {"category_id": test_category.id}},
+                           headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"matched": 2, "deleted": 1, "skipped": [stocked.id]}
+    db.expire_all()
+    assert [product.sku for product in db.query(Product)] == ["TEST001"]
+    assert db.query(Inventory).filter(Inventory.product_id == unused_id).count() == 0
+    assert db.query(InventoryShard).count() == 0
+
+@pytest.mark.parametrize("path", ["/orders/bulk-delete", "/purchase-orders/bulk-delete", "/products/bulk-delete"])
+def test_empty_selector_is_rejected(client, test_user, auth_headers, path):
+    response = client.post(path, json={"selector": {}}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from models import Category, Product, ProductStatus
+
+@pytest.fixture
+def catalog(db, test_category):
+    # Test Category > Phones > Refurbished, plus an unrelated category
+    phones = Category(name="Phones", parent_id=test_category.id)
+    other = Category(name="Other")
+    db.add_all([phones, other])
+    db.commit()
+    refurbished = Category(name="Refurbished", parent_id=phones.id)
+    db.add(refurbished)
+    db.commit()
+    products = [
+        Product(sku="ROOT1", name="Root", price=100.0, cost_price=50.0, category_id=test_category.id, brand="Acme"),
+        Product(sku="PHONE1", name="Phone", price=19.99, cost_price=10.0, category_id=phones.id, brand="Acme"),
+        Product(sku="REFURB1", name="Refurb", price=10.0, cost_price=5.0, category_id=refurbished.id, brand="Other",
+                status=ProductStatus.discontinued),
+        Product(sku="OTHER1", name="Other", price=5.0, cost_price=2.0, category_id=other.id, brand="Acme"),
+    ]
+    db.add_all(products)
+    db.commit()
+    return {"phones": phones, "products": {product.sku: product.id for product in products}}
+
+def prices(db):
+    db.expire_all()
+    return {product.sku: product.price for product in db.query(Product)}
+
+def test_dry_run_previews_category_subtree(client, db, catalog, auth_headers):
+    response = client.post("/products/bulk-update", headers=auth_headers, json={
+        "selector": {"category_id": catalog["phones"].id},
+        "operation": {"price_change_percent": 10},
+        "dry_run": True
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["matched"], data["updated"], data["dry_run"]) == (2, 0, True)
+    assert [(row["sku"], row["before"], row["after"]) for row in data["sample"]] == [
+        ("PHONE1", {"price": 19.99}, {"price": 21.99}),
+        ("REFURB1", {"price": 10.0}, {"price": 11.0}),
+    ]
+    assert prices(db)["PHONE1"] == 19.99
+
+def test_update_runs_as_one_statement(client, db, catalog, auth_headers, statements):
+    response = client.post("/products/bulk-update", headers=auth_headers, json={
+        "selector": {"category_id": catalog["phones"].id},
+        "operation": {"price_change_percent": 10}
+    })
+    assert response.status_code == 200
+    assert (response.json()["matched"], response.json()["updated"]) == (2, 2)
+    assert len([statement for statement in statements if "UPDATE products" in statement]) == 1
+    assert prices(db) == {"ROOT1": 100.0, "PHONE1": 21.99, "REFURB1": 11.0, "OTHER1": 5.0}
+
+def test_selector_criteria_are_combined(client, db, catalog, auth_headers):
+    response = client.post("/products/bulk-update", headers=auth_headers, json={
+        "selector": {"brand": "Acme", "status": "active", "ids": [catalog["products"]["ROOT1"], catalog["products"]["OTHER1"]]},
+        "operation": {"status": "inactive", "min_stock_level": 5, "max_stock_level": 50, "price": 9.5}
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2
+    assert data["sample"][0]["before"] == {"status": "active", "min_stock_level": 0, "max_stock_level": 1000,
+                                           "price": 100.0}
+    assert data["sample"][0]["after"] == {"status": "inactive", "min_stock_level": 5, "max_stock_level": 50,
+                                          "price": 9.5}
+
+    db.expire_all()
+    root = db.query(Product).filter(Product.sku == "ROOT1").one()
+    assert (root.status, root.min_stock_level, root.price) == (ProductStatus.inactive, 5, 9.5)
+    assert db.query(Product).filter(Product.sku == "PHONE1").one().status == ProductStatus.active
+
+@pytest.mark.parametrize("body", [
+    {"selector": {}, "operation": {"price": 1}},
+    {"selector": {"brand": "Acme"}, "operation": {"price": 1, "price_change_percent": 5}},
+    {"selector": {"brand": "Acme"}, "operation": {}},
+    {"selector": {"brand": "Acme"}, "operation": {"min_stock_level": 10, "max_stock_level": 5}},
+])
+def test_invalid_requests_are_rejected(client, db, catalog, auth_headers, body):
+    response = client.post("/products/bulk-update", headers=auth_headers, json=body)
+    assert response.status_code == 400
+    assert prices(db)["ROOT1"] == 100.0
+
+def test_bulk_update_requires_auth(client, catalog):
+    response = client.post("/products/bulk-update", json={"selector": {"brand": "Acme"}, "operation": {"price": 1}})
+    assert response.status_code == 401
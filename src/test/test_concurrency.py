@@ -0,0 +1,130 @@
+import pytest
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import data_access, schemas, rollups
+from models import Inventory, Order
+
+@pytest.fixture
+def stocked_product(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=10, available_stock=90))
+    db.commit()
+    return test_product
+
+@pytest.fixture
+def session_factory(db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+def test_inventory_exposes_version_etag(client, stocked_product):
+    response = client.get(f"/inventory/{stocked_product.id}")
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert response.headers["ETag"] == '"1"'
+
+def test_update_inventory_with_matching_if_match(client, stocked_product, auth_headers):
+    headers = {**auth_headers, "If-Match": '"1"'}
+    response = client.put(f"/inventory/{stocked_product.id}", json={"current_stock": 150}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+
+def test_update_inventory_with_stale_if_match_returns_current(client, stocked_product, auth_headers):
+    client.put(f"/inventory/{stocked_product.id}", json={"current_stock": 150}, headers=auth_headers)
+
+    headers = {**auth_headers, "If-Match": '"1"'}
+    response = client.put(f"/inventory/{stocked_product.id}", json={"current_stock": 80}, headers=headers)
+    assert response.status_code == 409
+    current = response.json()["current"]
+    assert current["current_stock"] == 150
+    assert current["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+
+def test_update_without_if_match_is_unconditional(client, stocked_product, auth_headers):
+    for stock in (120, 130):
+        response = client.put(f"/inventory/{stocked_product.id}", json={"current_stock": stock}, headers=auth_headers)
+        assert response.status_code == 200
+    assert response.json()["version"] == 3
+
+def test_invalid_if_match_is_rejected(client, stocked_product, auth_headers):
+    headers = {**auth_headers, "If-Match": "not-a-version"}
+    response = client.put(f"/inventory/{stocked_product.id}", json={"current_stock": 1}, headers=headers)
+    assert response.status_code == 400
+
+def test_concurrent_write_raises_conflict(db, stocked_product, session_factory):
+    # Another session commits after we loaded the row
+    inventory = data_access.get_inventory(db, stocked_product.id)
+    assert inventory.version == 1
+    other = session_factory()
+    try:
+        data_access.update_inventory(other, stocked_product.id, schemas.InventoryUpdate(current_stock=1))
+    finally:
+        other.close()
+    with pytest.raises(data_access.VersionConflictError) as exc_info:
+        data_access.update_inventory(db, stocked_product.id, schemas.InventoryUpdate(current_stock=5))
+    assert exc_info.value.current.current_stock == 1
+    assert exc_info.value.current.version == 2
+
+def test_order_update_conflict(client, stocked_product, test_customer, auth_headers):
+    order_data = {
+        "customer_id": test_customer.id,
+        "total_amount": 99.99,
+        "items": [{"product_id": stocked_product.id, "quantity": 1, "unit_price": 99.99, "total_price": 99.99}]
+    }
+    order = client.post("/orders/", json=order_data, headers=auth_headers).json()
+
+    headers = {**auth_headers, "If-Match": f'"{order["version"]}"'}
+    response = client.put(f"/orders/{order['id']}", json={"status": "confirmed"}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.put(f"/orders/{order['id']}", json={"status": "shipped"}, headers=headers)
+    assert response.status_code == 409
+    assert response.json()["current"]["status"] == "confirmed"
+
+def _in_own_session(session_factory, work):
+    session = session_factory()
+    try:
+        return work(session)
+    finally:
+        session.close()
+
+def test_concurrent_orders_all_reserve(db, stocked_product, test_customer, test_user, session_factory):
+    order = schemas.OrderCreate(customer_id=test_customer.id, total_amount=99.99, items=[
+        schemas.OrderItemCreate(product_id=stocked_product.id, quantity=1, unit_price=99.99, total_price=99.99)
+    ])
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        orders = list(pool.map(lambda _: _in_own_session(
+            session_factory, lambda session: data_access.create_order(session, order, test_user.id).id
+        ), range(6)))
+    assert len(set(orders)) == 6
+    inventory = data_access.get_inventory(db, stocked_product.id)
+    db.refresh(inventory)
+    assert (inventory.reserved_stock, inventory.available_stock) == (16, 84)
+
+def test_concurrent_movements_all_apply(db, stocked_product, test_user, session_factory):
+    movement = schemas.InventoryTransactionCreate(product_id=stocked_product.id, transaction_type="purchase", quantity=1)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        rows = list(pool.map(lambda _: _in_own_session(
+            session_factory, lambda session: data_access.create_inventory_transaction(session, movement, test_user.id).new_stock
+        ), range(6)))
+    assert sorted(rows) == list(range(101, 107))
+    inventory = data_access.get_inventory(db, stocked_product.id)
+    db.refresh(inventory)
+    assert (inventory.current_stock, inventory.available_stock) == (106, 96)
+
+def test_failed_order_leaves_no_header(db, stocked_product, test_customer, test_user, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("rollup unavailable")
+    monkeypatch.setattr(rollups, "apply_customer_orders", fail)
+    order = schemas.OrderCreate(customer_id=test_customer.id, total_amount=99.99, items=[
+        schemas.OrderItemCreate(product_id=stocked_product.id, quantity=1, unit_price=99.99, total_price=99.99)
+    ])
+    with pytest.raises(RuntimeError):
+        data_access.create_order(db, order, test_user.id)
+    db.rollback()
+    assert db.query(Order).count() == 0
+    assert data_access.get_inventory(db, stocked_product.id).reserved_stock == 10
@@ -0,0 +1,127 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+from sqlalchemy import event
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import rollups
+from models import Customer, CustomerSummary, Inventory, Order
+
+@pytest.fixture
+def stocked(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    return test_product
+
+def _place_order(client, customer_id, product, quantity, headers):
+    response = client.post("/orders/", json={
+        "customer_id": customer_id,
+        "total_amount": 10.0 * quantity,
+        "items": [{"product_id": product.id, "quantity": quantity, "unit_price": 10.0, "total_price": 10.0 * quantity}]
+    }, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def _summary(client, customer_id):
+    response = client.get(f"/customers/{customer_id}")
+    assert response.status_code == 200
+    return response.json()["summary"]
+
+def test_summary_follows_order_changes(client, db, stocked, test_customer, auth_headers):
+    assert _summary(client, test_customer.id) is None
+
+    first = _place_order(client, test_customer.id, stocked, 2, auth_headers)
+    second = _place_order(client, test_customer.id, stocked, 3, auth_headers)
+    summary = _summary(client, test_customer.id)
+    assert (summary["order_count"], summary["lifetime_spend"]) == (2, 50.0)
+    latest = summary["last_order_at"]
+    assert latest is not None
+
+    client.put(f"/orders/{first}", json={"total_amount": 25.0}, headers=auth_headers)
+    assert _summary(client, test_customer.id)["lifetime_spend"] == 55.0
+
+    client.put(f"/orders/{second}", json={"status": "cancelled"}, headers=auth_headers)
+    summary = _summary(client, test_customer.id)
+    assert (summary["order_count"], summary["lifetime_spend"]) == (1, 25.0)
+
+    client.put(f"/orders/{second}", json={"status": "pending"}, headers=auth_headers)
+    assert _summary(client, test_customer.id)["order_count"] == 2
+
+    client.delete(f"/orders/{first}", headers=auth_headers)
+    client.delete(f"/orders/{second}", headers=auth_headers)
+    summary = _summary(client, test_customer.id)
+    assert summary == {"order_count": 0, "lifetime_spend": 0.0, "last_order_at": None}
+
+def test_last_order_date_is_reread_after_removal(db, stocked, test_customer, test_user):
+    orders = [
+        Order(order_number=f"ORD-{day}", customer_id=test_customer.id, user_id=test_user.id, total_amount=10.0,
+              created_at=datetime(2024, 5, day))
+        for day in (1, 2, 3)
+    ]
+    db.add_all(orders)
+    db.commit()
+    rollups.apply_customer_orders(db, orders)
+    db.commit()
+    summary = db.get(CustomerSummary, test_customer.id)
+    assert (summary.order_count, summary.last_order_at) == (3, datetime(2024, 5, 3))
+
+    # Removing the latest order falls back to the latest remaining one
+    rollups.apply_customer_orders(db, orders[2:], sign=-1)
+    db.commit()
+    db.refresh(summary)
+    assert (summary.order_count, summary.last_order_at) == (2, datetime(2024, 5, 2))
+
+def test_bulk_delete_updates_summaries(client, db, stocked, test_customer, auth_headers):
+    order_ids = [_place_order(client, test_customer.id, stocked, 1, auth_headers) for _ in range(3)]
+    client.post("/orders/bulk-delete", json={"selector": {"ids": order_ids[:2]}}, headers=auth_headers)
+    summary = _summary(client, test_customer.id)
+    assert (summary["order_count"], summary["lifetime_spend"]) == (1, 10.0)
+
+def test_rebuild_matches_incremental_summaries(client, db, stocked, test_customer, auth_headers):
+    for quantity in (1, 4):
+        _place_order(client, test_customer.id, stocked, quantity, auth_headers)
+    incremental = _summary(client, test_customer.id)
+    assert rollups.rebuild_customer_summaries(db) == 1
+    db.expire_all()
+    assert _summary(client, test_customer.id) == incremental
+
+def test_top_customers_read_only_summaries(client, db, stocked, auth_headers):
+    customers = [Customer(name=f"Customer {index}", email=f"c{index}@example.com") for index in range(3)]
+    db.add_all(customers)
+    db.commit()
+    for customer, quantities in zip(customers, [(1,), (5,), (1, 1, 1)]):
+        for quantity in quantities:
+            _place_order(client, customer.id, stocked, quantity, auth_headers)
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/customers/top", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert [(row["customer"]["name"], row["lifetime_spend"]) for row in response.json()] == [
+        ("Customer 1", 50.0), ("Customer 2", 30.0), ("Customer 0", 10.0)
+    ]
+    assert not [statement for statement in executed if "FROM orders" in statement]
+
+    response = client.get("/customers/top", params={"sort_by": "order_count", "limit": 1}, headers=auth_headers)
+    assert [row["customer"]["name"] for row in response.json()] == ["Customer 2"]
+    assert response.json()[0]["order_count"] == 3
+
+    response = client.get("/customers/top", params={"sort_by": "name"}, headers=auth_headers)
+    assert response.status_code == 422
+
+def test_deleting_customer_removes_summary(client, db, test_customer, auth_headers):
+    db.add(CustomerSummary(customer_id=test_customer.id, order_count=0, lifetime_spend=0))
+    db.commit()
+    assert client.delete(f"/customers/{test_customer.id}", headers=auth_headers).status_code == 200
+    assert db.query(CustomerSummary).count() == 0
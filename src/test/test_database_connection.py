@@ -0,0 +1,65 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from database_connection import derive_pool_settings, get_db
+from pool_monitor import InstrumentedQueuePool
+from main import app
+
+def test_pool_settings_split_budget_across_workers():
+    pool_size, max_overflow = derive_pool_settings(150, replicas=5, workers=2)
+    assert pool_size == 5
+    assert max_overflow == 10
+
+def test_pool_settings_never_exceed_budget():
+    pool_size, max_overflow = derive_pool_settings(20, replicas=4, workers=4, pool_size="10", max_overflow="10")
+    assert pool_size == 1
+    assert max_overflow == 0
+
+def test_instrumented_pool_counts_timeouts():
+    engine = create_engine(
+        "sqlite://",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05
+    )
+    held = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    stats = engine.pool.stats()
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms"]["count"] == 2
+    assert stats["wait_ms"]["buckets"][-1]["count"] == 2
+    held.close()
+    engine.dispose()
+
+def test_pool_timeout_returns_503():
+    def exhausted_db():
+        raise PoolTimeoutError("QueuePool limit reached")
+        yield
+
+    app.dependency_overrides[get_db] = exhausted_db
+    try:
+        from fastapi.testclient import TestClient
+        response = TestClient(app).get("/categories/")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_pool_stats_endpoint(client):
+    response = client.get("/health/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert "checked_out" in data
+    assert "overflow" in data
+    assert "timeouts" in data
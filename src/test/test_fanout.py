@@ -0,0 +1,85 @@
+import threading
+import sys
+import os
+import requests
+
+frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+sys.path.insert(0, frontend_path)
+
+import fanout
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+def fake_backend(monkeypatch, routes):
+    """Answer each path from routes; a callable route is called with the request params."""
+    calls = []
+
+    def get(url, headers=None, params=None, timeout=None):
+        path = url[len("http://backend"):]
+        calls.append((path, params, headers))
+        route = routes[path]
+        return route(params) if callable(route) else route
+
+    monkeypatch.setattr(fanout.requests, "get", get)
+    return calls
+
+def test_fetch_all_collects_results_and_totals(monkeypatch):
+    calls = fake_backend(monkeypatch, {
+        "/products/": FakeResponse(body=[{"id": 1}], headers={"X-Total-Count": "42"}),
+        "/inventory/low-stock": FakeResponse(body=[]),
+    })
+    results, errors, totals = fanout.fetch_all("http://backend", {
+        "products": ("/products/", {"limit": 1}),
+        "low_stock": "/inventory/low-stock",
+    }, headers={"Authorization": "Bearer token"})
+
+    assert results == {"products": [{"id": 1}], "low_stock": []}
+    assert errors == {}
+    assert totals == {"products": 42}
+    assert sorted(calls, key=lambda call: call[0]) == [
+        ("/inventory/low-stock", None, {"Authorization": "Bearer token"}),
+        ("/products/", {"limit": 1}, {"Authorization": "Bearer token"}),
+    ]
+
+def test_fetch_all_reports_each_failure_without_losing_the_rest(monkeypatch):
+    def refused(params):
+        raise requests.exceptions.ConnectionError()
+
+    fake_backend(monkeypatch, {
+        "/ok": FakeResponse(body={"fine": True}, headers={"X-Total-Count": "not a number"}),
+        "/down": refused,
+        "/missing": FakeResponse(status_code=404, body={"detail": "Not found"}),
+        "/garbled": FakeResponse(body=ValueError("no JSON"), headers={"X-Total-Count": "3"}),
+    })
+    results, errors, totals = fanout.fetch_all("http://backend", {
+        "ok": "/ok", "down": "/down", "missing": "/missing", "garbled": "/garbled"
+    })
+
+    assert results == {"ok": {"fine": True}}
+    assert errors == {"down": "ConnectionError", "missing": "HTTP 404", "garbled": "invalid JSON"}
+    assert totals == {}
+
+def test_fetch_all_gives_up_on_slow_calls(monkeypatch):
+    release = threading.Event()
+
+    def slow(params):
+        release.wait(5)
+        return FakeResponse(body=[])
+
+    fake_backend(monkeypatch, {"/fast": FakeResponse(body=[1]), "/slow": slow})
+    try:
+        results, errors, totals = fanout.fetch_all("http://backend", {"fast": "/fast", "slow": "/slow"}, timeout=0.2)
+    finally:
+        release.set()
+
+    assert results == {"fast": [1]}
+    assert errors == {"slow": "timed out"}
@@ -0,0 +1,61 @@
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import numpy as np
+import forecasting
+from models import InventoryTransaction, ProductForecast, TransactionType
+
+def test_fit_forecasts_recovers_constant_demand():
+    matrix = np.vstack([np.full(60, 4.0), np.zeros(60)])
+    fitted = forecasting.fit_forecasts(matrix)
+    assert np.allclose(fitted["daily_demand"], [4.0, 0.0])
+    assert np.allclose(fitted["mean_absolute_error"], [0.0, 0.0])
+
+def test_fit_forecasts_prefers_recent_level_after_shift():
+    matrix = np.concatenate([np.zeros(60), np.full(30, 10.0)])[None, :]
+    fitted = forecasting.fit_forecasts(matrix)
+    assert fitted["daily_demand"][0] > 9.0
+
+def test_load_daily_sales_builds_dense_matrix(db, test_product, test_user):
+    yesterday = datetime.now() - timedelta(days=1)
+    for quantity in (3, 2):
+        db.add(InventoryTransaction(
+            product_id=test_product.id,
+            user_id=test_user.id,
+            transaction_type=TransactionType.sale,
+            quantity=quantity,
+            previous_stock=10,
+            new_stock=10 - quantity,
+            created_at=yesterday
+        ))
+    db.commit()
+
+    product_ids, matrix = forecasting.load_daily_sales(db, history_days=7)
+    assert product_ids.tolist() == [test_product.id]
+    assert matrix.shape == (1, 7)
+    assert matrix[0, 5] == 5
+    assert matrix.sum() == 5
+
+def test_forecast_endpoints(client, test_product, test_user, auth_headers, db):
+    response = client.get(f"/products/{test_product.id}/forecast", headers=auth_headers)
+    assert response.status_code == 404
+
+    response = client.post("/forecasts/run", json={"history_days": 30, "horizon_days": 14}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["products_forecast"] == 1
+    assert db.query(ProductForecast).count() == 1
+
+    response = client.get(f"/products/{test_product.id}/forecast", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["horizon_days"] == 14
+    assert data["forecast_quantity"] == 0
+
+    response = client.get(f"/forecasts/?product_ids={test_product.id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
@@ -0,0 +1,117 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from models import Inventory, InventoryTransaction, Order, OrderStatus, OutboxEvent, TransactionType
+
+@pytest.fixture
+def stocked(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=10, reserved_stock=0, available_stock=10))
+    db.commit()
+    return test_product
+
+def _place_order(client, customer, product, quantity, headers):
+    response = client.post("/orders/", json={
+        "customer_id": customer.id,
+        "total_amount": 99.99 * quantity,
+        "items": [{"product_id": product.id, "quantity": quantity, "unit_price": 99.99, "total_price": 99.99 * quantity}]
+    }, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def _stock(db, product_id):
+    inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
+    db.refresh(inventory)
+    return inventory
+
+def test_ship_batch_converts_reservations_to_sales(client, db, stocked, test_customer, auth_headers):
+    first = _place_order(client, test_customer, stocked, 3, auth_headers)
+    second = _place_order(client, test_customer, stocked, 4, auth_headers)
+    events_before = db.query(OutboxEvent).count()
+
+    response = client.post("/orders/ship", json={"order_ids": [first["id"], second["id"]]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"shipped": [first["id"], second["id"]], "failed": [], "units_shipped": 7}
+
+    inventory = _stock(db, stocked.id)
+    assert (inventory.current_stock, inventory.reserved_stock, inventory.available_stock) == (3, 0, 3)
+    ledger = db.query(InventoryTransaction).order_by(InventoryTransaction.id).all()
+    assert [(row.previous_stock, row.new_stock) for row in ledger] == [(10, 7), (7, 3)]
+    assert all(row.transaction_type == TransactionType.sale and row.reference_type == "order" for row in ledger)
+    assert db.query(OutboxEvent).count() == events_before + 1
+
+    order = db.query(Order).filter(Order.id == first["id"]).one()
+    db.refresh(order)
+    assert order.status == OrderStatus.shipped
+    assert order.version == first["version"] + 1
+
+def test_deleting_shipped_order_keeps_reservations(client, db, stocked, test_customer, auth_headers):
+    shipped = _place_order(client, test_customer, stocked, 3, auth_headers)
+    _place_order(client, test_customer, stocked, 2, auth_headers)
+    client.post("/orders/ship", json={"order_ids": [shipped["id"]]}, headers=auth_headers)
+
+    response = client.delete(f"/orders/{shipped['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    inventory = _stock(db, stocked.id)
+    assert (inventory.current_stock, inventory.reserved_stock, inventory.available_stock) == (7, 2, 5)
+
+def test_status_update_cannot_ship_or_reopen_orders(client, db, stocked, test_customer, auth_headers):
+    order = _place_order(client, test_customer, stocked, 3, auth_headers)
+    response = client.put(f"/orders/{order['id']}", json={"status": "shipped"}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "/ship" in response.json()["detail"]
+
+    # Deleting the order still releases what it reserved
+    response = client.delete(f"/orders/{order['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    inventory = _stock(db, stocked.id)
+    assert (inventory.current_stock, inventory.reserved_stock, inventory.available_stock) == (10, 0, 10)
+
+    shipped = _place_order(client, test_customer, stocked, 2, auth_headers)
+    client.post(f"/orders/{shipped['id']}/ship", headers=auth_headers)
+    response = client.put(f"/orders/{shipped['id']}", json={"status": "pending"}, headers=auth_headers)
+    assert response.status_code == 400
+    response = client.put(f"/orders/{shipped['id']}", json={"status": "delivered"}, headers=auth_headers)
+    assert response.status_code == 200
+
+def test_failures_are_reported_per_order(client, db, stocked, test_customer, auth_headers):
+    small = _place_order(client, test_customer, stocked, 6, auth_headers)
+    large = _place_order(client, test_customer, stocked, 5, auth_headers)
+    cancelled = _place_order(client, test_customer, stocked, 1, auth_headers)
+    client.put(f"/orders/{cancelled['id']}", json={"status": "cancelled"}, headers=auth_headers)
+
+    response = client.post("/orders/ship", json={"order_ids": [large["id"], small["id"], cancelled["id"], 9999]},
+                           headers=auth_headers)
+    data = response.json()
+    # Orders are filled oldest first, so the later order runs out of stock
+    assert data["shipped"] == [small["id"]]
+    assert [failure["order_id"] for failure in data["failed"]] == [large["id"], cancelled["id"], 9999]
+    assert "Insufficient stock" in data["failed"][0]["detail"]
+    assert data["failed"][1]["detail"] == "Order is cancelled"
+    assert data["failed"][2]["detail"] == "Order not found"
+
+    inventory = _stock(db, stocked.id)
+    # The unshipped orders keep their reservations
+    assert (inventory.current_stock, inventory.reserved_stock, inventory.available_stock) == (4, 6, -2)
+    assert db.query(InventoryTransaction).count() == 1
+
+def test_ship_single_order(client, stocked, test_customer, auth_headers):
+    order = _place_order(client, test_customer, stocked, 2, auth_headers)
+    response = client.post(f"/orders/{order['id']}/ship", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "shipped"
+    assert response.headers["ETag"] == f'"{order["version"] + 1}"'
+
+    response = client.post(f"/orders/{order['id']}/ship", headers=auth_headers)
+    assert response.status_code == 409
+
+def test_ship_missing_order(client, test_user, auth_headers):
+    response = client.post("/orders/9999/ship", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_ship_requires_order_ids(client, auth_headers):
+    response = client.post("/orders/ship", json={"order_ids": []}, headers=auth_headers)
+    assert response.status_code == 422
@@ -0,0 +1,195 @@
+import pytest
+import sys
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import idempotency
+from models import Customer, IdempotencyKey, Inventory, Order
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    idempotency.store = idempotency.IdempotencyStore()
+    yield idempotency.store
+
+@pytest.fixture
+def session_factory(db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+@pytest.fixture
+def order_data(db, test_product, test_customer):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    return {
+        "customer_id": test_customer.id,
+        "total_amount": 199.98,
+        "items": [{"product_id": test_product.id, "quantity": 2, "unit_price": 99.99, "total_price": 199.98}]
+    }
+
+def test_retried_order_is_replayed(client, order_data, test_product, auth_headers, db):
+    headers = {**auth_headers, "Idempotency-Key": "order-1"}
+    first = client.post("/orders/", json=order_data, headers=headers)
+    second = client.post("/orders/", json=order_data, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert db.query(Order).count() == 1
+    inventory = db.query(Inventory).filter(Inventory.product_id == test_product.id).first()
+    db.refresh(inventory)
+    assert inventory.reserved_stock == 2
+
+def test_key_reuse_with_different_payload_is_rejected(client, order_data, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "order-2"}
+    client.post("/orders/", json=order_data, headers=headers)
+    order_data["total_amount"] = 1.0
+    response = client.post("/orders/", json=order_data, headers=headers)
+    assert response.status_code == 422
+
+def test_requests_without_key_are_not_deduplicated(client, order_data, auth_headers, db):
+    client.post("/orders/", json=order_data, headers=auth_headers)
+    client.post("/orders/", json=order_data, headers=auth_headers)
+    assert db.query(Order).count() == 2
+
+def test_failed_request_releases_key(client, test_product, auth_headers, db):
+    headers = {**auth_headers, "Idempotency-Key": "movement-1"}
+    transaction_data = {"product_id": test_product.id, "transaction_type": "purchase", "quantity": 5}
+    # No inventory row yet, so the first attempt fails and must not be replayed
+    assert client.post("/inventory-transactions/", json=transaction_data, headers=headers).status_code == 404
+    assert db.query(IdempotencyKey).count() == 0
+
+def test_key_is_scoped_to_user_not_route(client, order_data, test_product, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "shared-1"}
+    assert client.post("/orders/", json=order_data, headers=headers).status_code == 200
+    response = client.post("/inventory-transactions/", json={
+        "product_id": test_product.id, "transaction_type": "purchase", "quantity": 5
+    }, headers=headers)
+    assert response.status_code == 422
+
+def test_overlong_key_is_rejected(client, order_data, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "k" * 256}
+    assert client.post("/orders/", json=order_data, headers=headers).status_code == 400
+
+def test_response_is_replayed_by_another_process(db, session_factory):
+    first = session_factory()
+    try:
+        assert idempotency.IdempotencyStore().run(first, 1, "k", "fp", lambda: {"id": 42}) == ({"id": 42}, False)
+    finally:
+        first.close()
+    # A fresh store stands in for another worker or replica
+    assert idempotency.IdempotencyStore().run(db, 1, "k", "fp", lambda: {"id": 43}) == ({"id": 42}, True)
+
+def test_concurrent_duplicate_waits_and_replays(fresh_store, session_factory):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"id": 42}
+
+    def run():
+        session = session_factory()
+        try:
+            results.append(fresh_store.run(session, 1, "k", "fp", handler))
+        finally:
+            session.close()
+
+    results = []
+    owner = threading.Thread(target=run)
+    owner.start()
+    started.wait(5)
+    duplicate = threading.Thread(target=run)
+    duplicate.start()
+    release.set()
+    owner.join(5)
+    duplicate.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda result: result[1]) == [({"id": 42}, False), ({"id": 42}, True)]
+
+def test_duplicate_gives_up_while_first_request_runs(db):
+    db.add(IdempotencyKey(user_id=1, idempotency_key="k", fingerprint="fp", claim_id="other",
+                          expires_at=datetime.now() + timedelta(seconds=60)))
+    db.commit()
+    store = idempotency.IdempotencyStore(wait_seconds=0.2, poll_seconds=0.05)
+    with pytest.raises(idempotency.IdempotencyRequestInProgress):
+        store.run(db, 1, "k", "fp", lambda: {"id": 1})
+
+def test_entries_expire_after_ttl(db):
+    now = [datetime(2024, 1, 1)]
+    store = idempotency.IdempotencyStore(ttl_seconds=10, clock=lambda: now[0])
+    store.run(db, 1, "k", "fp", lambda: "first")
+    now[0] += timedelta(seconds=11)
+    assert store.run(db, 1, "k", "fp", lambda: "second") == ("second", False)
+
+def test_claim_lease_is_separate_from_wait(db):
+    now = datetime(2024, 1, 1)
+    store = idempotency.IdempotencyStore(wait_seconds=5, lease_seconds=600, clock=lambda: now)
+
+    def handler():
+        row = db.query(IdempotencyKey).one()
+        return row.expires_at.isoformat()
+
+    assert store.run(db, 1, "k", "fp", handler) == ((now + timedelta(seconds=600)).isoformat(), False)
+
+def test_key_commits_with_the_handlers_work(db):
+    def handler():
+        db.add(Customer(name="Committed", email="committed@example.com"))
+        db.commit()
+        # The process dies before the response is stored
+        raise RuntimeError("crashed")
+
+    with pytest.raises(RuntimeError):
+        idempotency.IdempotencyStore().run(db, 1, "k", "fp", handler)
+    row = db.query(IdempotencyKey).one()
+    assert (row.claim_id, row.response) == (None, None)
+
+    # A retry must not create the customer again
+    store = idempotency.IdempotencyStore(wait_seconds=0.2, poll_seconds=0.05)
+    with pytest.raises(idempotency.IdempotencyResponseMissing):
+        store.run(db, 1, "k", "fp", lambda: pytest.fail("handler ran twice"))
+    assert db.query(Customer).count() == 1
+
+def test_work_is_not_committed_after_claim_is_taken_over(db, session_factory):
+    def handler():
+        # The lease ran out and a retry took the key over while this handler was still running
+        other = session_factory()
+        try:
+            other.query(IdempotencyKey).update({"claim_id": "retry"})
+            other.commit()
+        finally:
+            other.close()
+        db.add(Customer(name="Late", email="late@example.com"))
+        db.commit()
+
+    with pytest.raises(idempotency.IdempotencyClaimLost):
+        idempotency.IdempotencyStore().run(db, 1, "k", "fp", handler)
+    assert db.query(Customer).count() == 0
+    assert db.query(IdempotencyKey).one().claim_id == "retry"
+
+def test_abandoned_claim_is_taken_over(db):
+    # A claim whose process died before its work committed
+    db.add(IdempotencyKey(user_id=1, idempotency_key="k", fingerprint="fp", claim_id="dead",
+                          expires_at=datetime.now()))
+    db.commit()
+    assert idempotency.IdempotencyStore().run(db, 1, "k", "fp", lambda: "retried") == ("retried", False)
+
+def test_purge_removes_expired_keys(db):
+    now = datetime.now()
+    db.add_all([
+        IdempotencyKey(user_id=1, idempotency_key="old", fingerprint="fp", response="{}",
+                       expires_at=now - timedelta(seconds=1)),
+        IdempotencyKey(user_id=1, idempotency_key="new", fingerprint="fp", response="{}",
+                       expires_at=now + timedelta(seconds=60))
+    ])
+    db.commit()
+    assert idempotency.purge_expired(db, now) == 1
+    assert [row.idempotency_key for row in db.query(IdempotencyKey)] == ["new"]
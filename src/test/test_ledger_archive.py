@@ -0,0 +1,110 @@
+import pytest
+import sys
+import os
+import gzip
+import json
+from datetime import date, datetime
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import data_access
+import ledger_archive
+from models import InventoryTransaction, TransactionType
+
+TODAY = date(2024, 4, 15)
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger_archive, "LEDGER_ARCHIVE_DIR", str(tmp_path))
+    return str(tmp_path)
+
+@pytest.fixture
+def ledger_rows(db, test_product, test_user):
+    # Two rows in each of January to April 2024
+    stock = 0
+    for month in (1, 2, 3, 4):
+        for day in (5, 20):
+            db.add(InventoryTransaction(
+                product_id=test_product.id, user_id=test_user.id, transaction_type=TransactionType.purchase,
+                quantity=10, previous_stock=stock, new_stock=stock + 10, notes=f"2024-{month:02d}-{day:02d}",
+                created_at=datetime(2024, month, day, 12, 0)
+            ))
+            stock += 10
+    db.commit()
+
+def test_archive_moves_closed_months(db, ledger_rows, archive_dir):
+    segments = ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY)
+    assert [segment["month"] for segment in segments] == ["2024-01", "2024-02"]
+    assert db.query(InventoryTransaction).count() == 4
+
+    manifest = ledger_archive.load_manifest(archive_dir)
+    assert [segment["rows"] for segment in manifest["segments"]] == [2, 2]
+    segment = manifest["segments"][0]
+    with gzip.open(os.path.join(archive_dir, segment["file"])) as archive:
+        records = [json.loads(line) for line in archive]
+    assert [record["notes"] for record in records] == ["2024-01-05", "2024-01-20"]
+    assert records[0]["transaction_type"] == "purchase"
+    assert ledger_archive._sha256(os.path.join(archive_dir, segment["file"])) == segment["sha256"]
+
+    # Nothing left to archive on a second run
+    assert ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY) == []
+
+def test_listing_continues_into_archive(client, db, ledger_rows, archive_dir, auth_headers):
+    ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY)
+    response = client.get("/inventory-transactions/", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [row["notes"][5:7] for row in data] == ["04", "04", "03", "03", "02", "02", "01", "01"]
+    assert data[-1]["product"]["sku"] == "TEST001"
+    assert data[-1]["user"]["username"] == "testuser"
+
+    # Paging past the hot rows lands in the archive
+    response = client.get("/inventory-transactions/", params={"skip": 5, "limit": 2}, headers=auth_headers)
+    assert [row["notes"] for row in response.json()] == ["2024-02-05", "2024-01-20"]
+
+def test_archive_is_not_read_for_hot_ranges(db, ledger_rows, archive_dir, monkeypatch):
+    ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("archive should not be opened")
+
+    monkeypatch.setattr(ledger_archive, "read_archived", fail)
+    rows = data_access.get_inventory_transactions(db, date_from=date(2024, 3, 1))
+    assert len(rows) == 4
+
+def test_date_range_inside_archive(db, ledger_rows, archive_dir):
+    ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY)
+    rows = data_access.get_inventory_transactions(db, date_from=date(2024, 1, 10), date_to=date(2024, 2, 10))
+    assert [row.notes for row in rows] == ["2024-02-05", "2024-01-20"]
+
+def test_interrupted_archive_finishes_on_rerun(db, ledger_rows, archive_dir, monkeypatch):
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ledger_archive, "_delete_archived", crash)
+        with pytest.raises(RuntimeError):
+            ledger_archive.archive_month(db, date(2024, 1, 1), archive_dir)
+    db.rollback()
+    # Recorded in the manifest but still in the hot table
+    assert db.query(InventoryTransaction).count() == 8
+
+    assert ledger_archive.archive_month(db, date(2024, 1, 1), archive_dir) is None
+    assert db.query(InventoryTransaction).count() == 6
+    assert len(ledger_archive.load_manifest(archive_dir)["segments"]) == 1
+
+def test_total_count_includes_archived_rows(client, db, ledger_rows, archive_dir, auth_headers, monkeypatch):
+    ledger_archive.archive_closed_months(db, archive_dir, hot_months=2, today=TODAY)
+    response = client.get("/inventory-transactions/", params={"limit": 2}, headers=auth_headers)
+    assert response.headers["X-Total-Count"] == "8"
+
+    # Whole archived months are counted from the manifest without opening their files
+    with monkeypatch.context() as patch:
+        patch.setattr(ledger_archive.gzip, "open", None)
+        assert data_access.count_inventory_transactions(db, date_from=date(2024, 1, 1), date_to=date(2024, 3, 31)) == 6
+
+    # A range that cuts through an archived month reads that segment
+    response = client.get("/inventory-transactions/", params={"from": "2024-01-10", "exact": "true"},
+                          headers=auth_headers)
+    assert response.headers["X-Total-Count"] == "7"
@@ -0,0 +1,61 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import data_access
+from models import Product, Inventory
+
+@pytest.fixture
+def catalog(db, test_category):
+    products = [
+        Product(sku=f"SKU{index:03d}", name=f"Product {index}", price=10.0 + index,
+                cost_price=5.0, category_id=test_category.id)
+        for index in range(5)
+    ]
+    db.add_all(products)
+    db.commit()
+    for product in products[:3]:
+        db.add(Inventory(product_id=product.id, current_stock=10, reserved_stock=2, available_stock=8))
+    db.commit()
+    return products
+
+def test_lookup_products_by_id_and_sku(client, catalog):
+    response = client.post("/products/lookup", json={
+        "ids": [catalog[0].id, catalog[1].id, 9999],
+        "skus": ["SKU003", "MISSING"]
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["items"]) == {str(catalog[0].id), str(catalog[1].id), "9999", str(catalog[3].id)}
+    assert data["items"]["9999"] is None
+    assert data["items"][str(catalog[3].id)]["sku"] == "SKU003"
+    assert data["items"][str(catalog[0].id)]["category"]["name"] == "Test Category"
+    assert data["skus"] == {"SKU003": catalog[3].id, "MISSING": None}
+
+def test_lookup_products_uses_one_query(db, catalog, statements):
+    ids = [product.id for product in catalog]
+    db.expunge_all()
+    statements.clear()
+    products = data_access.lookup_products(db, ids=ids, skus=[])
+    assert [product.category.name for product in products] == ["Test Category"] * 5
+    assert len(statements) == 1
+
+def test_lookup_inventory(client, catalog, auth_headers):
+    response = client.post("/inventory/lookup", json={
+        "ids": [catalog[0].id, catalog[4].id],
+        "skus": ["SKU002"]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["items"][str(catalog[0].id)]["available_stock"] == 8
+    # Product exists but has no inventory row
+    assert data["items"][str(catalog[4].id)] is None
+    assert data["items"][str(catalog[2].id)]["product"]["sku"] == "SKU002"
+    assert data["skus"] == {"SKU002": catalog[2].id}
+
+def test_lookup_rejects_oversized_requests(client):
+    response = client.post("/products/lookup", json={"ids": list(range(5001))})
+    assert response.status_code == 422
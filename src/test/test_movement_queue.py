@@ -0,0 +1,178 @@
+import pytest
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import data_access
+import movement_queue
+import schemas
+from main import app
+from database_connection import get_db
+from models import IdempotencyKey, Inventory, InventoryTransaction, OutboxEvent
+
+@pytest.fixture
+def stocked(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    return test_product
+
+@pytest.fixture
+def make_queue(db):
+    queues = []
+
+    def make(**options):
+        queue = movement_queue.MovementQueue(sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()),
+                                             **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(timeout=5)
+
+def movement(product_id, quantity, transaction_type="sale"):
+    return schemas.InventoryTransactionCreate(product_id=product_id, transaction_type=transaction_type,
+                                              quantity=quantity)
+
+def test_movements_commit_together(db, stocked, test_user, make_queue):
+    queue = make_queue(batch_size=10, window_seconds=5)
+    # Submitted before the worker starts, so they are all waiting for the first batch
+    futures = [queue.submit(movement(stocked.id, quantity), test_user.id) for quantity in range(1, 11)]
+    queue.start()
+    results = [future.result(timeout=10) for future in futures]
+
+    assert queue.batches == 1
+    assert [(row["previous_stock"], row["new_stock"]) for row in results[:3]] == [(100, 99), (99, 97), (97, 94)]
+    assert results[-1]["new_stock"] == 45
+    assert results[0]["product"]["sku"] == "TEST001"
+    assert results[0]["user"]["username"] == "testuser"
+
+    db.expire_all()
+    inventory = db.query(Inventory).filter(Inventory.product_id == stocked.id).one()
+    assert inventory.current_stock == 45
+    assert db.query(InventoryTransaction).count() == 10
+    assert db.query(OutboxEvent).count() == 10
+
+def test_batch_is_cut_at_batch_size(stocked, test_user, make_queue):
+    queue = make_queue(batch_size=4, window_seconds=5)
+    futures = [queue.submit(movement(stocked.id, 1, "purchase"), test_user.id) for _ in range(10)]
+    queue.start()
+    assert [future.result(timeout=10)["new_stock"] for future in futures][-1] == 110
+    assert queue.batches == 3
+
+def test_missing_inventory_resolves_to_none(stocked, test_user, make_queue):
+    queue = make_queue(window_seconds=0.5)
+    futures = [queue.submit(movement(stocked.id, 1), test_user.id), queue.submit(movement(9999, 1), test_user.id)]
+    queue.start()
+    assert futures[0].result(timeout=10)["new_stock"] == 99
+    assert futures[1].result(timeout=10) is None
+
+def test_failing_movement_only_fails_itself(db, stocked, test_user, make_queue, monkeypatch):
+    apply_movement = data_access._apply_movement
+
+    def fail_on_thirteen(db, inventory, transaction, user_id):
+        if transaction.quantity == 13:
+            raise ValueError("unlucky")
+        return apply_movement(db, inventory, transaction, user_id)
+
+    monkeypatch.setattr(data_access, "_apply_movement", fail_on_thirteen)
+    queue = make_queue(window_seconds=0.5)
+    futures = [queue.submit(movement(stocked.id, quantity), test_user.id) for quantity in (1, 13, 2)]
+    queue.start()
+    assert futures[0].result(timeout=10)["new_stock"] == 99
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10)["new_stock"] == 97
+    db.expire_all()
+    assert db.query(InventoryTransaction).count() == 2
+
+def test_stop_drains_accepted_movements(stocked, test_user, make_queue):
+    queue = make_queue(window_seconds=0.01).start()
+    futures = [queue.submit(movement(stocked.id, 1), test_user.id) for _ in range(20)]
+    queue.stop(timeout=10)
+    assert all(future.done() for future in futures)
+    with pytest.raises(RuntimeError):
+        queue.submit(movement(stocked.id, 1), test_user.id)
+
+def test_endpoint_waits_for_batch(client, stocked, test_user, auth_headers, make_queue, monkeypatch):
+    monkeypatch.setattr(movement_queue, "active", make_queue(window_seconds=0.05).start())
+    product_id = stocked.id
+
+    def post(quantity):
+        return client.post("/inventory-transactions/", headers=auth_headers, json={
+            "product_id": product_id, "transaction_type": "sale", "quantity": quantity
+        })
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(post, [1] * 8))
+    assert all(response.status_code == 200 for response in responses)
+    assert sorted(response.json()["new_stock"] for response in responses) == list(range(92, 100))
+    assert movement_queue.active.batches < 8
+
+    response = client.post("/inventory-transactions/", headers=auth_headers, json={
+        "product_id": 9999, "transaction_type": "sale", "quantity": 1
+    })
+    assert response.status_code == 404
+
+def test_queued_movement_commits_with_its_idempotency_key(client, db, stocked, auth_headers, make_queue,
+                                                         monkeypatch):
+    monkeypatch.setattr(movement_queue, "active", make_queue(window_seconds=0.01).start())
+    headers = {**auth_headers, "Idempotency-Key": "queued-1"}
+    data = {"product_id": stocked.id, "transaction_type": "sale", "quantity": 1}
+    first = client.post("/inventory-transactions/", headers=headers, json=data)
+    second = client.post("/inventory-transactions/", headers=headers, json=data)
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert db.query(InventoryTransaction).count() == 1
+
+    # A movement that applied nothing gives its key up again
+    headers = {**auth_headers, "Idempotency-Key": "queued-2"}
+    response = client.post("/inventory-transactions/", headers=headers, json={**data, "product_id": 9999})
+    assert response.status_code == 404
+    assert db.query(IdempotencyKey).filter(IdempotencyKey.idempotency_key == "queued-2").count() == 0
+
+def test_endpoint_sheds_load_when_queue_is_full(client, stocked, auth_headers, make_queue, monkeypatch):
+    queue = make_queue(max_pending=1)
+    queue.submit(movement(stocked.id, 1), 1)
+    monkeypatch.setattr(movement_queue, "active", queue)
+    response = client.post("/inventory-transactions/", headers=auth_headers, json={
+        "product_id": stocked.id, "transaction_type": "sale", "quantity": 1
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_waiting_requests_do_not_hold_pool_connections(db, stocked, auth_headers, monkeypatch):
+    # Two pooled connections for six waiting requests and the worker
+    engine = create_engine(str(db.get_bind().url), connect_args={"check_same_thread": False},
+                           pool_size=2, max_overflow=0, pool_timeout=2)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def pooled_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    queue = movement_queue.MovementQueue(Session, window_seconds=0.05).start()
+    monkeypatch.setattr(movement_queue, "active", queue)
+    monkeypatch.setitem(app.dependency_overrides, get_db, pooled_db)
+    product_id = stocked.id
+    client = TestClient(app)
+    try:
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            responses = list(pool.map(lambda _: client.post("/inventory-transactions/", headers=auth_headers, json={
+                "product_id": product_id, "transaction_type": "purchase", "quantity": 1
+            }), range(6)))
+    finally:
+        queue.stop(timeout=5)
+        engine.dispose()
+    assert [response.status_code for response in responses] == [200] * 6
+    assert sorted(response.json()["new_stock"] for response in responses) == list(range(101, 107))
@@ -0,0 +1,155 @@
+import pytest
+import sys
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import numbering
+from models import Inventory, NodeLease, NumberSequence
+
+@pytest.fixture(autouse=True)
+def fresh_generators():
+    # Tables are recreated per test, so cached blocks from earlier tests are stale
+    numbering._generators.clear()
+    numbering._leases.clear()
+
+def test_block_sequence_is_unique_across_generators(db):
+    # Two generators on the same table stand in for two processes or nodes
+    first = numbering.BlockSequenceGenerator(db.get_bind(), "test", block_size=3)
+    second = numbering.BlockSequenceGenerator(db.get_bind(), "test", block_size=3)
+    values = [first.next_value(), second.next_value(), first.next_value(),
+              first.next_value(), first.next_value(), second.next_value()]
+
+    assert len(set(values)) == len(values)
+    assert values[:1] + values[2:5] == sorted(values[:1] + values[2:5])
+    assert db.query(NumberSequence).filter(NumberSequence.name == "test").one().next_value == 10
+
+def test_block_sequence_is_thread_safe(db):
+    generator = numbering.BlockSequenceGenerator(db.get_bind(), "threads", block_size=7)
+    values = []
+
+    def worker():
+        for _ in range(50):
+            values.append(generator.next_value())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(values) == list(range(1, 201))
+
+def test_snowflake_is_time_ordered_and_embeds_node():
+    now = [1767225600.0]
+    generator = numbering.SnowflakeGenerator(node_id=5, clock=lambda: now[0])
+    first = generator.next_value()
+    second = generator.next_value()
+    now[0] -= 1  # clock steps back
+    third = generator.next_value()
+    now[0] += 2
+    fourth = generator.next_value()
+
+    assert first < second < third < fourth
+    assert (first >> numbering.SnowflakeGenerator.SEQUENCE_BITS) & 0x3FF == 5
+    assert numbering.SnowflakeGenerator.timestamp(first).timestamp() == pytest.approx(now[0] - 1)
+
+def test_snowflake_rejects_invalid_node():
+    with pytest.raises(ValueError):
+        numbering.SnowflakeGenerator(node_id=1024)
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+def test_node_leases_are_unique_per_process(db):
+    clock = FakeClock()
+    # Each lease stands in for one worker of one replica
+    leases = [numbering.NodeLease(db.get_bind(), lease_seconds=60, holder=f"worker-{index}", clock=clock)
+              for index in range(3)]
+    assert [lease.node_id() for lease in leases] == [0, 1, 2]
+
+    generators = [numbering.SnowflakeGenerator(lease=lease, clock=lambda: 1767225600.0) for lease in leases]
+    values = [generator.next_value() for generator in generators]
+    assert len(set(values)) == 3
+    assert [(value >> numbering.SnowflakeGenerator.SEQUENCE_BITS) & 0x3FF for value in values] == [0, 1, 2]
+
+def test_node_lease_is_renewed_before_it_expires(db):
+    clock = FakeClock()
+    lease = numbering.NodeLease(db.get_bind(), lease_seconds=60, holder="worker", clock=clock)
+    assert lease.node_id() == 0
+    clock.now += timedelta(seconds=31)
+    assert lease.node_id() == 0
+
+    row = db.query(NodeLease).one()
+    assert row.holder == "worker"
+    assert row.expires_at == clock.now + timedelta(seconds=60)
+
+def test_lapsed_node_lease_is_taken_over(db):
+    clock = FakeClock()
+    first = numbering.NodeLease(db.get_bind(), lease_seconds=60, holder="first", clock=clock)
+    assert first.node_id() == 0
+    # Every other id is held, so a new worker can only take over the lapsed lease
+    with db.get_bind().begin() as connection:
+        connection.execute(insert(NodeLease.__table__), [
+            {"node_id": node_id, "holder": f"other-{node_id}", "expires_at": clock.now + timedelta(days=1)}
+            for node_id in range(1, numbering.NodeLease.NODE_COUNT)
+        ])
+    clock.now += timedelta(seconds=61)
+
+    second = numbering.NodeLease(db.get_bind(), lease_seconds=60, holder="second", clock=clock)
+    assert second.node_id() == 0
+    # The first worker notices on its next renewal and moves to another lapsed id
+    with db.get_bind().begin() as connection:
+        connection.execute(update(NodeLease.__table__).where(NodeLease.node_id == 5).values(expires_at=clock.now))
+    assert first.node_id() == 5
+
+    third = numbering.NodeLease(db.get_bind(), lease_seconds=60, holder="third", clock=clock)
+    with pytest.raises(RuntimeError):
+        third.node_id()
+
+def test_snowflake_mode_leases_one_node_per_process(db, monkeypatch):
+    monkeypatch.setattr(numbering, "NUMBER_GENERATOR", "snowflake")
+    monkeypatch.setattr(numbering, "NODE_ID", None)
+    orders = numbering.get_generator(db, "orders")
+    purchase_orders = numbering.get_generator(db, "purchase_orders")
+    assert orders.lease is purchase_orders.lease
+
+    orders.next_value()
+    purchase_orders.next_value()
+    assert db.query(NodeLease).count() == 1
+
+def test_fixed_node_id_is_refused_with_several_workers(db, monkeypatch):
+    monkeypatch.setattr(numbering, "NUMBER_GENERATOR", "snowflake")
+    monkeypatch.setattr(numbering, "NODE_ID", "7")
+    monkeypatch.setattr(numbering, "WEB_CONCURRENCY", 4)
+    with pytest.raises(RuntimeError):
+        numbering.get_generator(db, "orders")
+
+    monkeypatch.setattr(numbering, "WEB_CONCURRENCY", 1)
+    assert numbering.get_generator(db, "orders").node_id == 7
+
+def test_numbers_sort_in_issue_order():
+    numbers = [numbering.format_number("ORD", value) for value in (9, 10, 123456789)]
+    assert numbers == sorted(numbers)
+    assert len({len(number) for number in numbers}) == 1
+
+def test_orders_get_sequential_numbers(client, test_product, test_customer, auth_headers, db):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    order_data = {
+        "customer_id": test_customer.id,
+        "total_amount": 99.99,
+        "items": [{"product_id": test_product.id, "quantity": 1, "unit_price": 99.99, "total_price": 99.99}]
+    }
+    numbers = [client.post("/orders/", json=order_data, headers=auth_headers).json()["order_number"] for _ in range(3)]
+
+    assert all(number.startswith("ORD-") for number in numbers)
+    assert len(set(numbers)) == 3
+    assert numbers == sorted(numbers)
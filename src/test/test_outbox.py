@@ -0,0 +1,187 @@
+import pytest
+import sys
+import os
+import json
+from sqlalchemy.orm import sessionmaker
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import outbox
+from models import Inventory, OutboxEvent, OutboxOffset
+
+@pytest.fixture
+def session_factory(db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+@pytest.fixture
+def stocked_product(db, test_product):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    return test_product
+
+def _place_order(client, product, customer, auth_headers, quantity=2):
+    order_data = {
+        "customer_id": customer.id,
+        "total_amount": 99.99 * quantity,
+        "items": [{"product_id": product.id, "quantity": quantity, "unit_price": 99.99, "total_price": 99.99 * quantity}]
+    }
+    response = client.post("/orders/", json=order_data, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+class FailingSink:
+    def publish(self, events):
+        raise RuntimeError("sink unavailable")
+
+def test_stock_changes_write_outbox_events(client, stocked_product, test_customer, auth_headers, db):
+    order = _place_order(client, stocked_product, test_customer, auth_headers)
+    client.post("/inventory-transactions/", json={
+        "product_id": stocked_product.id, "transaction_type": "purchase", "quantity": 10
+    }, headers=auth_headers)
+    client.put(f"/inventory/{stocked_product.id}", json={"min_stock_level": 5}, headers=auth_headers)
+    client.delete(f"/orders/{order['id']}", headers=auth_headers)
+
+    events = db.query(OutboxEvent).order_by(OutboxEvent.id).all()
+    assert [event.event_type for event in events] == [
+        "inventory.reserved", "inventory.adjusted", "inventory.updated", "inventory.released"
+    ]
+    reserved = json.loads(events[0].payload)
+    assert reserved["order_id"] == order["id"]
+    assert reserved["available_stock"] == 98
+    adjusted = json.loads(events[1].payload)
+    assert adjusted["transaction_type"] == "purchase"
+    assert adjusted["current_stock"] == 110
+    assert json.loads(events[3].payload)["reserved_stock"] == 0
+    assert all(event.aggregate_id == stocked_product.id for event in events)
+
+def test_failed_change_writes_no_event(client, test_product, auth_headers, db):
+    response = client.post("/inventory-transactions/", json={
+        "product_id": test_product.id, "transaction_type": "purchase", "quantity": 10
+    }, headers=auth_headers)
+    assert response.status_code == 404
+    assert db.query(OutboxEvent).count() == 0
+
+def test_relay_publishes_in_batches_and_resumes(client, stocked_product, test_customer, auth_headers, db, session_factory):
+    for _ in range(3):
+        _place_order(client, stocked_product, test_customer, auth_headers, quantity=1)
+
+    sink = outbox.QueueSink()
+    relay = outbox.OutboxRelay(session_factory, sink, "queue", batch_size=2)
+    assert relay.run_once() == 2
+    assert relay.run_once() == 1
+    assert relay.run_once() == 0
+
+    delivered = [sink.queue.get_nowait() for _ in range(3)]
+    assert [event["id"] for event in delivered] == sorted(event["id"] for event in delivered)
+    assert db.query(OutboxOffset).filter(OutboxOffset.sink == "queue").one().last_event_id == delivered[-1]["id"]
+
+    # A fresh relay with the same name picks up from the stored offset
+    _place_order(client, stocked_product, test_customer, auth_headers, quantity=1)
+    resumed = outbox.OutboxRelay(session_factory, sink, "queue")
+    assert resumed.run_once() == 1
+
+def test_failed_publish_is_retried(client, stocked_product, test_customer, auth_headers, db, tmp_path, session_factory):
+    _place_order(client, stocked_product, test_customer, auth_headers)
+
+    with pytest.raises(RuntimeError):
+        outbox.OutboxRelay(session_factory, FailingSink(), "file").run_once()
+    assert db.query(OutboxOffset).count() == 0
+
+    path = tmp_path / "events.ndjson"
+    assert outbox.OutboxRelay(session_factory, outbox.FileSink(str(path)), "file").run_once() == 1
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[0])["event_type"] == "inventory.reserved"
+
+def test_relay_waits_on_gaps_before_skipping(db, stocked_product, session_factory):
+    inventory = db.query(Inventory).first()
+    for event_id in (1, 3):
+        db.add(OutboxEvent(id=event_id, event_type="inventory.updated", aggregate_type="inventory",
+                           aggregate_id=inventory.product_id, payload=json.dumps(outbox.inventory_snapshot(inventory))))
+    db.commit()
+
+    now = [0.0]
+    sink = outbox.QueueSink()
+    relay = outbox.OutboxRelay(session_factory, sink, "queue", gap_timeout=5, clock=lambda: now[0])
+    assert relay.run_once() == 1
+    # Event 2 may still be committing, so 3 is held back until the gap times out
+    assert relay.run_once() == 0
+    now[0] = 6.0
+    assert relay.run_once() == 1
+    assert [sink.queue.get_nowait()["id"] for _ in range(2)] == [1, 3]
+
+def _add_event(db, event_id, inventory):
+    db.add(OutboxEvent(id=event_id, event_type="inventory.updated", aggregate_type="inventory",
+                       aggregate_id=inventory.product_id, payload=json.dumps(outbox.inventory_snapshot(inventory))))
+    db.commit()
+
+def test_skipped_event_is_delivered_when_it_commits_late(db, stocked_product, session_factory):
+    inventory = db.query(Inventory).first()
+    for event_id in (1, 3):
+        _add_event(db, event_id, inventory)
+
+    now = [0.0]
+    sink = outbox.QueueSink()
+    relay = outbox.OutboxRelay(session_factory, sink, "queue", gap_timeout=5, clock=lambda: now[0])
+    relay.run_once()
+    now[0] = 6.0
+    assert relay.run_once() == 1
+    offset = db.query(OutboxOffset).one()
+    assert (offset.last_event_id, json.loads(offset.skipped_ids)) == (3, [2])
+
+    # The long transaction holding event 2 commits; a restarted relay still picks it up
+    _add_event(db, 2, inventory)
+    resumed = outbox.OutboxRelay(session_factory, sink, "queue", gap_timeout=5)
+    assert resumed.run_once() == 1
+    assert [sink.queue.get_nowait()["id"] for _ in range(3)] == [1, 3, 2]
+    db.refresh(offset)
+    assert (offset.last_event_id, json.loads(offset.skipped_ids)) == (3, [])
+
+def test_skipped_event_is_given_up_after_late_window(db, stocked_product, session_factory):
+    inventory = db.query(Inventory).first()
+    for event_id in (1, 3):
+        _add_event(db, event_id, inventory)
+
+    now = [0.0]
+    relay = outbox.OutboxRelay(session_factory, outbox.QueueSink(), "queue", gap_timeout=5, late_window=60,
+                               clock=lambda: now[0])
+    relay.run_once()
+    now[0] = 6.0
+    relay.run_once()
+    now[0] = 70.0
+    assert relay.run_once() == 0
+    assert json.loads(db.query(OutboxOffset).one().skipped_ids) == []
+
+def test_first_run_waits_on_ids_below_the_first_event(db, stocked_product, session_factory):
+    inventory = db.query(Inventory).first()
+    # Event 1 is still in flight when the relay runs for the first time
+    _add_event(db, 2, inventory)
+
+    now = [0.0]
+    sink = outbox.QueueSink()
+    relay = outbox.OutboxRelay(session_factory, sink, "queue", gap_timeout=5, clock=lambda: now[0])
+    assert relay.run_once() == 0
+    now[0] = 6.0
+    assert relay.run_once() == 1
+    assert json.loads(db.query(OutboxOffset).one().skipped_ids) == [1]
+
+    _add_event(db, 1, inventory)
+    assert relay.run_once() == 1
+    assert [sink.queue.get_nowait()["id"] for _ in range(2)] == [2, 1]
+
+def test_new_relay_starts_behind_purged_events(db, stocked_product, session_factory):
+    inventory = db.query(Inventory).first()
+    for event_id in (5, 6, 8):
+        _add_event(db, event_id, inventory)
+    # Events up to 4 were published to the existing relay and purged; 3 was skipped and may still commit
+    db.add(OutboxOffset(sink="file", last_event_id=6, skipped_ids=json.dumps([3])))
+    db.commit()
+
+    assert outbox.starting_point(db) == (4, [3])
+    now = [0.0]
+    sink = outbox.QueueSink()
+    relay = outbox.OutboxRelay(session_factory, sink, "queue", gap_timeout=5, clock=lambda: now[0])
+    assert relay.run_once() == 2
+    _add_event(db, 3, inventory)
+    assert relay.run_once() == 1
+    assert [sink.queue.get_nowait()["id"] for _ in range(3)] == [5, 6, 3]
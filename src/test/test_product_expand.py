@@ -0,0 +1,61 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from models import Product, Inventory
+
+@pytest.fixture
+def stocked_catalog(db, test_category):
+    products = [
+        Product(sku=f"EXP{index:03d}", name=f"Product {index}", price=10.0, cost_price=5.0, category_id=test_category.id)
+        for index in range(20)
+    ]
+    db.add_all(products)
+    db.commit()
+    for index, product in enumerate(products[:10]):
+        db.add(Inventory(product_id=product.id, current_stock=index, reserved_stock=0, available_stock=index))
+    db.commit()
+    return products
+
+def test_expand_inventory_with_category_in_one_query(client, stocked_catalog, statements):
+    # Warm the cached total so only the list query is left
+    client.get("/products/")
+    statements.clear()
+    response = client.get("/products/", params={"expand": "inventory", "limit": 500})
+    assert response.status_code == 200
+    assert len(statements) == 1
+
+    products = {product["sku"]: product for product in response.json()}
+    assert len(products) == 20
+    assert products["EXP003"]["inventory"]["current_stock"] == 3
+    assert products["EXP015"]["inventory"] is None
+    assert products["EXP003"]["category"]["name"] == "Test Category"
+    assert "description" in products["EXP003"]
+
+def test_default_list_joins_category(client, stocked_catalog, statements):
+    client.get("/products/")
+    statements.clear()
+    response = client.get("/products/")
+    assert len(statements) == 1
+    assert "inventory" not in response.json()[0]
+
+def test_expand_with_fields(client, stocked_catalog):
+    response = client.get("/products/", params={"fields": "sku", "expand": "inventory", "limit": 1})
+    assert response.json() == [{"sku": "EXP000", "inventory": {
+        "current_stock": 0, "reserved_stock": 0, "available_stock": 0, "version": 1
+    }}]
+
+def test_expand_on_detail(client, stocked_catalog):
+    response = client.get(f"/products/{stocked_catalog[5].id}", params={"expand": "inventory"})
+    assert response.status_code == 200
+    assert response.json()["inventory"]["available_stock"] == 5
+
+def test_unknown_expansion_is_rejected(client, stocked_catalog):
+    response = client.get("/products/", params={"expand": "supplier"})
+    assert response.status_code == 400
+    # The category is a field, not an expansion
+    response = client.get("/products/", params={"expand": "category"})
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+from models import Product, Inventory, InventoryTransaction, PurchaseOrder, OutboxEvent, OrderStatus
+
+@pytest.fixture
+def second_product(db, test_category):
+    product = Product(sku="TEST002", name="Second Product", price=20.0, cost_price=10.0, category_id=test_category.id)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+@pytest.fixture
+def purchase_order(client, db, test_product, second_product, test_supplier, auth_headers):
+    # Only the first product has an inventory row yet
+    db.add(Inventory(product_id=test_product.id, current_stock=10, reserved_stock=4, available_stock=6))
+    db.commit()
+    po_data = {
+        "supplier_id": test_supplier.id,
+        "total_amount": 700.0,
+        "items": [
+            {"product_id": test_product.id, "quantity": 10, "unit_cost": 50.0, "total_cost": 500.0},
+            {"product_id": second_product.id, "quantity": 10, "unit_cost": 10.0, "total_cost": 100.0},
+            {"product_id": test_product.id, "quantity": 2, "unit_cost": 50.0, "total_cost": 100.0}
+        ]
+    }
+    response = client.post("/purchase-orders/", json=po_data, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+def _stock(db, product_id):
+    inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
+    db.refresh(inventory)
+    return inventory
+
+def test_full_receipt(client, purchase_order, test_product, second_product, auth_headers, db):
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["fully_received"] is True
+    assert data["units_received"] == 22
+    assert data["purchase_order"]["status"] == "delivered"
+    assert data["purchase_order"]["version"] == purchase_order["version"] + 1
+    assert response.headers["ETag"] == f'"{purchase_order["version"] + 1}"'
+
+    first = _stock(db, test_product.id)
+    assert (first.current_stock, first.reserved_stock, first.available_stock) == (22, 4, 18)
+    assert first.version == 2
+    second = _stock(db, second_product.id)
+    assert (second.current_stock, second.available_stock) == (10, 10)
+
+    ledger = db.query(InventoryTransaction).filter(InventoryTransaction.product_id == test_product.id).order_by(InventoryTransaction.id).all()
+    assert [(row.previous_stock, row.new_stock) for row in ledger] == [(10, 20), (20, 22)]
+    assert all(row.reference_type == "purchase_order" and row.reference_id == purchase_order["id"] for row in ledger)
+    assert db.query(OutboxEvent).count() == 2
+
+def test_partial_receipts_then_remainder(client, purchase_order, auth_headers, db):
+    first_item = purchase_order["purchase_order_items"][0]
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive",
+                           json={"lines": [{"item_id": first_item["id"], "quantity": 4}]}, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["fully_received"] is False
+    assert data["purchase_order"]["status"] == "pending"
+    assert data["lines"] == [{
+        "item_id": first_item["id"], "product_id": first_item["product_id"],
+        "quantity": 4, "received_quantity": 4, "ordered_quantity": 10
+    }]
+
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive", headers=auth_headers)
+    assert response.json()["units_received"] == 18
+    assert response.json()["fully_received"] is True
+
+def test_over_receipt_is_rejected(client, purchase_order, test_product, auth_headers, db):
+    item = purchase_order["purchase_order_items"][0]
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive",
+                           json={"lines": [{"item_id": item["id"], "quantity": 11}]}, headers=auth_headers)
+    assert response.status_code == 400
+    assert _stock(db, test_product.id).current_stock == 10
+    assert db.query(InventoryTransaction).count() == 0
+
+def test_unknown_item_is_rejected(client, purchase_order, auth_headers):
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive",
+                           json={"lines": [{"item_id": 9999, "quantity": 1}]}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_delivered_or_cancelled_po_cannot_be_received(client, purchase_order, auth_headers):
+    client.post(f"/purchase-orders/{purchase_order['id']}/receive", headers=auth_headers)
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive", headers=auth_headers)
+    assert response.status_code == 409
+
+def test_stale_if_match_is_rejected(client, purchase_order, auth_headers, db):
+    headers = {**auth_headers, "If-Match": f'"{purchase_order["version"] + 5}"'}
+    response = client.post(f"/purchase-orders/{purchase_order['id']}/receive", headers=headers)
+    assert response.status_code == 409
+    assert db.query(PurchaseOrder).one().status == OrderStatus.pending
+
+def test_receive_missing_po(client, test_user, auth_headers):
+    response = client.post("/purchase-orders/9999/receive", headers=auth_headers)
+    assert response.status_code == 404
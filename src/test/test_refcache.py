@@ -0,0 +1,114 @@
+import sys
+import os
+
+frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+sys.path.insert(0, frontend_path)
+
+import refcache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+class FakeBackend:
+    """Serves queued responses in order and records the headers of each request."""
+
+    def __init__(self, monkeypatch, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        monkeypatch.setattr(refcache.requests, "get", self.get)
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+def test_entries_are_served_from_memory_until_they_expire(monkeypatch):
+    clock = FakeClock()
+    cache = refcache.ReferenceCache(ttl=60, clock=clock)
+    backend = FakeBackend(monkeypatch,
+                          FakeResponse(body=["Tools"]),
+                          FakeResponse(body=["Tools", "Garden"]))
+
+    assert cache.get("http://backend/categories/", "categories") == (["Tools"], 200)
+    clock.now = 59
+    assert cache.get("http://backend/categories/", "categories") == (["Tools"], 200)
+    assert len(backend.requests) == 1
+
+    clock.now = 61
+    assert cache.get("http://backend/categories/", "categories") == (["Tools", "Garden"], 200)
+    assert len(backend.requests) == 2
+
+def test_expired_entries_are_revalidated_with_their_etag(monkeypatch):
+    clock = FakeClock()
+    cache = refcache.ReferenceCache(ttl=60, clock=clock)
+    backend = FakeBackend(monkeypatch,
+                          FakeResponse(body=["Tools"], headers={"ETag": '"v1"'}),
+                          FakeResponse(status_code=304),
+                          FakeResponse(body=["Garden"], headers={"ETag": '"v2"'}))
+
+    cache.get("http://backend/categories/", "categories", headers={"Authorization": "Bearer token"})
+    clock.now = 61
+    # An unchanged list costs a 304 and renews the entry
+    assert cache.get("http://backend/categories/", "categories",
+                     headers={"Authorization": "Bearer token"}) == (["Tools"], 200)
+    assert backend.requests[1][1] == {"Authorization": "Bearer token", "If-None-Match": '"v1"'}
+    clock.now = 120
+    assert cache.get("http://backend/categories/", "categories") == (["Tools"], 200)
+    assert len(backend.requests) == 2
+
+    clock.now = 122
+    assert cache.get("http://backend/categories/", "categories") == (["Garden"], 200)
+    assert backend.requests[2][1] == {"If-None-Match": '"v1"'}
+    clock.now = 150
+    assert cache.get("http://backend/categories/", "categories") == (["Garden"], 200)
+
+def test_errors_are_passed_through_uncached(monkeypatch):
+    cache = refcache.ReferenceCache(ttl=60, clock=FakeClock())
+    backend = FakeBackend(monkeypatch,
+                          FakeResponse(status_code=503, body={"detail": "Unavailable"}),
+                          FakeResponse(body=["Tools"]))
+
+    assert cache.get("http://backend/categories/", "categories") == ({"detail": "Unavailable"}, 503)
+    assert cache.get("http://backend/categories/", "categories") == (["Tools"], 200)
+    assert len(backend.requests) == 2
+
+def test_invalidate_drops_keys_by_prefix(monkeypatch):
+    cache = refcache.ReferenceCache(ttl=60, clock=FakeClock())
+    backend = FakeBackend(monkeypatch,
+                          FakeResponse(body=["Tools"]),
+                          FakeResponse(body={"id": 1}),
+                          FakeResponse(body=["Acme"]),
+                          FakeResponse(body=["Tools", "Garden"]))
+    cache.get("http://backend/categories/", "categories:list")
+    cache.get("http://backend/categories/1", "categories:1")
+    cache.get("http://backend/suppliers/", "suppliers:list")
+
+    cache.invalidate("categories:")
+    assert cache.get("http://backend/suppliers/", "suppliers:list") == (["Acme"], 200)
+    assert cache.get("http://backend/categories/", "categories:list") == (["Tools", "Garden"], 200)
+    assert len(backend.requests) == 4
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    cache = refcache.ReferenceCache(ttl=60, max_entries=2, clock=FakeClock())
+    backend = FakeBackend(monkeypatch, *[FakeResponse(body=[name]) for name in "abcd"])
+    cache.get("http://backend/a", "a")
+    cache.get("http://backend/b", "b")
+    cache.get("http://backend/a", "a")
+    cache.get("http://backend/c", "c")
+
+    # b was the least recently used, so it is fetched again while a is still cached
+    assert cache.get("http://backend/a", "a") == (["a"], 200)
+    assert cache.get("http://backend/b", "b") == (["d"], 200)
+    assert len(backend.requests) == 4
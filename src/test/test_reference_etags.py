@@ -0,0 +1,39 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+def test_categories_revalidate_with_etag(client, test_category, auth_headers):
+    response = client.get("/categories/")
+    assert response.status_code == 200
+    assert response.json()[0]["name"] == "Test Category"
+    tag = response.headers["ETag"]
+
+    response = client.get("/categories/", headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Any change to the list produces a new tag
+    client.put(f"/categories/{test_category.id}", json={"name": "Renamed"}, headers=auth_headers)
+    response = client.get("/categories/", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+
+def test_suppliers_revalidate_with_etag(client, test_supplier):
+    tag = client.get("/suppliers/").headers["ETag"]
+    response = client.get("/suppliers/", headers={"If-None-Match": f'W/{tag}, "other"'})
+    assert response.status_code == 304
+
+def test_current_user(client, test_user, auth_headers):
+    response = client.get("/users/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == test_user.username
+    assert "hashed_password" not in response.json()
+
+    response = client.get("/users/me", headers={**auth_headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+def test_current_user_requires_auth(client):
+    assert client.get("/users/me").status_code == 401
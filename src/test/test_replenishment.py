@@ -0,0 +1,95 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import numpy as np
+import replenishment
+from models import Inventory, InventoryTransaction, PurchaseOrder, PurchaseOrderItem, OrderStatus, TransactionType
+
+@pytest.fixture
+def low_stock_product(db, test_product, test_supplier, test_user):
+    test_product.min_stock_level = 10
+    test_product.max_stock_level = 100
+    db.add(Inventory(product_id=test_product.id, current_stock=5, reserved_stock=0, available_stock=5))
+
+    # A delivered PO establishes the preferred supplier without counting as on-order stock
+    po = PurchaseOrder(
+        po_number="PO-HISTORY-1",
+        supplier_id=test_supplier.id,
+        user_id=test_user.id,
+        status=OrderStatus.delivered,
+        total_amount=500.0
+    )
+    db.add(po)
+    db.flush()
+    db.add(PurchaseOrderItem(purchase_order_id=po.id, product_id=test_product.id, quantity=10, unit_cost=50.0, total_cost=500.0))
+    db.add(InventoryTransaction(
+        product_id=test_product.id,
+        user_id=test_user.id,
+        transaction_type=TransactionType.sale,
+        quantity=30,
+        previous_stock=35,
+        new_stock=5
+    ))
+    db.commit()
+    return test_product
+
+def test_compute_reorder_quantities():
+    catalog = {
+        "sold": np.array([30.0, 0.0, 0.0]),
+        "min_level": np.array([10.0, 10.0, 0.0]),
+        "max_level": np.array([100.0, 100.0, 100.0]),
+        "available": np.array([5.0, 50.0, 0.0]),
+        "on_order": np.array([0.0, 0.0, 0.0]),
+    }
+    quantities = replenishment.compute_reorder_quantities(catalog, lookback_days=30, lead_time_days=7)
+    # Reorder point for the first product is 10 + 1/day * 7 days = 17, so order up to 100
+    assert quantities.tolist() == [95, 0, 0]
+
+def test_replenishment_dry_run(client, low_stock_product, test_supplier, auth_headers, db):
+    response = client.post("/replenishment/run", json={"dry_run": True}, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["products_to_reorder"] == 1
+    assert data["purchase_orders"][0]["supplier_id"] == test_supplier.id
+    assert data["purchase_orders"][0]["purchase_order_id"] is None
+    assert db.query(PurchaseOrder).count() == 1
+
+def test_replenishment_creates_draft_purchase_orders(client, low_stock_product, test_supplier, auth_headers, db):
+    response = client.post("/replenishment/run", json={}, headers=auth_headers)
+    assert response.status_code == 200
+    draft = response.json()["purchase_orders"][0]
+    assert draft["line_count"] == 1
+    assert draft["total_quantity"] == 95
+
+    po = db.query(PurchaseOrder).filter(PurchaseOrder.id == draft["purchase_order_id"]).first()
+    assert po.status == OrderStatus.pending
+    assert po.purchase_order_items[0].product_id == low_stock_product.id
+    assert po.purchase_order_items[0].quantity == 95
+
+    # The new draft counts as on-order stock, so a second run has nothing to do
+    response = client.post("/replenishment/run", json={}, headers=auth_headers)
+    assert response.json()["products_to_reorder"] == 0
+
+def test_replenishment_reports_products_without_supplier(client, test_product, auth_headers, db):
+    test_product.min_stock_level = 10
+    db.commit()
+    response = client.post("/replenishment/run", json={"dry_run": True}, headers=auth_headers)
+    data = response.json()
+    assert data["purchase_orders"] == []
+    assert data["unassigned_product_ids"] == [test_product.id]
+
+def test_partially_received_order_counts_only_the_remainder(db, low_stock_product, test_supplier, test_user):
+    po = PurchaseOrder(po_number="PO-OPEN-1", supplier_id=test_supplier.id, user_id=test_user.id,
+                       status=OrderStatus.shipped, total_amount=500.0)
+    db.add(po)
+    db.flush()
+    db.add(PurchaseOrderItem(purchase_order_id=po.id, product_id=low_stock_product.id, quantity=10,
+                             received_quantity=6, unit_cost=50.0, total_cost=500.0))
+    db.commit()
+
+    catalog = replenishment.load_catalog(db, lookback_days=30)
+    assert catalog["on_order"].tolist() == [4.0]
@@ -0,0 +1,79 @@
+import pytest
+import sys
+import os
+from datetime import date, timedelta
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import rollups
+from models import Inventory, DailyProductSales, DailyCategorySales
+
+@pytest.fixture
+def placed_order(client, test_product, test_customer, auth_headers, db):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    order_data = {
+        "customer_id": test_customer.id,
+        "total_amount": 299.97,
+        "items": [
+            {"product_id": test_product.id, "quantity": 3, "unit_price": 99.99, "total_price": 299.97}
+        ]
+    }
+    response = client.post("/orders/", json=order_data, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+def _report(client, auth_headers, group_by="day"):
+    today = date.today()
+    params = {
+        "from": (today - timedelta(days=2)).isoformat(),
+        "to": (today + timedelta(days=2)).isoformat(),
+        "group_by": group_by
+    }
+    response = client.get("/reports/sales", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["rows"]
+
+def test_order_creation_updates_rollups(client, placed_order, test_product, test_category, auth_headers):
+    rows = _report(client, auth_headers, group_by="product")
+    assert rows == [{
+        "sales_date": None,
+        "product_id": test_product.id,
+        "category_id": None,
+        "units_sold": 3,
+        "revenue": 299.97,
+        "order_lines": 1
+    }]
+    rows = _report(client, auth_headers, group_by="category")
+    assert rows[0]["category_id"] == test_category.id
+    assert rows[0]["units_sold"] == 3
+
+def test_cancelling_order_removes_it_from_rollups(client, placed_order, auth_headers):
+    client.put(f"/orders/{placed_order['id']}", json={"status": "cancelled"}, headers=auth_headers)
+    assert _report(client, auth_headers) == []
+
+    client.put(f"/orders/{placed_order['id']}", json={"status": "confirmed"}, headers=auth_headers)
+    assert _report(client, auth_headers)[0]["units_sold"] == 3
+
+def test_rebuild_matches_incremental_rollups(client, placed_order, auth_headers, db):
+    incremental = _report(client, auth_headers, group_by="category")
+    db.query(DailyCategorySales).delete()
+    db.query(DailyProductSales).delete()
+    db.commit()
+    assert _report(client, auth_headers) == []
+
+    result = rollups.rebuild_rollups(db)
+    assert result["product_rows"] == 1
+    assert _report(client, auth_headers, group_by="category") == incremental
+
+def test_sales_report_validates_range(client, test_user, auth_headers):
+    response = client.get("/reports/sales", params={"from": "2024-02-01", "to": "2024-01-01"}, headers=auth_headers)
+    assert response.status_code == 400
+    response = client.get("/reports/sales", params={"from": "2024-01-01", "to": "2024-02-01", "group_by": "sku"}, headers=auth_headers)
+    assert response.status_code == 422
+
+def test_deleting_order_removes_it_from_rollups(client, placed_order, auth_headers):
+    response = client.delete(f"/orders/{placed_order['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert _report(client, auth_headers) == []
@@ -0,0 +1,79 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+from sqlalchemy import create_engine, select, func
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import seed
+from models import (Base, Product, Inventory, InventoryTransaction, Order, OrderItem, OrderStatus,
+                    Category, DailyProductSales)
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+SCALE = 0.01
+
+def _seeded_engine(path, seed_value):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    seed.seed(engine, scale=SCALE, seed=seed_value, years=2, chunk_size=150, now=NOW, log=lambda line: None)
+    return engine
+
+def test_counts_follow_scale(db):
+    counts = seed.seed(db.get_bind(), scale=SCALE, years=1, chunk_size=40, now=NOW, log=lambda line: None)
+    expected = seed.scaled_counts(SCALE)
+    assert counts["products"] == counts["inventory"] == expected["products"]
+    assert counts["orders"] == expected["orders"]
+    assert counts["customers"] == expected["customers"]
+    assert counts["order_items"] >= counts["orders"]
+    assert db.query(Category).filter(Category.parent_id.is_(None)).count() == len(seed.ROOT_CATEGORIES)
+
+def test_same_seed_gives_same_data(tmp_path):
+    first = _seeded_engine(tmp_path / "first.db", 7)
+    second = _seeded_engine(tmp_path / "second.db", 7)
+    other = _seeded_engine(tmp_path / "other.db", 8)
+    query = select(Order.order_number, Order.customer_id, Order.status, Order.total_amount).order_by(Order.id)
+    with first.connect() as a, second.connect() as b, other.connect() as c:
+        rows = a.execute(query).all()
+        assert rows == b.execute(query).all()
+        assert rows != c.execute(query).all()
+
+def test_ledger_inventory_and_orders_agree(tmp_path):
+    engine = _seeded_engine(tmp_path / "seed.db", 42)
+    with engine.connect() as connection:
+        # The ledger ends where inventory stands, and each row continues from the previous one
+        ledger = connection.execute(
+            select(InventoryTransaction.product_id, InventoryTransaction.previous_stock, InventoryTransaction.new_stock)
+            .order_by(InventoryTransaction.product_id, InventoryTransaction.created_at, InventoryTransaction.id)
+        ).all()
+        last = {}
+        for product_id, previous_stock, new_stock in ledger:
+            assert previous_stock == last.get(product_id, 0)
+            last[product_id] = new_stock
+        inventory = {row.product_id: row for row in connection.execute(select(Inventory)).all()}
+        assert {product_id: row.current_stock for product_id, row in inventory.items()} == last
+        assert all(row.available_stock == row.current_stock - row.reserved_stock for row in inventory.values())
+        assert min(row.current_stock for row in inventory.values()) >= 0
+
+        # Reservations are exactly the open order lines
+        open_lines = dict(connection.execute(
+            select(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.status.in_([OrderStatus.pending, OrderStatus.confirmed]))
+            .group_by(OrderItem.product_id)
+        ).all())
+        assert {pid: row.reserved_stock for pid, row in inventory.items() if row.reserved_stock} == open_lines
+
+        # Rollups were rebuilt from the non-cancelled orders
+        rolled_up = connection.execute(select(func.sum(DailyProductSales.units_sold))).scalar()
+        ordered = connection.execute(
+            select(func.sum(OrderItem.quantity)).join(Order, Order.id == OrderItem.order_id)
+            .where(Order.status != OrderStatus.cancelled)
+        ).scalar()
+        assert rolled_up == ordered
+
+def test_extends_an_existing_database(db, test_product, test_user):
+    seed.seed(db.get_bind(), scale=SCALE, years=1, now=NOW, log=lambda line: None)
+    assert db.query(Product).count() == seed.scaled_counts(SCALE)["products"] + 1
+    assert db.query(Product).filter(Product.sku == "TEST001").one().id == test_product.id
@@ -0,0 +1,43 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import data_access
+
+def test_list_returns_only_requested_fields(client, test_product):
+    response = client.get("/products/", params={"fields": "id,sku,name,price"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": test_product.id, "sku": "TEST001", "name": "Test Product", "price": 99.99}]
+
+def test_detail_returns_only_requested_fields(client, test_product):
+    response = client.get(f"/products/{test_product.id}", params={"fields": "sku,category"})
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"sku", "category"}
+    assert data["category"]["name"] == "Test Category"
+
+def test_search_honours_fields(client, test_product):
+    response = client.get("/products/", params={"search": "Test", "fields": "name"})
+    assert response.json() == [{"name": "Test Product"}]
+
+def test_unknown_field_is_rejected(client, test_product):
+    response = client.get("/products/", params={"fields": "id,secret"})
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+
+def test_without_fields_response_is_unchanged(client, test_product):
+    data = client.get("/products/").json()[0]
+    assert "description" in data
+    assert data["category"]["name"] == "Test Category"
+
+def test_unrequested_columns_are_not_selected(db, test_product, statements):
+    db.expunge_all()
+    statements.clear()
+    products = data_access.get_products(db, fields=("id", "sku", "name"))
+    assert products[0].sku == "TEST001"
+    assert len(statements) == 1
+    assert "description" not in statements[0]
+    assert "categories" not in statements[0]
@@ -0,0 +1,79 @@
+import pytest
+import sys
+import os
+from sqlalchemy.exc import OperationalError
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import startup
+
+class FlakyEngine:
+    """Refuses the first ``failures`` connections, then delegates to a real engine."""
+
+    def __init__(self, engine, failures):
+        self.engine = engine
+        self.failures = failures
+        self.pool = engine.pool
+
+    def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("SELECT 1", {}, ConnectionRefusedError("Connection refused"))
+        return self.engine.connect()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_wait_backs_off_until_database_answers(db):
+    clock = FakeClock()
+    pauses = []
+
+    def sleep(seconds):
+        pauses.append(seconds)
+        clock.sleep(seconds)
+
+    attempts = startup.wait_for_database(FlakyEngine(db.get_bind(), failures=4), timeout=60,
+                                         initial_delay=1, max_delay=3, clock=clock, sleep=sleep)
+    assert attempts == 5
+    # Each pause is between half and all of a delay that doubles up to the cap
+    for pause, delay in zip(pauses, [1, 2, 3, 3]):
+        assert delay / 2 <= pause <= delay
+
+def test_wait_gives_up_after_timeout(db):
+    clock = FakeClock()
+    with pytest.raises(OperationalError):
+        startup.wait_for_database(FlakyEngine(db.get_bind(), failures=100), timeout=10,
+                                  initial_delay=1, max_delay=2, clock=clock, sleep=clock.sleep)
+    assert clock.now == pytest.approx(10)
+
+def test_prepare_marks_ready_after_warm_up(db):
+    state = startup.Readiness()
+    clock = FakeClock()
+    startup.prepare(FlakyEngine(db.get_bind(), failures=1), state, initial_delay=0.1, clock=clock, sleep=clock.sleep)
+    status = state.status()
+    assert status["ready"] is True
+    assert status["ready_after_seconds"] is not None
+
+def test_ready_endpoint_follows_startup_state(client, monkeypatch):
+    state = startup.Readiness()
+    monkeypatch.setattr(startup, "readiness", state)
+    state.update("waiting for database (attempt 3): OperationalError")
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["detail"].startswith("waiting for database")
+    # Liveness does not depend on the database
+    assert client.get("/health").status_code == 200
+
+    state.mark_ready()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
@@ -0,0 +1,144 @@
+import pytest
+import sys
+import os
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import json
+import stock_shards, replenishment
+from models import Inventory, InventoryShard, OutboxEvent
+
+@pytest.fixture(autouse=True)
+def uncached_pending(monkeypatch):
+    monkeypatch.setattr(stock_shards, "STOCK_SHARD_CACHE_SECONDS", 0)
+
+@pytest.fixture
+def hot_product(client, db, test_product, auth_headers):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=10, available_stock=90))
+    db.commit()
+    response = client.put(f"/inventory/{test_product.id}/shards", json={"shards": 4}, headers=auth_headers)
+    assert response.status_code == 200
+    return test_product
+
+def _place_order(client, customer, product, quantity, headers):
+    response = client.post("/orders/", json={
+        "customer_id": customer.id,
+        "total_amount": 99.99 * quantity,
+        "items": [{"product_id": product.id, "quantity": quantity, "unit_price": 99.99, "total_price": 99.99 * quantity}]
+    }, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def _row(db, product_id):
+    inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
+    db.refresh(inventory)
+    return inventory
+
+def _shards(db, product_id):
+    db.expire_all()
+    return [(shard.available_stock, shard.reserved_stock) for shard in stock_shards.get_shards(db, product_id)]
+
+def test_configure_deals_available_stock_to_shards(client, hot_product, auth_headers):
+    response = client.get(f"/inventory/{hot_product.id}/shards", headers=auth_headers)
+    data = response.json()
+    assert data["shard_count"] == 4
+    assert (data["current_stock"], data["reserved_stock"], data["available_stock"]) == (100, 10, 90)
+    assert [(shard["available_stock"], shard["reserved_stock"]) for shard in data["shards"]] == [
+        (23, 0), (23, 0), (22, 0), (22, 0)
+    ]
+
+def test_orders_reserve_on_shards_not_the_inventory_row(client, db, hot_product, test_customer, auth_headers):
+    version = _row(db, hot_product.id).version
+    for quantity in (2, 3, 4):
+        _place_order(client, test_customer, hot_product, quantity, auth_headers)
+
+    row = _row(db, hot_product.id)
+    assert (row.reserved_stock, row.version) == (10, version)
+    shards = _shards(db, hot_product.id)
+    assert sum(reserved for _, reserved in shards) == 9
+    assert sum(available for available, _ in shards) == 81
+
+    # Reads count the shard reservations in
+    data = client.get(f"/inventory/{hot_product.id}").json()
+    assert (data["current_stock"], data["reserved_stock"], data["available_stock"]) == (100, 19, 81)
+    data = client.get("/inventory/", headers=auth_headers).json()
+    assert data[0]["reserved_stock"] == 19
+
+def test_dry_shard_triggers_rebalance(client, db, hot_product, test_customer, auth_headers):
+    _place_order(client, test_customer, hot_product, 23, auth_headers)
+
+    # The order emptied a shard, so its reservation was folded and the rest dealt out again
+    row = _row(db, hot_product.id)
+    assert (row.reserved_stock, row.available_stock) == (33, 67)
+    assert _shards(db, hot_product.id) == [(17, 0), (17, 0), (17, 0), (16, 0)]
+
+    # Orders larger than any shard still go through
+    _place_order(client, test_customer, hot_product, 80, auth_headers)
+    row = _row(db, hot_product.id)
+    assert (row.reserved_stock, row.available_stock) == (113, -13)
+    assert _shards(db, hot_product.id) == [(0, 0)] * 4
+
+def test_deleting_order_releases_through_shards(client, db, hot_product, test_customer, auth_headers):
+    order = _place_order(client, test_customer, hot_product, 5, auth_headers)
+    assert client.delete(f"/orders/{order['id']}", headers=auth_headers).status_code == 200
+    data = client.get(f"/inventory/{hot_product.id}").json()
+    assert (data["reserved_stock"], data["available_stock"]) == (10, 90)
+    assert sum(available for available, _ in _shards(db, hot_product.id)) == 90
+
+def test_shipping_folds_shard_reservations(client, db, hot_product, test_customer, auth_headers):
+    order = _place_order(client, test_customer, hot_product, 5, auth_headers)
+    response = client.post("/orders/ship", json={"order_ids": [order["id"]]}, headers=auth_headers)
+    assert response.json()["shipped"] == [order["id"]]
+
+    row = _row(db, hot_product.id)
+    assert (row.current_stock, row.reserved_stock, row.available_stock) == (95, 10, 85)
+    assert all(reserved == 0 for _, reserved in _shards(db, hot_product.id))
+
+def test_absolute_update_replaces_shard_reservations(client, db, hot_product, test_customer, auth_headers):
+    _place_order(client, test_customer, hot_product, 5, auth_headers)
+    response = client.put(f"/inventory/{hot_product.id}", json={"current_stock": 50, "reserved_stock": 0},
+                          headers=auth_headers)
+    assert response.status_code == 200
+    assert (response.json()["reserved_stock"], response.json()["available_stock"]) == (0, 50)
+    assert _shards(db, hot_product.id) == [(13, 0), (13, 0), (12, 0), (12, 0)]
+
+def test_turning_sharding_off_folds_reservations(client, db, hot_product, test_customer, auth_headers):
+    _place_order(client, test_customer, hot_product, 5, auth_headers)
+    response = client.put(f"/inventory/{hot_product.id}/shards", json={"shards": 0}, headers=auth_headers)
+    assert response.json()["shard_count"] == 0
+    assert db.query(InventoryShard).count() == 0
+
+    # Back on the inventory row
+    _place_order(client, test_customer, hot_product, 1, auth_headers)
+    row = _row(db, hot_product.id)
+    assert (row.reserved_stock, row.available_stock) == (16, 84)
+
+def test_other_readers_count_shard_reservations(client, db, hot_product, test_customer, auth_headers):
+    _place_order(client, test_customer, hot_product, 5, auth_headers)
+    catalog = replenishment.load_catalog(db, lookback_days=30)
+    assert catalog["available"].tolist() == [85.0]
+
+    response = client.post("/inventory-transactions/", json={
+        "product_id": hot_product.id, "transaction_type": "purchase", "quantity": 10
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    event = db.query(OutboxEvent).filter(OutboxEvent.event_type == "inventory.adjusted").one()
+    payload = json.loads(event.payload)
+    assert (payload["current_stock"], payload["reserved_stock"], payload["available_stock"]) == (110, 15, 95)
+
+def test_expanded_product_stock_counts_shard_reservations(client, hot_product, test_customer, auth_headers):
+    _place_order(client, test_customer, hot_product, 5, auth_headers)
+    stock = client.get(f"/inventory/{hot_product.id}", headers=auth_headers).json()
+    assert (stock["reserved_stock"], stock["available_stock"]) == (15, 85)
+
+    product = client.get(f"/products/{hot_product.id}", params={"expand": "inventory"}).json()
+    assert (product["inventory"]["reserved_stock"], product["inventory"]["available_stock"]) == (15, 85)
+    products = client.get("/products/", params={"fields": "id", "expand": "inventory"}).json()
+    assert products == [{"id": hot_product.id, "inventory": product["inventory"]}]
+
+def test_shard_count_is_capped(client, hot_product, auth_headers):
+    response = client.put(f"/inventory/{hot_product.id}/shards", json={"shards": 65}, headers=auth_headers)
+    assert response.status_code == 422
+    response = client.put("/inventory/9999/shards", json={"shards": 2}, headers=auth_headers)
+    assert response.status_code == 404
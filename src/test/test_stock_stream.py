@@ -0,0 +1,107 @@
+import pytest
+import sys
+import os
+import asyncio
+import json
+from sqlalchemy.orm import sessionmaker
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import stock_stream
+from models import Inventory
+
+@pytest.fixture
+def session_factory(db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+def _update(product_id, available):
+    return {"product_id": product_id, "current_stock": available, "reserved_stock": 0,
+            "available_stock": available, "event_type": "inventory.updated"}
+
+def test_updates_are_coalesced_per_product():
+    async def scenario():
+        subscriber = stock_stream.Subscriber()
+        for available in (10, 9, 8):
+            subscriber.offer(_update(1, available))
+        subscriber.offer(_update(2, 5))
+        return await subscriber.next_batch(timeout=1)
+
+    resync, updates = asyncio.run(scenario())
+    assert not resync
+    assert [(update["product_id"], update["available_stock"]) for update in updates] == [(1, 8), (2, 5)]
+
+def test_subscriber_only_receives_its_products():
+    async def scenario():
+        subscriber = stock_stream.Subscriber(product_ids=[2])
+        subscriber.offer(_update(1, 10))
+        first = await subscriber.next_batch(timeout=0.05)
+        subscriber.offer(_update(2, 10))
+        return first, await subscriber.next_batch(timeout=1)
+
+    first, second = asyncio.run(scenario())
+    assert first is None
+    assert [update["product_id"] for update in second[1]] == [2]
+
+def test_slow_subscriber_is_capped_and_told_to_resync():
+    async def scenario():
+        subscriber = stock_stream.Subscriber(max_pending=3)
+        for product_id in range(10):
+            subscriber.offer(_update(product_id, 1))
+        assert len(subscriber.pending) == 0
+        first = await subscriber.next_batch(timeout=1)
+        subscriber.offer(_update(42, 1))
+        return first, await subscriber.next_batch(timeout=1)
+
+    first, second = asyncio.run(scenario())
+    assert first == (True, [])
+    assert second == (False, [_update(42, 1)])
+
+def test_event_stream_sends_heartbeats_and_updates(session_factory):
+    stream = stock_stream.StockStream(session_factory)
+
+    async def scenario():
+        subscriber = stock_stream.Subscriber()
+        stream.subscribers.add(subscriber)
+        connected = [True]
+
+        async def is_disconnected():
+            return not connected[0]
+
+        events = stock_stream.event_stream(stream, subscriber, is_disconnected, heartbeat_seconds=0.05, coalesce_seconds=0)
+        chunks = [await events.__anext__(), await events.__anext__()]
+        subscriber.offer(_update(7, 3))
+        chunks.append(await events.__anext__())
+        connected[0] = False
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0].startswith("retry:")
+    assert chunks[1] == ": heartbeat\n\n"
+    assert chunks[2].startswith("event: stock\n")
+    assert json.loads(chunks[2].split("data: ", 1)[1]) == [_update(7, 3)]
+    assert not stream.subscribers
+
+def test_poll_picks_up_committed_stock_changes(client, test_product, test_customer, auth_headers, db, session_factory):
+    db.add(Inventory(product_id=test_product.id, current_stock=100, reserved_stock=0, available_stock=100))
+    db.commit()
+    client.put(f"/inventory/{test_product.id}", json={"current_stock": 90}, headers=auth_headers)
+
+    stream = stock_stream.StockStream(session_factory)
+    # The first poll only finds the starting point, so earlier changes are not replayed
+    assert stream.poll_once() == []
+
+    client.post("/inventory-transactions/", json={
+        "product_id": test_product.id, "transaction_type": "purchase", "quantity": 5
+    }, headers=auth_headers)
+    updates = stream.poll_once()
+    assert len(updates) == 1
+    assert updates[0]["product_id"] == test_product.id
+    assert updates[0]["current_stock"] == 95
+    assert updates[0]["event_type"] == "inventory.adjusted"
+
+def test_stream_requires_authentication(client):
+    response = client.get("/inventory/stream")
+    assert response.status_code == 401
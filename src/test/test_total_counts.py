@@ -0,0 +1,120 @@
+import pytest
+import sys
+import os
+from sqlalchemy import delete, insert, update
+
+backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, backend_path)
+
+import counts
+from models import Category, Customer, Order, OrderStatus, Product
+
+def add_customers(db, count):
+    for index in range(count):
+        db.add(Customer(name=f"Customer {index}", email=f"customer{index}@example.com"))
+    db.commit()
+
+def test_total_count_is_independent_of_page(client, db):
+    add_customers(db, 7)
+    response = client.get("/customers/", params={"skip": 5, "limit": 5})
+    assert len(response.json()) == 2
+    assert response.headers["X-Total-Count"] == "7"
+
+def test_total_count_follows_filters(client, db, test_customer, test_user, auth_headers):
+    other = Customer(name="Other", email="other@example.com")
+    db.add(other)
+    db.flush()
+    for index, customer_id in enumerate([test_customer.id, test_customer.id, other.id]):
+        db.add(Order(order_number=f"ORD-{index}", customer_id=customer_id, user_id=test_user.id,
+                     status=OrderStatus.pending, total_amount=10))
+    db.commit()
+
+    response = client.get("/orders/", params={"customer_id": test_customer.id}, headers=auth_headers)
+    assert response.headers["X-Total-Count"] == "2"
+    response = client.get("/orders/", headers=auth_headers)
+    assert response.headers["X-Total-Count"] == "3"
+
+def test_total_count_is_cached_until_exact(client, db):
+    add_customers(db, 3)
+    assert client.get("/customers/").headers["X-Total-Count"] == "3"
+
+    # Rows written outside any session, as another replica would, are not seen until
+    # the entry expires or the client asks for an exact count
+    with db.get_bind().begin() as connection:
+        connection.execute(insert(Customer.__table__), [{"name": "Elsewhere", "email": "elsewhere@example.com"}])
+    assert client.get("/customers/").headers["X-Total-Count"] == "3"
+    assert client.get("/customers/", params={"exact": "true"}).headers["X-Total-Count"] == "4"
+    assert client.get("/customers/").headers["X-Total-Count"] == "4"
+
+def test_committed_writes_invalidate_total(client, db, auth_headers):
+    add_customers(db, 2)
+    assert client.get("/customers/").headers["X-Total-Count"] == "2"
+
+    response = client.post("/customers/", json={"name": "New", "email": "new@example.com"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/customers/").headers["X-Total-Count"] == "3"
+
+    # Bulk statements count as writes too, but only once they commit
+    db.execute(delete(Customer).where(Customer.name == "New"))
+    db.rollback()
+    assert client.get("/customers/").headers["X-Total-Count"] == "3"
+    db.execute(delete(Customer).where(Customer.name == "New"))
+    db.commit()
+    assert client.get("/customers/").headers["X-Total-Count"] == "2"
+
+def test_updates_invalidate_filtered_totals(client, db, test_product, test_category):
+    other = Category(name="Other")
+    db.add(other)
+    db.commit()
+    in_other = lambda: client.get("/products/", params={"category_id": other.id}).headers["X-Total-Count"]
+    assert in_other() == "0"
+
+    # Moving a row into the filter changes the total without changing the row count
+    test_product.category_id = other.id
+    db.commit()
+    assert in_other() == "1"
+
+    db.execute(update(Product).where(Product.id == test_product.id).values(category_id=test_category.id))
+    db.commit()
+    assert in_other() == "0"
+
+def test_total_count_on_revalidated_reference_list(client, test_category):
+    response = client.get("/categories/")
+    assert response.headers["X-Total-Count"] == "1"
+    response = client.get("/categories/", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["X-Total-Count"] == "1"
+
+def test_total_count_with_sparse_fields(client, test_product):
+    response = client.get("/products/", params={"fields": "id,sku"})
+    assert response.headers["X-Total-Count"] == "1"
+    response = client.get("/products/", params={"search": "missing"})
+    assert response.headers["X-Total-Count"] == "0"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_entries_expire():
+    clock = FakeClock()
+    cache = counts.CountCache(ttl_seconds=30, clock=clock)
+    totals = iter([5, 6])
+    assert cache.get("orders", (), lambda: next(totals)) == 5
+    clock.now = 29
+    assert cache.get("orders", (), lambda: next(totals)) == 5
+    clock.now = 31
+    assert cache.get("orders", (), lambda: next(totals)) == 6
+
+def test_count_racing_a_commit_is_not_cached():
+    cache = counts.CountCache()
+
+    def count():
+        # A commit lands between reading the table and storing the result
+        cache.invalidate({"orders"})
+        return 5
+
+    assert cache.get("orders", (), count) == 5
+    assert cache.get("orders", (), lambda: 6) == 6